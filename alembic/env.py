@@ -9,6 +9,9 @@ from app.auth import models as auth_models
 from app.products import models as product_models
 from app.cart import models as cart_models
 from app.orders import models as order_models
+from app.emails import models as email_models
+from app.inventory import models as inventory_models
+from app.reports import models as report_models
 
 
 # this is the Alembic Config object, which provides
@@ -26,6 +29,18 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+# Tables the app creates with raw DDL, outside the models: the FTS5 search index
+# (products_fts and its shadow tables) and the trigger-maintained facet counts.
+# Autogenerate would otherwise propose dropping them.
+UNMODELLED_TABLES = ("products_fts", "product_facets")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    table = name if type_ == "table" else getattr(getattr(object, "table", None), "name", None)
+    if reflected and compare_to is None and table and table.startswith(UNMODELLED_TABLES):
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -48,6 +63,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -71,7 +87,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
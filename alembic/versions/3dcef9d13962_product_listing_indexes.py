@@ -0,0 +1,34 @@
+"""Product listing keyset indexes
+
+Revision ID: 3dcef9d13962
+Revises: 16a1613d51a7
+Create Date: 2026-10-18 11:40:27.918204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3dcef9d13962'
+down_revision: Union[str, None] = '16a1613d51a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_products_price_id', 'products', ['price', 'id'], unique=False)
+    op.create_index('ix_products_name_id', 'products', ['name', 'id'], unique=False)
+    op.create_index('ix_products_category_price_id', 'products', [sa.text('lower(category)'), 'price', 'id'], unique=False)
+    op.create_index('ix_products_category_name_id', 'products', [sa.text('lower(category)'), 'name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_category_name_id', table_name='products')
+    op.drop_index('ix_products_category_price_id', table_name='products')
+    op.drop_index('ix_products_name_id', table_name='products')
+    op.drop_index('ix_products_price_id', table_name='products')
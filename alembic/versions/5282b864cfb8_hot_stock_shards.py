@@ -0,0 +1,58 @@
+"""Hot stock shards
+
+Revision ID: 5282b864cfb8
+Revises: b81f5c2e7d40
+Create Date: 2026-10-18 19:53:46.102810
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5282b864cfb8'
+down_revision: Union[str, None] = 'b81f5c2e7d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('hot_products',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('shard_size', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_table('stock_shards',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('owner', sa.String(), nullable=False),
+    sa.Column('allotted', sa.Integer(), nullable=False),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_shards_owner'), 'stock_shards', ['owner'], unique=False)
+    op.create_index(op.f('ix_stock_shards_product_id'), 'stock_shards', ['product_id'], unique=False)
+    op.create_table('stock_shard_sales',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('shard_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['shard_id'], ['stock_shards.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_shard_sales_shard_id'), 'stock_shard_sales', ['shard_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_stock_shard_sales_shard_id'), table_name='stock_shard_sales')
+    op.drop_table('stock_shard_sales')
+    op.drop_index(op.f('ix_stock_shards_product_id'), table_name='stock_shards')
+    op.drop_index(op.f('ix_stock_shards_owner'), table_name='stock_shards')
+    op.drop_table('stock_shards')
+    op.drop_table('hot_products')
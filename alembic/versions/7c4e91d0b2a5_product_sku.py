@@ -0,0 +1,31 @@
+"""Product sku
+
+Revision ID: 7c4e91d0b2a5
+Revises: 3f2d3db2d621
+Create Date: 2026-10-18 19:05:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e91d0b2a5'
+down_revision: Union[str, None] = '3f2d3db2d621'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('sku', sa.String(), nullable=True))
+    op.create_index('ix_products_sku', 'products', ['sku'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_sku', table_name='products')
+    # Plain DROP COLUMN (SQLite 3.35+): a batch table rebuild would lose the search triggers
+    op.drop_column('products', 'sku')
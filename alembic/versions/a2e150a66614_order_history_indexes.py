@@ -0,0 +1,35 @@
+"""Order history indexes
+
+Revision ID: a2e150a66614
+Revises: 3dcef9d13962
+Create Date: 2026-10-18 14:05:51.337120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2e150a66614'
+down_revision: Union[str, None] = '3dcef9d13962'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_orders_user_created_id', 'orders', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+    # created_at is now set in Python and stored with microseconds; func.now() wrote whole
+    # seconds. SQLite compares the text, so older rows get the same format for the cursor
+    # and date filters to order them correctly among new ones.
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("UPDATE orders SET created_at = created_at || '.000000' WHERE length(created_at) = 19")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
+    op.drop_index('ix_orders_user_created_id', table_name='orders')
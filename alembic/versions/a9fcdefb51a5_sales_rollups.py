@@ -0,0 +1,70 @@
+"""Sales rollups
+
+Revision ID: a9fcdefb51a5
+Revises: c4e1ff701248
+Create Date: 2026-10-18 20:56:11.255120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9fcdefb51a5'
+down_revision: Union[str, None] = 'c4e1ff701248'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('sales_by_product',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('product_name', sa.String(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_index('ix_sales_by_product_revenue', 'sales_by_product', ['revenue', 'product_id'], unique=False)
+    op.create_index('ix_sales_by_product_units', 'sales_by_product', ['units', 'product_id'], unique=False)
+
+    # Existing orders, as `python -m app.reports` would count them
+    op.execute("""
+        INSERT INTO sales_daily (day, orders, units, revenue)
+        SELECT day, count(*), sum(units), sum(total_amount)
+        FROM (
+            SELECT date(orders.created_at) AS day, orders.total_amount, sum(order_items.quantity) AS units
+            FROM orders JOIN order_items ON order_items.order_id = orders.id
+            WHERE orders.status = 'PAID'
+            GROUP BY orders.id
+        ) AS per_order
+        GROUP BY day
+    """)
+    op.execute("""
+        INSERT INTO sales_by_product (product_id, product_name, orders, units, revenue)
+        SELECT order_items.product_id,
+               coalesce((SELECT name FROM products WHERE products.id = order_items.product_id), max(order_items.product_name), ''),
+               count(*), sum(order_items.quantity), sum(order_items.quantity * order_items.price_at_purchase)
+        FROM order_items JOIN orders ON orders.id = order_items.order_id
+        WHERE orders.status = 'PAID' AND order_items.product_id IS NOT NULL
+        GROUP BY order_items.product_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sales_by_product_units', table_name='sales_by_product')
+    op.drop_index('ix_sales_by_product_revenue', table_name='sales_by_product')
+    op.drop_table('sales_by_product')
+    op.drop_table('sales_daily')
@@ -0,0 +1,46 @@
+"""Unique cart line per user and product
+
+Revision ID: b81f5c2e7d40
+Revises: 7c4e91d0b2a5
+Create Date: 2026-10-18 19:52:40.215731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f5c2e7d40'
+down_revision: Union[str, None] = '7c4e91d0b2a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Concurrent adds may have left several lines for one product; fold them into the oldest
+    op.execute("""
+        UPDATE cart SET quantity = (
+            SELECT SUM(dup.quantity) FROM cart AS dup
+            WHERE dup.user_id = cart.user_id AND dup.product_id = cart.product_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM cart WHERE product_id IS NOT NULL
+            GROUP BY user_id, product_id HAVING COUNT(*) > 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM cart WHERE product_id IS NOT NULL AND id NOT IN (
+            SELECT MIN(id) FROM cart WHERE product_id IS NOT NULL GROUP BY user_id, product_id
+        )
+    """)
+    op.create_index('uq_cart_user_product', 'cart', ['user_id', 'product_id'], unique=True)
+    op.drop_index(op.f('ix_cart_user_id'), table_name='cart')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_cart_user_id'), 'cart', ['user_id'], unique=False)
+    op.drop_index('uq_cart_user_product', table_name='cart')
@@ -0,0 +1,31 @@
+"""Cart line updated_at
+
+Revision ID: c4e1ff701248
+Revises: 897074f2f531
+Create Date: 2026-10-18 20:44:31.907558
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1ff701248'
+down_revision: Union[str, None] = '897074f2f531'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite can't ADD COLUMN with a CURRENT_TIMESTAMP default, so the table is rebuilt;
+    # existing lines count as touched now
+    with op.batch_alter_table('cart', recreate='always') as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('cart', 'updated_at')
@@ -0,0 +1,87 @@
+"""Product facet counts
+
+Revision ID: c61c645a9aea
+Revises: 5282b864cfb8
+Create Date: 2026-10-18 20:06:12.481935
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c61c645a9aea'
+down_revision: Union[str, None] = '5282b864cfb8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Default PRODUCT_FACET_PRICE_EDGES and PRODUCT_FACET_PRICE_SLICES; the app rebuilds
+# the table on start when they are configured differently
+EDGES = [0.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0]
+SLICES = 10
+
+
+def slice_highs():
+    highs = []
+    for low, high in zip(EDGES, EDGES[1:]):
+        points = [low + (high - low) * j / SLICES for j in range(SLICES)]
+        highs += points[1:] + [high]
+    return highs
+
+
+def slice_sql(price: str) -> str:
+    highs = slice_highs()
+    whens = " ".join(f"WHEN {price} < {high!r} THEN {k}" for k, high in enumerate(highs))
+    return f"CASE {whens} ELSE {len(highs)} END"
+
+
+def change(row: str, delta: int) -> str:
+    return f"""
+        INSERT INTO product_facets (category, slice, in_stock, products)
+        VALUES (coalesce({row}.category, ''), {slice_sql(f"{row}.price")}, {row}.stock > 0, {delta})
+        ON CONFLICT (category, slice, in_stock) DO UPDATE SET products = products + excluded.products;
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS product_facets (
+            category TEXT NOT NULL,
+            slice INTEGER NOT NULL,
+            in_stock INTEGER NOT NULL,
+            products INTEGER NOT NULL,
+            PRIMARY KEY (category, slice, in_stock)
+        ) WITHOUT ROWID
+    """)
+    op.execute(f"CREATE TRIGGER product_facets_ai AFTER INSERT ON products BEGIN {change('new', 1)} END")
+    op.execute(f"CREATE TRIGGER product_facets_ad AFTER DELETE ON products BEGIN {change('old', -1)} END")
+    op.execute(f"""
+        CREATE TRIGGER product_facets_au AFTER UPDATE OF category, price, stock ON products
+        WHEN coalesce(old.category, '') != coalesce(new.category, '')
+            OR (old.price != new.price AND {slice_sql("old.price")} != {slice_sql("new.price")})
+            OR (old.stock > 0) != (new.stock > 0)
+        BEGIN {change('old', -1)} {change('new', 1)} END
+    """)
+    op.execute("DELETE FROM product_facets")
+    op.execute(f"""
+        INSERT INTO product_facets (category, slice, in_stock, products)
+        SELECT coalesce(category, ''), {slice_sql("price")}, stock > 0, count(*)
+        FROM products GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS product_facets_au")
+    op.execute("DROP TRIGGER IF EXISTS product_facets_ad")
+    op.execute("DROP TRIGGER IF EXISTS product_facets_ai")
+    op.execute("DROP TABLE IF EXISTS product_facets")
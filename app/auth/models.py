@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -29,3 +29,17 @@ class PasswordResetToken(Base):
     used = Column(Boolean, default=False)
 
     user = relationship("User", back_populates="reset_tokens")
+
+
+class RevokedToken(Base):
+    """A refresh token already exchanged (its jti), or a revoked token family: every
+    token rotated from one signin. Kept until the tokens it covers have expired."""
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True)
+    token_id = Column(String, nullable=False, unique=True)
+    is_family = Column(Boolean, default=False, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    # Workers load newly revoked families by id
+    __table_args__ = (Index("ix_revoked_tokens_family", "is_family", "id"),)
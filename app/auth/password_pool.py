@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from app.auth import utils
+from app.core.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE
+
+logger = logging.getLogger("ecommerce_logger")
+
+# bcrypt runs in its own processes so a login burst uses every core without
+# starving the request threadpool. Jobs beyond workers + queue are refused.
+_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+_executor = None
+
+_stats = {
+    "in_flight": 0,
+    "completed": 0,
+    "rejected": 0,
+    "failed": 0,
+    "latency_seconds_total": 0.0,
+    "latency_seconds_max": 0.0,
+}
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        return _executor
+
+
+def _finished(started, failed):
+    elapsed = time.perf_counter() - started
+    with _lock:
+        _stats["in_flight"] -= 1
+        if failed:
+            _stats["failed"] += 1
+        else:
+            _stats["completed"] += 1
+            _stats["latency_seconds_total"] += elapsed
+            _stats["latency_seconds_max"] = max(_stats["latency_seconds_max"], elapsed)
+    _slots.release()
+
+
+def submit(fn, *args):
+    if not _slots.acquire(blocking=False):
+        with _lock:
+            _stats["rejected"] += 1
+        logger.warning("Password hashing queue full, rejecting request")
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+    with _lock:
+        _stats["in_flight"] += 1
+    started = time.perf_counter()
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _finished(started, failed=True)
+        raise
+    future.add_done_callback(lambda f: _finished(started, f.cancelled() or f.exception() is not None))
+    return future
+
+
+async def hash_password(password: str) -> str:
+    return await asyncio.wrap_future(submit(utils.hash_password, password))
+
+
+async def verify_and_update(plain: str, hashed: str):
+    return await asyncio.wrap_future(submit(utils.verify_and_update, plain, hashed))
+
+
+def pool_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    done = stats["completed"]
+    stats["latency_seconds_avg"] = stats["latency_seconds_total"] / done if done else 0.0
+    stats["workers"] = PASSWORD_HASH_WORKERS
+    stats["queue_limit"] = PASSWORD_HASH_QUEUE
+    return stats
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
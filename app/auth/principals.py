@@ -0,0 +1,72 @@
+import time
+from dataclasses import dataclass
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.auth import models
+from app.core.cache import TTLCache
+from app.core.config import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL
+from app.core.signals import Channel
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    name: str
+    email: str
+    role: str
+
+
+# token -> (email, exp, family): repeat requests skip the JWT signature check
+token_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+# email -> Principal: repeat requests skip the users lookup. A changed or deleted user
+# is dropped in every worker; tokens never change, so token_cache stays per worker.
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL, channel=Channel("principals"))
+
+
+def from_user(user: models.User) -> Principal:
+    role = user.role.value if isinstance(user.role, models.RoleEnum) else user.role
+    return Principal(id=user.id, name=user.name, email=user.email, role=role)
+
+
+def cached_token(token: str):
+    # (email, family) of a token seen before and not expired, else None
+    entry = token_cache.get(token)
+    if entry is None:
+        return None
+    email, exp, family = entry
+    if exp is not None and exp <= time.time():
+        token_cache.delete(token)
+        return None
+    return email, family
+
+
+def remember_token(token: str, email: str, exp, family=None):
+    token_cache.set(token, (email, exp, family))
+
+
+def invalidate_user(email: str):
+    principal_cache.delete(email)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _user_changed(mapper, connection, target):
+    # Flush time, before commit: a request reading the user now still gets the old row
+    # and could cache it under a fresh generation. The emails wait for the commit.
+    emails = Session.object_session(target).info.setdefault("changed_principals", set())
+    emails.add(target.email)
+    # An email change leaves the old address cached as well
+    emails.update(inspect(target).attrs.email.history.deleted or ())
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_changed_users(session):
+    for email in session.info.pop("changed_principals", ()):
+        invalidate_user(email)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _keep_changed_users(session, previous_transaction):
+    # Rolled back: the cached principals are still the committed rows
+    if not session.in_transaction():
+        session.info.pop("changed_principals", None)
@@ -0,0 +1,226 @@
+"""Refresh token rotation: exchanged tokens and revoked token families.
+
+Exchanging a refresh token inserts its jti into revoked_tokens. The unique key makes
+that one atomic step across workers, so of two uses of the same token exactly one
+wins and the other is caught as reuse. Reuse revokes the token's family, which also
+ends the access tokens issued along with it.
+
+Families are checked on every authenticated request, so each worker keeps the revoked
+ones in a Bloom filter: a family that was never revoked is answered from memory, and
+only a match (a revoked family, or a false positive about REVOKED_FAMILY_ERROR_RATE
+of the time) is confirmed in the table. Revocations are announced to the other
+workers, which load the new rows on their next check. Rows are purged once the
+tokens they cover have expired, and the filter is rebuilt from what is left.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from app.auth.models import RevokedToken
+from app.auth.utils import REFRESH_TOKEN_LIFETIME
+from app.core.config import REVOKED_FAMILY_CAPACITY, REVOKED_FAMILY_ERROR_RATE, REVOKED_TOKEN_PURGE_INTERVAL
+from app.core.database import SessionLocal
+from app.core.signals import Channel
+
+logger = logging.getLogger("ecommerce_logger")
+
+channel = Channel("revoked_tokens")
+
+
+class BloomFilter:
+    """Set of strings in a fixed bit array: never a false negative, false positives
+    about `error_rate` of the time while it holds up to `capacity` keys."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Double hashing: every bit position from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+_lock = threading.Lock()
+_stats = {
+    "checks": 0,
+    "filter_matches": 0,
+    "false_positives": 0,
+    "exchanged": 0,
+    "reuse_detected": 0,
+    "families_revoked": 0,
+    "reloads": 0,
+    "purged": 0,
+}
+
+_filter = None
+# Highest revoked_tokens id loaded into the filter, and the channel stamp it was loaded at
+_last_id = 0
+_seen = None
+# Families the filter matched but the table doesn't hold, so they aren't looked up again
+_cleared = set()
+_task = None
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+def revocation_stats():
+    with _lock:
+        stats = dict(_stats)
+    revoked = _filter
+    stats["families"] = revoked.count if revoked is not None else 0
+    stats["filter_bytes"] = len(revoked.bits) if revoked is not None else 0
+    return stats
+
+
+def family_rows(session, after_id: int):
+    # (id, token_id) of families still revoked, newer than after_id
+    return session.execute(
+        select(RevokedToken.id, RevokedToken.token_id)
+        .where(RevokedToken.is_family.is_(True), RevokedToken.id > after_id, RevokedToken.expires_at > utcnow())
+        .order_by(RevokedToken.id)
+    ).all()
+
+
+def remember(rows):
+    # Rows in id order; requests that loaded the same rows concurrently add them only once
+    global _last_id
+    for row_id, family in rows:
+        if row_id <= _last_id:
+            continue
+        _filter.add(family)
+        _cleared.discard(family)
+        _last_id = row_id
+
+
+async def sync(db):
+    # Everything on first use, afterwards only what was revoked since another worker's announcement
+    global _filter, _seen
+    stamp = channel.read()
+    if _filter is not None and stamp == _seen:
+        return
+    if _filter is None:
+        _filter = BloomFilter(REVOKED_FAMILY_CAPACITY, REVOKED_FAMILY_ERROR_RATE)
+    remember(await db.run_sync(family_rows, _last_id))
+    _seen = stamp
+    count("reloads")
+
+
+async def is_family_revoked(db, family: str) -> bool:
+    await sync(db)
+    count("checks")
+    if family not in _filter or family in _cleared:
+        return False
+    count("filter_matches")
+    revoked = await db.scalar(
+        select(RevokedToken.id).where(RevokedToken.token_id == family, RevokedToken.is_family.is_(True))
+    ) is not None
+    if not revoked:
+        count("false_positives")
+        _cleared.add(family)
+    return revoked
+
+
+async def exchange(db, jti: str, expires_at: datetime) -> bool:
+    """Marks a refresh token used. False when it already was, i.e. the token was replayed."""
+    def write(session):
+        # Statement and commit in one call, like the cart and checkout writes
+        try:
+            session.execute(insert(RevokedToken).values(token_id=jti, is_family=False, expires_at=expires_at))
+            session.commit()
+            return True
+        except IntegrityError:
+            session.rollback()
+            return False
+
+    exchanged = await db.run_sync(write)
+    count("exchanged" if exchanged else "reuse_detected")
+    return exchanged
+
+
+async def revoke_family(db, family: str):
+    # Kept until the last refresh token the family could have been issued expires
+    expires_at = utcnow() + REFRESH_TOKEN_LIFETIME
+
+    def write(session):
+        try:
+            session.execute(insert(RevokedToken).values(token_id=family, is_family=True, expires_at=expires_at))
+            session.commit()
+        except IntegrityError:
+            session.rollback()  # revoked already
+
+    await sync(db)
+    await db.run_sync(write)
+    _filter.add(family)
+    _cleared.discard(family)
+    channel.publish()
+    count("families_revoked")
+
+
+def purge_expired():
+    # Deletes rows whose tokens have all expired, then reads the families still revoked
+    with SessionLocal() as session:
+        purged = session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= utcnow())).rowcount
+        session.commit()
+        return purged, family_rows(session, 0)
+
+
+async def rebuild():
+    global _filter, _last_id, _seen
+    purged, rows = await run_in_threadpool(purge_expired)
+    fresh = BloomFilter(REVOKED_FAMILY_CAPACITY, REVOKED_FAMILY_ERROR_RATE)
+    for _, family in rows:
+        fresh.add(family)
+    # _seen reset: the next check also loads families revoked while the rows were read
+    _filter, _last_id, _seen = fresh, max((row_id for row_id, _ in rows), default=0), None
+    _cleared.clear()
+    count("purged", purged)
+
+
+async def _run():
+    while True:
+        try:
+            await rebuild()
+        except Exception as e:
+            logger.error(f"Revoked token purge failed: {repr(e)}")
+        await asyncio.sleep(REVOKED_TOKEN_PURGE_INTERVAL)
+
+
+def start():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.auth import schemas, utils, models, email_utils
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from app.auth import schemas, utils, models, email_utils, password_pool, revocation
 from jose import JWTError, jwt
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import datetime, timezone
-from app.utils.dependency import get_db
+from app.utils.dependency import get_db, load_principal
+from app.emails import outbox
 
 import logging
 logger = logging.getLogger("ecommerce_logger")
@@ -12,17 +14,16 @@ logger = logging.getLogger("ecommerce_logger")
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 @router.post("/signup", status_code=201)
-def signup(data: schemas.Signup, db: Session = Depends(get_db)):
+async def signup(data: schemas.Signup, db: AsyncSession = Depends(get_db)):
     try:
-        if db.query(models.User).filter_by(email=data.email).first():
+        if await db.scalar(select(models.User).filter_by(email=data.email)):
             logger.warning(f"Signup failed: Email already exists - {data.email}")
             raise HTTPException(status_code=400, detail="Email already exists")
 
-        hashed_pw = utils.hash_password(data.password)
+        hashed_pw = await password_pool.hash_password(data.password)
         user = models.User(name=data.name, email=data.email, hashed_password=hashed_pw, role=data.role)
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
         logger.info(f"User signed up successfully - {data.email}")
         return {"message": "User created successfully"}
     
@@ -33,18 +34,33 @@ def signup(data: schemas.Signup, db: Session = Depends(get_db)):
         logger.error(f"Signup error: {str(e)}")
         raise HTTPException(status_code=500, detail="Something went wrong during signup")
 
+def token_pair(email: str, role, family: str):
+    # Every pair rotated from one signin shares its family
+    return {
+        "access_token": utils.create_access_token(data={"sub": email, "role": role, "fam": family}),
+        "refresh_token": utils.create_refresh_token(data={"sub": email, "fam": family}),
+    }
+
 @router.post("/signin", response_model=schemas.Token)
-def signin(data: schemas.Signin, db: Session = Depends(get_db)):
+async def signin(data: schemas.Signin, db: AsyncSession = Depends(get_db)):
     try:
-        user = db.query(models.User).filter_by(email=data.email).first()
-        if not user or not utils.verify_password(data.password, user.hashed_password):
+        user = await db.scalar(select(models.User).filter_by(email=data.email))
+        if not user:
+            logger.warning(f"Signin failed: Invalid credentials for {data.email}")
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+
+        valid, new_hash = await password_pool.verify_and_update(data.password, user.hashed_password)
+        if not valid:
             logger.warning(f"Signin failed: Invalid credentials for {data.email}")
             raise HTTPException(status_code=401, detail="Invalid credentials")
+        if new_hash:
+            # Stored hash uses an outdated bcrypt cost
+            user.hashed_password = new_hash
+            await db.commit()
+            logger.info(f"Password rehashed with current cost for {data.email}")
 
-        access_token = utils.create_access_token(data={"sub": user.email, "role": user.role})
-        refresh_token = utils.create_refresh_token(data={"sub": user.email})
         logger.info(f"User signed in: {data.email}")
-        return {"access_token": access_token, "refresh_token": refresh_token}
+        return token_pair(user.email, user.role, utils.new_token_id())
     
     except HTTPException as http_exc:
          raise http_exc
@@ -54,17 +70,54 @@ def signin(data: schemas.Signin, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Something went wrong during signin")
 
 
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh(data: schemas.RefreshRequest, db: AsyncSession = Depends(get_db)):
+    # Exchanges a refresh token for a new pair without a password check. Each refresh
+    # token works once; presenting one again revokes every token of its family.
+    try:
+        try:
+            payload = jwt.decode(data.refresh_token, utils.SECRET_KEY, algorithms=[utils.ALGORITHM])
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        email, jti, family = payload.get("sub"), payload.get("jti"), payload.get("fam")
+        if payload.get("token_type") != "refresh" or not (email and jti and family):
+            raise HTTPException(status_code=401, detail="Invalid token type")
+
+        if await revocation.is_family_revoked(db, family):
+            logger.warning(f"Refresh failed: Token family revoked for {email}")
+            raise HTTPException(status_code=401, detail="Refresh token revoked")
+        expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+        if not await revocation.exchange(db, jti, expires_at):
+            await revocation.revoke_family(db, family)
+            logger.warning(f"Refresh token reuse detected for {email}, token family revoked")
+            raise HTTPException(status_code=401, detail="Refresh token revoked")
+
+        principal = await load_principal(db, email)
+        logger.info(f"Tokens refreshed for {email}")
+        return token_pair(principal.email, principal.role, family)
+
+    except HTTPException as http_exc:
+         raise http_exc
+
+    except Exception as e:
+        logger.error(f"Refresh error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Something went wrong during token refresh")
+
+
 @router.post("/forgot-password")
-def forgot_password(data: schemas.ForgotPasswordRequest, db: Session = Depends(get_db)):
+async def forgot_password(data: schemas.ForgotPasswordRequest, db: AsyncSession = Depends(get_db)):
     try:
-        user = db.query(models.User).filter_by(email=data.email).first()
+        user = await db.scalar(select(models.User).filter_by(email=data.email))
         if not user:
             logger.warning(f"Forgot password: Email not found - {data.email}")
             raise HTTPException(status_code=404, detail="Email not found. Please check and try again.")
 
-        reset_token = utils.create_and_store_password_reset_token(db, user)
-        email_utils.send_reset_email(user.email, reset_token)
-        logger.info(f"Reset token sent to {user.email}")
+        # Token and email commit together; the worker delivers the email
+        reset_token = utils.create_password_reset_token(db, user)
+        email_utils.queue_reset_email(db, user.email, reset_token)
+        await db.commit()
+        outbox.notify()
+        logger.info(f"Reset token email queued for {user.email}")
         return {"message": "If the email is registered, a reset token has been sent to your email."}
     
     except HTTPException as http_exc:
@@ -75,9 +128,13 @@ def forgot_password(data: schemas.ForgotPasswordRequest, db: Session = Depends(g
         raise HTTPException(status_code=500, detail="Something went wrong during forgot password")
 
 @router.post("/reset-password")
-def reset_password(data: schemas.ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(data: schemas.ResetPasswordRequest, db: AsyncSession = Depends(get_db)):
     try:
-        db_token = db.query(models.PasswordResetToken).filter_by(token=data.token).first()
+        db_token = await db.scalar(
+            select(models.PasswordResetToken)
+            .options(joinedload(models.PasswordResetToken.user))
+            .filter_by(token=data.token)
+        )
         if not db_token:
             logger.warning("Reset password: Invalid token")
             raise HTTPException(status_code=400, detail="Invalid token")
@@ -89,10 +146,10 @@ def reset_password(data: schemas.ResetPasswordRequest, db: Session = Depends(get
             raise HTTPException(status_code=400, detail="Token expired")
 
         user = db_token.user
-        hashed_pw = utils.hash_password(data.new_password)
+        hashed_pw = await password_pool.hash_password(data.new_password)
         user.hashed_password = hashed_pw
         db_token.used = True
-        db.commit()
+        await db.commit()
         logger.info(f"Password reset successful for {user.email}")
         return {"message": "Password reset successful"}
     
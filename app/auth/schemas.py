@@ -36,6 +36,9 @@ class Token(BaseModel):
     refresh_token: str
     token_type: str = "bearer"
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class ForgotPasswordRequest(BaseModel):
     email: EmailStr
 
@@ -1,11 +1,18 @@
 from passlib.context import CryptContext 
 from datetime import datetime, timedelta, timezone
 from jose import jwt
-from app.core.config import SECRET_KEY, ALGORITHM
+from app.core.config import SECRET_KEY, ALGORITHM, BCRYPT_ROUNDS
 import secrets
 from app.auth import models
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max to the configured cost makes hashes with any other cost "need update"
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 def hash_password(password: str):
     return pwd_context.hash(password)
@@ -13,13 +20,17 @@ def hash_password(password: str):
 def verify_password(plain, hashed):
     return pwd_context.verify(plain, hashed)
 
+def verify_and_update(plain, hashed):
+    # Returns (valid, new_hash); new_hash is set when the stored cost is outdated
+    return pwd_context.verify_and_update(plain, hashed)
+
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=30)):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + expires_delta
     to_encode.update({"exp": expire, "token_type": "access"})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def create_and_store_password_reset_token(db, user):
+def create_password_reset_token(db, user):
     token = secrets.token_urlsafe(32)  # Secure random token
     expiration = datetime.now(timezone.utc) + timedelta(minutes=5)
 
@@ -29,17 +40,24 @@ def create_and_store_password_reset_token(db, user):
         expiration_time=expiration,
         used=False
     )
-    db.add(reset_token)
-    db.commit()
-    db.refresh(reset_token)
+    db.add(reset_token)  # committed by the caller
 
     return token
 
 
-def create_refresh_token(data: dict, expires_delta: timedelta = timedelta(days=7)):
+REFRESH_TOKEN_LIFETIME = timedelta(days=7)
+
+
+def new_token_id():
+    return secrets.token_hex(16)
+
+
+def create_refresh_token(data: dict, expires_delta: timedelta = REFRESH_TOKEN_LIFETIME):
+    # jti names this token so it can be exchanged only once; the caller's "fam" claim is
+    # shared by every token rotated from the same signin
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + expires_delta
-    to_encode.update({"exp": expire, "token_type": "refresh"})
+    to_encode.update({"exp": expire, "token_type": "refresh", "jti": new_token_id()})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, DateTime, Integer, ForeignKey, Index, func
 from app.core.database import Base
 from sqlalchemy.orm import relationship
 
@@ -6,8 +6,15 @@ class CartItem(Base):
     __tablename__ = "cart"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True)
+    user_id = Column(Integer)
     product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"))
     quantity = Column(Integer, nullable=False)
+    # Last change to the line (UTC); the maintenance scheduler empties carts left untouched
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
      
-    product = relationship("Product", back_populates="cart_items")
\ No newline at end of file
+    product = relationship("Product", back_populates="cart_items")
+
+
+# One line per product per cart, the conflict target of the add-to-cart upsert.
+# Also serves user_id lookups, so there is no separate user_id index.
+Index("uq_cart_user_product", CartItem.user_id, CartItem.product_id, unique=True)
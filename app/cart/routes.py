@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException 
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException
+from sqlalchemy import bindparam, delete, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.cart import models, schemas
+from app.core.config import FAST_JSON
+from app.core.database import dialect_insert
 from app.utils.dependency import get_db, require_user
+from app.utils import serialization
 from app.products.models import Product
 import logging
 
@@ -9,38 +13,58 @@ logger = logging.getLogger("ecommerce_logger")
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
+# Columns selected by the FAST_JSON path, in CartItemOut field order
+CART_OUT_FIELDS, CART_OUT_COLUMNS = serialization.model_columns(schemas.CartItemOut, models.CartItem.__table__)
+
+
+def add_statement(user_id: int, product_id: int, quantity: int):
+    """INSERT the line, or add to its quantity, only while the total stays within stock.
+
+    A single statement, so concurrent adds for the same line serialize on the write lock
+    and none is lost. Returns no row when the product is missing or short of stock."""
+    cart = models.CartItem.__table__
+    statement = dialect_insert(cart).from_select(
+        ["user_id", "product_id", "quantity"],
+        select(literal(user_id), Product.id, literal(quantity)).where(Product.id == product_id, Product.stock >= quantity),
+    )
+    new_quantity = cart.c.quantity + statement.excluded.quantity
+    return statement.on_conflict_do_update(
+        index_elements=[cart.c.user_id, cart.c.product_id],
+        set_={"quantity": new_quantity, "updated_at": func.now()},
+        where=new_quantity <= select(Product.stock).where(Product.id == product_id).scalar_subquery(),
+    ).returning(cart.c.id, cart.c.product_id, cart.c.quantity)
+
 
 @router.post("/", response_model=schemas.CartItemOut)
-def add_to_cart(
+async def add_to_cart(
     data: schemas.CartItemCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user=Depends(require_user)
 ):
-    try:
-        product = db.query(Product).filter_by(id=data.product_id).first()
-        if not product:
-            logger.warning(f"Add to cart failed: Product not found (ID: {data.product_id})")
-            raise HTTPException(status_code=404, detail="Product not found")
+    def add(session):
+        # Statement and commit in one call: with DB_ASYNC=false a commit queued for its own
+        # threadpool slot could wait behind threads blocked on the write lock it holds
+        row = session.execute(add_statement(user.id, data.product_id, data.quantity)).first()
+        if row is None:
+            session.rollback()
+        else:
+            session.commit()
+        return row
 
-        if product.stock == 0:
-            raise HTTPException(status_code=400, detail="Product is out of stock")
+    try:
+        item = await db.run_sync(add)
+        if item is None:
+            # Only the failure path pays for a second look, to say what was wrong
+            stock = await db.scalar(select(Product.stock).where(Product.id == data.product_id))
+            if stock is None:
+                logger.warning(f"Add to cart failed: Product not found (ID: {data.product_id})")
+                raise HTTPException(status_code=404, detail="Product not found")
+            if stock == 0:
+                raise HTTPException(status_code=400, detail="Product is out of stock")
+            raise HTTPException(status_code=400, detail="Not enough stock available")
 
-        item = db.query(models.CartItem).filter_by(user_id=user.id, product_id=data.product_id).first()
-        if item:
-            if item.quantity + data.quantity > product.stock:
-                raise HTTPException(status_code=400, detail="Not enough stock available")
-            item.quantity += data.quantity
-            logger.info(f"Updated cart item quantity for user {user.id}, product {data.product_id}")
-        else:
-            if data.quantity > product.stock:
-                raise HTTPException(status_code=400, detail="Not enough stock available")
-            item = models.CartItem(user_id=user.id, **data.model_dump())
-            db.add(item)
-            logger.info(f"Added new item to cart for user {user.id}, product {data.product_id}")
-
-        db.commit()
-        db.refresh(item)
-        return item
+        logger.info(f"Cart line for user {user.id}, product {data.product_id} now at {item.quantity}")
+        return item._mapping
 
     except HTTPException as http_exc:
         raise http_exc
@@ -51,12 +75,17 @@ def add_to_cart(
 
 
 @router.get("/", response_model=list[schemas.CartItemOut])
-def view_cart(
-    db: Session = Depends(get_db),
+async def view_cart(
+    db: AsyncSession = Depends(get_db),
     user=Depends(require_user)
 ):
     try:
-        cart_items = db.query(models.CartItem).filter_by(user_id=user.id).all()
+        if FAST_JSON:
+            rows = (await db.execute(select(*CART_OUT_COLUMNS).where(models.CartItem.user_id == user.id))).all()
+            logger.info(f"Fetched cart items for user {user.id}")
+            return serialization.json_response(serialization.dump_rows(CART_OUT_FIELDS, rows))
+
+        cart_items = (await db.scalars(select(models.CartItem).filter_by(user_id=user.id))).all()
         logger.info(f"Fetched cart items for user {user.id}")
         return cart_items
     except Exception as e:
@@ -64,20 +93,140 @@ def view_cart(
         raise HTTPException(status_code=500, detail="Something went wrong while fetching the cart")
 
 
+async def load_stock(db, product_ids):
+    # One IN query for every product a batch touches
+    if not product_ids:
+        return {}
+    rows = await db.execute(select(Product.id, Product.stock).where(Product.id.in_(product_ids)))
+    return dict(rows.all())
+
+
+def check_stock(quantities: dict, stock: dict):
+    missing = sorted(product_id for product_id in quantities if product_id not in stock)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Products not found: {', '.join(map(str, missing))}")
+    short = sorted(product_id for product_id, quantity in quantities.items() if quantity > stock[product_id])
+    if short:
+        raise HTTPException(status_code=400, detail=f"Not enough stock available for products: {', '.join(map(str, short))}")
+
+
+async def load_cart(db, user_id):
+    # {product_id: quantity}
+    rows = await db.execute(select(models.CartItem.product_id, models.CartItem.quantity).filter_by(user_id=user_id))
+    return dict(rows.all())
+
+
+async def apply_quantities(db, user_id, cart: dict, quantities: dict):
+    """Make the user's cart hold `quantities` ({product_id: quantity}, 0 removes the line)
+    and return it. At most one DELETE, one UPDATE and one INSERT (executemany) however
+    many lines change; the ORM would insert row by row here to fetch each new id."""
+    table = models.CartItem.__table__
+    removed = [product_id for product_id, quantity in quantities.items() if quantity <= 0 and product_id in cart]
+    changed = [
+        {"b_product_id": product_id, "b_quantity": quantity}
+        for product_id, quantity in quantities.items()
+        if quantity > 0 and product_id in cart and cart[product_id] != quantity
+    ]
+    added = [
+        {"user_id": user_id, "product_id": product_id, "quantity": quantity}
+        for product_id, quantity in quantities.items()
+        if quantity > 0 and product_id not in cart
+    ]
+    if removed:
+        await db.execute(delete(table).where(table.c.user_id == user_id, table.c.product_id.in_(removed)))
+    if changed:
+        await db.execute(
+            update(table)
+            .where(table.c.user_id == user_id, table.c.product_id == bindparam("b_product_id"))
+            .values(quantity=bindparam("b_quantity")),
+            changed,
+        )
+    if added:
+        # A line added concurrently since `cart` was read is overwritten, not duplicated
+        statement = dialect_insert(table)
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.product_id],
+                set_={"quantity": statement.excluded.quantity, "updated_at": func.now()},
+            ),
+            added,
+        )
+    await db.commit()
+    return (await db.scalars(select(models.CartItem).filter_by(user_id=user_id).order_by(models.CartItem.id))).all()
+
+
+@router.put("/items", response_model=list[schemas.CartItemOut])
+async def set_cart(
+    lines: list[schemas.CartItemCreate] = Body(..., max_length=schemas.MAX_BATCH_LINES),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_user)
+):
+    # Replaces the whole cart (e.g. syncing one kept in local storage): lines not listed are removed
+    try:
+        quantities = {line.product_id: line.quantity for line in lines}
+        if len(quantities) != len(lines):
+            raise HTTPException(status_code=400, detail="Each product may appear only once")
+
+        check_stock(quantities, await load_stock(db, list(quantities)))
+        cart = await load_cart(db, user.id)
+        for product_id in cart:
+            quantities.setdefault(product_id, 0)
+
+        items = await apply_quantities(db, user.id, cart, quantities)
+        logger.info(f"Replaced cart for user {user.id} ({len(items)} items)")
+        return items
+
+    except HTTPException as http_exc:
+        raise http_exc
+
+    except Exception as e:
+        logger.error(f"Error replacing cart for user {user.id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Something went wrong while updating the cart")
+
+
+@router.post("/items:batch", response_model=list[schemas.CartItemOut])
+async def batch_update_cart(
+    data: schemas.CartBatch,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_user)
+):
+    # Adds (summed per product, on top of what is in the cart) and removals, all or nothing
+    try:
+        cart = await load_cart(db, user.id)
+        quantities = {product_id: 0 for product_id in data.remove}
+        for line in data.add:
+            quantities[line.product_id] = quantities.get(line.product_id, cart.get(line.product_id, 0)) + line.quantity
+
+        check_stock(
+            {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0},
+            await load_stock(db, [line.product_id for line in data.add]),
+        )
+        items = await apply_quantities(db, user.id, cart, quantities)
+        logger.info(f"Batch cart update for user {user.id}: {len(data.add)} added, {len(data.remove)} removed")
+        return items
+
+    except HTTPException as http_exc:
+        raise http_exc
+
+    except Exception as e:
+        logger.error(f"Error updating cart for user {user.id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Something went wrong while updating the cart")
+
+
 @router.delete("/{product_id}")
-def remove_item(
+async def remove_item(
     product_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user=Depends(require_user)
 ):
     try:
-        item = db.query(models.CartItem).filter_by(user_id=user.id, product_id=product_id).first()
+        item = await db.scalar(select(models.CartItem).filter_by(user_id=user.id, product_id=product_id))
         if not item:
             logger.warning(f"Remove failed: Item not found in cart (User: {user.id}, Product: {product_id})")
             raise HTTPException(status_code=404, detail="Item not in cart")
 
-        db.delete(item)
-        db.commit()
+        await db.delete(item)
+        await db.commit()
         logger.info(f"Removed item from cart (User: {user.id}, Product: {product_id})")
         return {"message": "Item removed"}
 
@@ -90,19 +239,19 @@ def remove_item(
 
 
 @router.put("/{product_id}", response_model=schemas.CartItemOut)
-def update_quantity(
+async def update_quantity(
     product_id: int,
     data: schemas.CartItemUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user=Depends(require_user)
 ):
     try:
-        item = db.query(models.CartItem).filter_by(user_id=user.id, product_id=product_id).first()
+        item = await db.scalar(select(models.CartItem).filter_by(user_id=user.id, product_id=product_id))
         if not item:
             logger.warning(f"Update failed: Item not found in cart (User: {user.id}, Product: {product_id})")
             raise HTTPException(status_code=404, detail="Item not in cart")
 
-        product = db.query(Product).filter_by(id=product_id).first()
+        product = await db.get(Product, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
@@ -110,8 +259,7 @@ def update_quantity(
             raise HTTPException(status_code=400, detail="Not enough stock available")
 
         item.quantity = data.quantity
-        db.commit()
-        db.refresh(item)
+        await db.commit()
         logger.info(f"Updated quantity for cart item (User: {user.id}, Product: {product_id})")
         return item
 
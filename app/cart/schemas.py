@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
 
+MAX_BATCH_LINES = 200
+
 class CartItemBase(BaseModel):
     product_id: int
     quantity: int=Field(..., gt=0, description="enter valid quantity")
@@ -16,3 +18,7 @@ class CartItemOut(CartItemBase):
     model_config = {
         "from_attributes": True
     }
+
+class CartBatch(BaseModel):
+    add: list[CartItemCreate] = Field(default_factory=list, max_length=MAX_BATCH_LINES)
+    remove: list[int] = Field(default_factory=list, max_length=MAX_BATCH_LINES)
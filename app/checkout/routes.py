@@ -1,63 +1,137 @@
 from fastapi import APIRouter, Depends, HTTPException, status  
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils.dependency import get_db, require_user
 from app.cart.models import CartItem
 from app.products.models import Product
 from app.orders.models import Order, OrderItem, OrderStatus
+from app.products.cache import invalidate_stock
+from app.inventory import hot as hot_stock
+from app.inventory.models import StockShard
+from app.reports import rollups
+from app.checkout import writer
 
 router = APIRouter(prefix="/checkout", tags=["Checkout"])
 
 
+def place_order(session, user_id, cart_items, quantities, products, cold, reserved, total):
+    """The order's writes, in one call on the sync session: the write lock is taken by
+    the first statement and held until commit without going back to the event loop."""
+    # Conditional decrement: a line only applies while enough unreserved stock is left
+    # (units in hot stock shards belong to their workers), so concurrent checkouts
+    # cannot oversell. Any short line fails the whole order.
+    if cold:
+        allotted = (
+            select(func.coalesce(func.sum(StockShard.allotted), 0))
+            .where(StockShard.product_id == Product.id)
+            .scalar_subquery()
+        )
+        decremented = session.execute(
+            update(Product.__table__)
+            .where(Product.id == bindparam("product_id"), Product.stock - allotted >= bindparam("quantity"))
+            .values(stock=Product.stock - bindparam("quantity")),
+            [{"product_id": product_id, "quantity": quantity} for product_id, quantity in cold.items()]
+        )
+        if decremented.rowcount != len(cold):
+            session.rollback()
+            raise HTTPException(status_code=400, detail="Product Out of Stock")
+
+    # Payment is simulated inside this transaction, so the order is stored as paid
+    order = Order(user_id=user_id, total_amount=total, status=OrderStatus.PAID)
+    session.add(order)
+    session.flush()
+    order_id = order.id
+
+    session.execute(insert(OrderItem), [
+        {
+            "order_id": order_id,
+            "product_id": product_id,
+            "product_name": products[product_id].name,
+            "quantity": quantity,
+            "price_at_purchase": products[product_id].price,
+        }
+        for product_id, quantity in quantities.items()
+    ])
+    # The admin reports' totals change with the order, in the same transaction
+    rollups.record_orders(session, [(order.created_at.date(), quantities, products, total)])
+    if not hot_stock.record_sales(session, reserved):
+        session.rollback()
+        raise HTTPException(status_code=409, detail="Stock reservation expired, please retry")
+
+    # The cart must still be exactly what was priced; a concurrent checkout of
+    # the same cart loses here instead of placing a duplicate order
+    cleared = session.execute(delete(CartItem).where(CartItem.id.in_([item.id for item in cart_items])))
+    if cleared.rowcount != len(cart_items):
+        session.rollback()
+        raise HTTPException(status_code=409, detail="Cart changed during checkout, please retry")
+
+    session.commit()
+    return order_id
+
+
 @router.post("/")
-def checkout(db: Session = Depends(get_db), user=Depends(require_user)):
+async def checkout(db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+    reserved, sold = None, False
     try:
-        cart_items = db.query(CartItem).filter_by(user_id=user.id).all()
+        cart_items = (await db.execute(
+            select(CartItem.id, CartItem.product_id, CartItem.quantity).filter_by(user_id=user.id)
+        )).all()
         if not cart_items:
             raise HTTPException(status_code=400, detail="Empty Cart")
 
-        total = 0
-
-        # Status initially set to pending
-        order = Order(user_id=user.id, total_amount=0, status=OrderStatus.PENDING)
-        db.add(order)
-        db.flush()
-
+        quantities = {}
         for item in cart_items:
-            product = db.query(Product).filter_by(id=item.product_id).first()
-            if not product or product.stock < item.quantity:
-                raise HTTPException(status_code=400, detail="Product Out of Stock")
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
 
-            product.stock -= item.quantity
-            subtotal = item.quantity * product.price
-            total += subtotal
-
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=item.product_id,
-                product_name=product.name, 
-                quantity=item.quantity,
-                price_at_purchase=product.price
-            )
-            db.add(order_item)
+        # One batched read for names and prices instead of a SELECT per line
+        products = {
+            row.id: row for row in (await db.execute(
+                select(Product.id, Product.name, Product.price, Product.stock)
+                .where(Product.id.in_(quantities))
+            )).all()
+        }
+        # Hot products sell from this worker's in-memory stock shard; the rest are
+        # decremented in products.stock by the order's transaction
+        hot = {product_id: quantity for product_id, quantity in quantities.items() if hot_stock.is_hot(product_id)}
+        cold = {product_id: quantity for product_id, quantity in quantities.items() if product_id not in hot}
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if not product or (product_id in cold and product.stock < quantity):
+                raise HTTPException(status_code=400, detail="Product Out of Stock")
+        if hot:
+            reserved = await hot_stock.reserve(hot)
+            if reserved is None:
+                raise HTTPException(status_code=400, detail="Product Out of Stock")
 
-        order.total_amount = total
-        order.status = OrderStatus.PAID  # Update status after successful payment
-        db.query(CartItem).filter_by(user_id=user.id).delete()
-        db.commit()
+        total = sum(quantity * products[product_id].price for product_id, quantity in quantities.items())
+        if not cold:
+            # Nothing left that can run out: the order joins the next group commit,
+            # which also settles the reservation. Ending the read transaction hands the
+            # connection back to the pool while the order waits for its batch.
+            await db.rollback()
+            taken, reserved = reserved, None
+            order_id = await writer.place(user.id, cart_items, quantities, products, taken, total)
+        else:
+            order_id = await db.run_sync(place_order, user.id, cart_items, quantities, products, cold, reserved, total)
+        sold = True
+        invalidate_stock(cold)
 
         return {
             "message": "Order Placed successfully",
-            "order_id": order.id,
+            "order_id": order_id,
             "total": total,
-            "status": order.status.value
+            "status": OrderStatus.PAID.value
         }
     
     except HTTPException as http_exc:
          raise http_exc
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Checkout failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+    finally:
+        hot_stock.finish(reserved, sold)
@@ -0,0 +1,163 @@
+"""Group commit for orders whose stock is already reserved in hot stock shards.
+
+Such orders cannot fail on stock, so instead of each taking SQLite's write lock in
+turn, checkouts queue them here and one task writes everything queued so far in a
+single transaction, a few set-based statements per batch.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select
+from app.core.config import HOT_CHECKOUT_BATCH_SIZE
+from app.cart.models import CartItem
+from app.inventory import hot as hot_stock
+from app.inventory.models import ShardSale, StockShard
+from app.orders.models import Order, OrderItem, OrderStatus
+from app.reports import rollups
+from app.utils.dependency import open_db
+
+logger = logging.getLogger("ecommerce_logger")
+
+_queue = []
+_wakeup = None
+_task = None
+_stopping = False
+
+
+class PendingOrder:
+    def __init__(self, user_id, cart_items, quantities, products, reserved, total):
+        self.user_id = user_id
+        self.cart_items = cart_items
+        self.quantities = quantities
+        self.products = products
+        self.reserved = reserved
+        self.total = total
+        self.future = asyncio.get_running_loop().create_future()
+
+
+def write_batch(session, batch):
+    """Write the batch in one transaction. Returns, per order, its id or the
+    HTTPException that refused it."""
+    cart = CartItem.__table__
+    # The first statement takes the write lock, so the checks below hold until commit.
+    # The cart must still be exactly what was priced: a concurrent checkout of the
+    # same cart loses here instead of placing a duplicate order.
+    deleted = {
+        row.id: row._mapping for row in session.execute(
+            delete(cart)
+            .where(cart.c.id.in_({item.id for order in batch for item in order.cart_items}))
+            .returning(*cart.c)
+        )
+    }
+    shard_ids = {shard_id for order in batch for _, shard_id, _ in order.reserved}
+    live_shards = set(session.scalars(select(StockShard.id).where(StockShard.id.in_(shard_ids))))
+
+    results, accepted = [], []
+    for order in batch:
+        item_ids = [item.id for item in order.cart_items]
+        if not all(item_id in deleted for item_id in item_ids):
+            results.append(HTTPException(status_code=409, detail="Cart changed during checkout, please retry"))
+        elif not all(shard_id in live_shards for _, shard_id, _ in order.reserved):
+            results.append(HTTPException(status_code=409, detail="Stock reservation expired, please retry"))
+        else:
+            for item_id in item_ids:
+                del deleted[item_id]
+            accepted.append(order)
+            results.append(None)
+    if deleted:
+        # Lines of refused orders go back as they were
+        session.execute(insert(cart), list(deleted.values()))
+
+    order_ids = []
+    if accepted:
+        orders = Order.__table__
+        # One timestamp for the batch, so every order lands on the sales day it is rolled up under
+        placed_at = datetime.now(timezone.utc)
+        # Payment is simulated inside this transaction, so the orders are stored as paid
+        order_ids = session.scalars(
+            insert(orders).returning(orders.c.id, sort_by_parameter_order=True),
+            [
+                {"user_id": order.user_id, "total_amount": order.total, "status": OrderStatus.PAID, "created_at": placed_at}
+                for order in accepted
+            ],
+        ).all()
+        session.execute(insert(OrderItem.__table__), [
+            {
+                "order_id": order_id,
+                "product_id": product_id,
+                "product_name": order.products[product_id].name,
+                "quantity": quantity,
+                "price_at_purchase": order.products[product_id].price,
+            }
+            for order, order_id in zip(accepted, order_ids)
+            for product_id, quantity in order.quantities.items()
+        ])
+        session.execute(insert(ShardSale.__table__), [
+            {"shard_id": shard_id, "quantity": quantity}
+            for order in accepted
+            for _, shard_id, quantity in order.reserved
+        ])
+        rollups.record_orders(
+            session, [(placed_at.date(), order.quantities, order.products, order.total) for order in accepted]
+        )
+    session.commit()
+
+    order_ids = iter(order_ids)
+    return [next(order_ids) if result is None else result for result in results]
+
+
+async def _run():
+    while True:
+        await _wakeup.wait()
+        _wakeup.clear()
+        while _queue:
+            batch = _queue[:HOT_CHECKOUT_BATCH_SIZE]
+            del _queue[:HOT_CHECKOUT_BATCH_SIZE]
+            try:
+                async with open_db() as db:
+                    results = await db.run_sync(write_batch, batch)
+            except Exception as e:
+                logger.error(f"Writing a batch of {len(batch)} orders failed: {e!r}")
+                results = [e] * len(batch)
+            for order, result in zip(batch, results):
+                sold = not isinstance(result, Exception)
+                hot_stock.finish(order.reserved, sold)
+                if sold:
+                    order.future.set_result(result)
+                else:
+                    order.future.set_exception(result)
+        # Checked with the queue empty and nothing awaited since, so no order is left behind
+        if _stopping:
+            return
+
+
+async def place(user_id, cart_items, quantities, products, reserved, total):
+    """Queue an order for the next batch and wait for it to commit. Returns the order id.
+
+    Takes over `reserved`: the writer settles it, even if the caller is cancelled."""
+    global _wakeup, _task
+    order = PendingOrder(user_id, cart_items, quantities, products, reserved, total)
+    loop = asyncio.get_running_loop()
+    if _task is None or _task.done() or _task.get_loop() is not loop:
+        _wakeup = asyncio.Event()
+        _task = loop.create_task(_run())
+    _queue.append(order)
+    _wakeup.set()
+    return await asyncio.shield(order.future)
+
+
+async def stop():
+    """Write the orders still queued, settling their reservations, then end the writer.
+    Run before hot_stock.stop(), which hands the shards' unsold units back."""
+    global _wakeup, _task, _stopping
+    task = _task
+    if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+        _task = None
+        return
+    _stopping = True
+    _wakeup.set()
+    try:
+        await task
+    finally:
+        _task, _wakeup, _stopping = None, None, False
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    With a `channel` (app.core.signals), invalidations are also announced to the
+    other workers of `python -m app.serve`, and an announcement from another worker
+    empties this cache on its next lookup. The channel can't say which key changed,
+    so a remote delete clears everything.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, channel=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+        self.channel = channel
+        self._seen = 0
+        # Bumped on every invalidation so a reader that loaded data before a write
+        # can tell its value is already stale and skip storing it
+        self.generation = 0
+
+    def _sync(self):
+        # Lock held. Drops everything when another worker has invalidated since the last look.
+        if self.channel is None:
+            return
+        stamp = self.channel.read()
+        if stamp != self._seen:
+            self._seen = stamp
+            self.generation += 1
+            self.remote_invalidations += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def _publish(self):
+        # Lock held. Catch up first so a stamp published just before ours isn't missed.
+        if self.channel is not None:
+            self._sync()
+            self._seen = self.channel.publish()
+
+    def get(self, key):
+        with self._lock:
+            self._sync()
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation=None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._sync()
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key, broadcast: bool = True):
+        with self._lock:
+            if broadcast:
+                self._publish()
+            self.generation += 1
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self, broadcast: bool = True):
+        with self._lock:
+            if broadcast:
+                self._publish()
+            self.generation += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "remote_invalidations": self.remote_invalidations,
+            }
@@ -9,7 +9,142 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 EMAIL_USER = os.getenv("EMAIL_USERNAME")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-EMAIL_FROM = os.getenv("EMAIL_FROM")
-SMTP_SERVER = os.getenv("SMTP_SERVER")
+EMAIL_FROM = os.getenv("EMAIL_FROM") or EMAIL_USER
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587)) 
+# "starttls", "ssl" (implicit TLS, e.g. port 465) or "none" (local test servers)
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", "ssl" if SMTP_PORT == 465 else "starttls").lower()
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 10))
 
+# Email outbox delivery worker
+EMAIL_WORKER_ENABLED = os.getenv("EMAIL_WORKER_ENABLED", "true").lower() in ("1", "true", "yes")
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 50))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", 5))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 6))
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", 30))
+EMAIL_CLAIM_TIMEOUT = float(os.getenv("EMAIL_CLAIM_TIMEOUT", 300))
+
+# Database: the async driver is derived from DATABASE_URL unless ASYNC_DATABASE_URL is set.
+# DB_ASYNC=false serves requests from the sync driver in the threadpool instead (for A/B runs).
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ecommerce.db")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+DB_ASYNC = os.getenv("DB_ASYNC", "true").lower() in ("1", "true", "yes")
+
+# Connection pool (file and server databases; in-memory SQLite keeps its single connection)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))
+
+# SQLite pragmas applied to every new connection. WAL lets readers run alongside the
+# writer, and synchronous=NORMAL is durable in WAL mode short of a power loss
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+# Takes effect when the database file is created; INCREMENTAL lets maintenance return free pages
+SQLITE_AUTO_VACUUM = os.getenv("SQLITE_AUTO_VACUUM", "INCREMENTAL").upper()
+
+# Product catalog read cache (entries are serialized response bodies)
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", 2048))
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", 30))
+
+# List endpoints build their pages from column tuples and encode them with orjson,
+# skipping per-row response model validation; orjson also becomes the default encoder
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() in ("1", "true", "yes")
+
+# Price histogram of GET /products/facets: ascending bucket edges (the last bucket is
+# open-ended), and the slices each bucket's counts are kept in for price bounds between edges
+PRODUCT_FACET_PRICE_EDGES = [
+    float(edge) for edge in os.getenv("PRODUCT_FACET_PRICE_EDGES", "0,25,50,100,250,500,1000,2500,5000").split(",")
+]
+PRODUCT_FACET_PRICE_SLICES = int(os.getenv("PRODUCT_FACET_PRICE_SLICES", 10))
+
+# Bulk product import: rows per upsert statement (and transaction), error rows reported back
+PRODUCT_IMPORT_BATCH_SIZE = int(os.getenv("PRODUCT_IMPORT_BATCH_SIZE", 500))
+PRODUCT_IMPORT_MAX_ERRORS = int(os.getenv("PRODUCT_IMPORT_MAX_ERRORS", 1000))
+
+# Streaming exports: rows fetched from the cursor and written per chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+# Hot-SKU inventory: units each worker reserves per hot product, how often its sales are
+# written through to products.stock, and how long a silent worker keeps its shards
+HOT_STOCK_SHARD_SIZE = int(os.getenv("HOT_STOCK_SHARD_SIZE", 50))
+HOT_STOCK_FLUSH_INTERVAL = float(os.getenv("HOT_STOCK_FLUSH_INTERVAL", 1))
+HOT_STOCK_SHARD_TIMEOUT = float(os.getenv("HOT_STOCK_SHARD_TIMEOUT", 30))
+# Most orders written per transaction when checkouts of hot products are group-committed
+HOT_CHECKOUT_BATCH_SIZE = int(os.getenv("HOT_CHECKOUT_BATCH_SIZE", 100))
+
+# Authenticated principal cache used by get_current_user
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+
+# Refresh token rotation: each worker keeps revoked token families in a Bloom filter sized for
+# this many families at this false positive rate; expired revocations are purged every interval
+REVOKED_FAMILY_CAPACITY = int(os.getenv("REVOKED_FAMILY_CAPACITY", 100000))
+REVOKED_FAMILY_ERROR_RATE = float(os.getenv("REVOKED_FAMILY_ERROR_RATE", 0.001))
+REVOKED_TOKEN_PURGE_INTERVAL = float(os.getenv("REVOKED_TOKEN_PURGE_INTERVAL", 3600))
+
+# Password hashing: bcrypt cost and the dedicated process pool that runs it
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", PASSWORD_HASH_WORKERS * 4))
+
+# Rate limits of the costliest endpoints: "METHOD /path=key:requests/seconds,..." rules
+# separated by ";", where key is ip or account (the email in the JSON body). Buckets are kept
+# per worker, or with RATE_LIMIT_STORE=sqlite in RATE_LIMIT_DATABASE, shared by all workers
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_RULES = os.getenv(
+    "RATE_LIMIT_RULES",
+    "POST /auth/signin=ip:20/60,account:5/60;"
+    "POST /auth/signup=ip:5/600;"
+    "POST /auth/forgot-password=ip:5/600,account:3/3600;"
+    "GET /products/search=ip:120/60",
+)
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory").lower()
+RATE_LIMIT_DATABASE = os.getenv("RATE_LIMIT_DATABASE", "rate_limits.db")
+# Largest body read for its account on routes with an account limit; larger ones get 413
+RATE_LIMIT_MAX_BODY = int(os.getenv("RATE_LIMIT_MAX_BODY", 64 * 1024))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+# Take the client address from the last X-Forwarded-For entry, added by the proxy in front
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+
+# Maintenance jobs, run by one worker every MAINTENANCE_INTERVAL seconds (the first run
+# MAINTENANCE_INITIAL_DELAY after startup). Rows are deleted MAINTENANCE_BATCH_SIZE per
+# transaction, with MAINTENANCE_BATCH_PAUSE seconds between batches for other writers
+MAINTENANCE_ENABLED = os.getenv("MAINTENANCE_ENABLED", "true").lower() in ("1", "true", "yes")
+MAINTENANCE_JOBS = [
+    job.strip()
+    for job in os.getenv("MAINTENANCE_JOBS", "purge_reset_tokens,purge_outbox,expire_carts,analyze,incremental_vacuum").split(",")
+    if job.strip()
+]
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", 3600))
+MAINTENANCE_INITIAL_DELAY = float(os.getenv("MAINTENANCE_INITIAL_DELAY", 60))
+MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", 500))
+MAINTENANCE_BATCH_PAUSE = float(os.getenv("MAINTENANCE_BATCH_PAUSE", 0.01))
+# Rows each index is sampled by ANALYZE, and free pages returned per incremental vacuum step
+MAINTENANCE_ANALYSIS_LIMIT = int(os.getenv("MAINTENANCE_ANALYSIS_LIMIT", 1000))
+MAINTENANCE_VACUUM_PAGES = int(os.getenv("MAINTENANCE_VACUUM_PAGES", 500))
+# Carts with no line changed for this many days are emptied
+CART_EXPIRY_DAYS = float(os.getenv("CART_EXPIRY_DAYS", 30))
+# Sent and failed emails are deleted from the outbox this many days after they were queued
+EMAIL_OUTBOX_RETENTION_DAYS = float(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", 7))
+
+# Logging: records go through a bounded queue to a background thread that owns the handlers
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "logs/app.log")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+ACCESS_LOG = os.getenv("ACCESS_LOG", "true").lower() in ("1", "true", "yes")
+
+# Metrics: GET /metrics (Prometheus text format) and the slow query log
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+# Startup: build the first listing pages and the facets before serving the first request
+CACHE_WARMUP = os.getenv("CACHE_WARMUP", "true").lower() in ("1", "true", "yes")
+# Set by `python -m app.serve` for its workers: the launcher already created the schema and
+# indexes, and WORKER_SIGNALS is the shared memory file that carries cache invalidations
+SCHEMA_PREPARED = os.getenv("SCHEMA_PREPARED", "false").lower() in ("1", "true", "yes")
+WORKER_SIGNALS = os.getenv("WORKER_SIGNALS", "")
@@ -1,9 +1,177 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.core.config import (
+    DATABASE_URL, ASYNC_DATABASE_URL,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_PRE_PING, DB_POOL_RECYCLE,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB,
+    SQLITE_AUTO_VACUUM,
+)
 
-DATABASE_URL = "sqlite:///./ecommerce.db"
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}', set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def pool_options(url: str) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        # Only applies before the first table is created; later it waits for a VACUUM
+        cursor.execute(f"PRAGMA auto_vacuum = {SQLITE_AUTO_VACUUM}")
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    finally:
+        cursor.close()
+
+
+def configure_sqlite(engine):
+    # Accepts sync engines; pass async_engine.sync_engine for the async one
+    if is_sqlite(str(engine.url)) and not event.contains(engine, "connect", apply_sqlite_pragmas):
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+
+
+# The sqlite3 driver opens a transaction just before the first write, so reads stay
+# lock-free. IMMEDIATE makes that BEGIN take the write lock up front: a deferred BEGIN
+# would upgrade a read snapshot, which fails at once with "database is locked" when
+# another writer got there first, instead of waiting out busy_timeout.
+SQLITE_CONNECT_ARGS = {"isolation_level": "IMMEDIATE"}
+
+connect_args = {"check_same_thread": False, **SQLITE_CONNECT_ARGS} if is_sqlite(DATABASE_URL) else {}
+
+# Sync engine: schema setup, scripts, and the DB_ASYNC=false request path
+engine = create_engine(DATABASE_URL, connect_args=connect_args, **pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+_async_url = ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+async_engine = create_async_engine(
+    _async_url,
+    connect_args=SQLITE_CONNECT_ARGS if is_sqlite(_async_url) else {},
+    **pool_options(_async_url),
+)
+
+configure_sqlite(engine)
+configure_sqlite(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
+
+
+def dialect_insert(table):
+    # insert() with on_conflict_do_update() for the configured database
+    return {"sqlite": sqlite.insert, "postgresql": postgresql.insert}[engine.dialect.name](table)
+
+
+class ThreadedSession:
+    """The subset of the AsyncSession API the routes use, backed by a sync Session
+    whose calls run in the threadpool. Lets DB_ASYNC=false reuse the async routes."""
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def _execute(self, statement, params=None, execution_options=None, **kw):
+        # Same option AsyncSession uses: rows are fetched here in the worker thread,
+        # so nothing touches the cursor from the event loop
+        options = {"prebuffer_rows": True, **(execution_options or {})}
+        return self.sync_session.execute(statement, params, execution_options=options, **kw)
+
+    async def execute(self, statement, params=None, **kw):
+        return await run_in_threadpool(self._execute, statement, params, **kw)
+
+    async def scalar(self, statement, params=None, **kw):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kw)
+
+    async def scalars(self, statement, params=None, **kw):
+        return (await self.execute(statement, params, **kw)).scalars()
+
+    async def get(self, entity, ident, **kw):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kw)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kw):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kw)
+
+    async def stream(self, statement, params=None, execution_options=None, **kw):
+        options = {"stream_results": True, **(execution_options or {})}
+        result = await run_in_threadpool(
+            self.sync_session.execute, statement, params, execution_options=options, **kw
+        )
+        return ThreadedStreamResult(result)
+
+
+class ThreadedStreamResult:
+    """AsyncResult.partitions() for ThreadedSession.stream: one threadpool call per batch."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        while True:
+            rows = await run_in_threadpool(self.result.fetchmany, size)
+            if not rows:
+                break
+            yield rows
+
+    async def close(self):
+        await run_in_threadpool(self.result.close)
+
+
+# Same session semantics as AsyncSessionLocal so both request paths behave alike
+ThreadedSessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,128 @@
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from app.core.config import LOG_LEVEL, LOG_FILE, LOG_QUEUE_SIZE
+
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(request_id)s | %(message)s"
+
+# Set by the logging middleware for the duration of a request
+request_id = contextvars.ContextVar("request_id", default="-")
+
+_lock = threading.Lock()
+_stats = {"queued": 0, "dropped": 0}
+_listener = None
+_traceback_formatter = logging.Formatter()
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        # Runs on the caller's side of the queue, where the request's context is visible
+        record.request_id = request_id.get()
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Hands records to the listener thread; when the queue is full the record is
+    dropped and counted instead of blocking the request."""
+
+    def prepare(self, record):
+        # Render only what can't wait (args, traceback); the listener's handlers do the
+        # rest of the formatting off the request path. Root holds the only handler, so
+        # updating the record in place is safe.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _lock:
+                _stats["dropped"] += 1
+            return
+        with _lock:
+            _stats["queued"] += 1
+
+
+class AppendFileHandler(logging.Handler):
+    """Writes each record with a single write() to a file opened with O_APPEND, so the
+    workers of `python -m app.serve` can share one log file: every record lands whole
+    at the end of the file, however the workers' writes interleave."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = os.path.abspath(path)
+        self.fd = self._open()
+
+    def _open(self):
+        return os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def emit(self, record):
+        try:
+            # Reopened after close() like FileHandler: logging.config closes every existing
+            # handler, and uvicorn configures its loggers after the app's are set up
+            if self.fd is None:
+                self.fd = self._open()
+            os.write(self.fd, (self.format(record) + "\n").encode("utf-8"))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+        finally:
+            self.release()
+        super().close()
+
+
+def setup_logging():
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        os.makedirs(os.path.dirname(LOG_FILE) or ".", exist_ok=True)
+        handlers.append(AppendFileHandler(LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    # Flushes whatever is still queued, then closes the handlers
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def logging_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats["pending"] = _listener.queue.qsize() if _listener is not None else 0
+    return stats
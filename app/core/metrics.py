@@ -0,0 +1,198 @@
+import bisect
+import contextvars
+import logging
+import re
+import threading
+import time
+from sqlalchemy import event
+from app.core.config import SLOW_QUERY_MS
+
+logger = logging.getLogger("ecommerce_logger.metrics")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# Per-request DB accounting, set by the metrics middleware. Engine events read it from
+# the same context: the event loop task, its greenlets, or a threadpool copy of it.
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+
+    @property
+    def route(self):
+        return route_label(self.scope)
+
+
+def route_label(scope):
+    # The route template, not the raw path, keeps label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_requests = {}        # (method, route, status) -> count
+_latency = {}         # (method, route) -> Histogram
+_db_statements = {}   # (method, route) -> Histogram
+_db_seconds = {}      # (method, route) -> Histogram
+_in_progress = {}     # method -> gauge
+_totals = {"db_statements": 0, "db_seconds": 0.0, "slow_queries": 0}
+_collectors = {}
+
+
+def request_started(method):
+    with _lock:
+        _in_progress[method] = _in_progress.get(method, 0) + 1
+
+
+def request_finished(method, route, status, seconds, stats):
+    key = (method, route)
+    with _lock:
+        _in_progress[method] -= 1
+        _requests[(method, route, status)] = _requests.get((method, route, status), 0) + 1
+        if key not in _latency:
+            _latency[key] = Histogram(LATENCY_BUCKETS)
+            _db_statements[key] = Histogram(STATEMENT_BUCKETS)
+            _db_seconds[key] = Histogram(LATENCY_BUCKETS)
+        _latency[key].observe(seconds)
+        _db_statements[key].observe(stats.statements)
+        _db_seconds[key].observe(stats.db_seconds)
+
+
+def route_summary():
+    """Requests, mean latency and mean DB work per route, keyed "METHOD /route"."""
+    with _lock:
+        return {
+            f"{method} {route}": {
+                "requests": latency.count,
+                "latency_seconds_avg": latency.sum / latency.count,
+                "db_statements_avg": _db_statements[(method, route)].sum / latency.count,
+                "db_seconds_avg": _db_seconds[(method, route)].sum / latency.count,
+            }
+            for (method, route), latency in _latency.items()
+        }
+
+
+def reset():
+    # Drops the per-route series and totals; in-flight gauges stay accurate
+    with _lock:
+        _requests.clear()
+        _latency.clear()
+        _db_statements.clear()
+        _db_seconds.clear()
+        _totals.update(db_statements=0, db_seconds=0.0, slow_queries=0)
+
+
+def register_collector(name, collect):
+    """Expose a component's stats dict (cache, pool, worker...) as `<name>_<key>` samples."""
+    _collectors[name] = collect
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+    slow = elapsed * 1000 >= SLOW_QUERY_MS
+    with _lock:
+        _totals["db_statements"] += 1
+        _totals["db_seconds"] += elapsed
+        if slow:
+            _totals["slow_queries"] += 1
+    if slow:
+        route = stats.route if stats is not None else "-"
+        logger.warning(f"Slow query ({elapsed * 1000:.1f}ms) on {route}: {' '.join(statement.split())[:1000]}")
+
+
+def instrument_engine(engine):
+    # Accepts sync engines; pass async_engine.sync_engine for the async one
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _render_histograms(lines, name, help_text, histograms):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in histograms.items():
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+
+
+def _metric_name(*parts):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(parts))
+
+
+def _render_collected(lines, prefix, stats):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            _render_collected(lines, _metric_name(prefix, key), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            name = _metric_name(prefix, key)
+            lines.append(f"# TYPE {name} untyped")
+            lines.append(f"{name} {value}")
+
+
+def render():
+    lines = []
+    with _lock:
+        lines.append("# HELP http_requests_total Requests by method, route and status code")
+        lines.append("# TYPE http_requests_total counter")
+        for (method, route, status), count in _requests.items():
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+        lines.append("# HELP http_requests_in_progress Requests currently being served")
+        lines.append("# TYPE http_requests_in_progress gauge")
+        for method, count in _in_progress.items():
+            lines.append(f"http_requests_in_progress{_labels(method=method)} {count}")
+        _render_histograms(lines, "http_request_duration_seconds", "Request latency", _latency)
+        _render_histograms(lines, "http_request_db_statements", "SQL statements per request", _db_statements)
+        _render_histograms(lines, "http_request_db_seconds", "Time spent in SQL per request", _db_seconds)
+        lines.append("# TYPE db_statements_total counter")
+        lines.append(f"db_statements_total {_totals['db_statements']}")
+        lines.append("# TYPE db_seconds_total counter")
+        lines.append(f"db_seconds_total {_totals['db_seconds']}")
+        lines.append("# TYPE db_slow_queries_total counter")
+        lines.append(f"db_slow_queries_total {_totals['slow_queries']}")
+        collectors = list(_collectors.items())
+    for name, collect in collectors:
+        try:
+            _render_collected(lines, name, collect())
+        except Exception as e:
+            logger.error(f"Metrics collector {name} failed: {e!r}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,218 @@
+"""Per-route rate limits for the endpoints that cost the most per call.
+
+A rule limits one route per client address and, where it says so, per account: the
+"email" of the JSON body, so one account's password can't be guessed from many
+addresses either. Each limit is a token bucket holding up to `requests` tokens and
+refilled at requests/seconds per second; a request takes one token or is refused
+until the next one is due. A bucket is two numbers (tokens left, last update), and one
+left alone for `seconds` is full again, the same as no bucket, so entries expire then.
+
+Buckets are kept in each worker's memory, at most RATE_LIMIT_MAX_KEYS per limit (the
+least recently used are dropped first), so with N workers a client can get N times
+the limit. RATE_LIMIT_STORE=sqlite keeps them in a small SQLite file shared by the
+workers instead (RATE_LIMIT_DATABASE, apart from the app's database so checks never
+wait on its writers), updated with one upsert per check. If the shared store fails,
+requests are let through and the failure is counted.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from sqlalchemy import create_engine, text
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import TTLCache
+from app.core.config import RATE_LIMIT_DATABASE, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_RULES, RATE_LIMIT_STORE
+from app.core.database import SQLITE_CONNECT_ARGS, configure_sqlite, pool_options
+
+logger = logging.getLogger("ecommerce_logger")
+
+KEYS = ("ip", "account")
+STORES = ("memory", "sqlite")
+# Shared store: rows of buckets that have refilled are deleted every this many checks
+PURGE_EVERY = 1000
+
+
+@dataclass(frozen=True)
+class Limit:
+    key: str
+    requests: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.seconds
+
+
+def parse_rules(spec: str) -> dict:
+    """"METHOD /path" -> [Limit] from "POST /auth/signin=ip:20/60,account:5/60;..."."""
+    rules = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        route, _, limits = entry.partition("=")
+        method, _, path = route.strip().partition(" ")
+        parsed = []
+        for item in limits.split(","):
+            key, _, quota = item.strip().partition(":")
+            requests, _, seconds = quota.partition("/")
+            if key not in KEYS or not path.strip() or not requests or not seconds:
+                raise ValueError(f"Invalid rate limit {item.strip()!r} in rule {entry!r}")
+            parsed.append(Limit(key, int(requests), float(seconds)))
+        rules[f"{method.upper()} {path.strip()}"] = parsed
+    return rules
+
+
+class MemoryStore:
+    """Buckets of this worker, one LRU cache per limit with the limit's period as TTL."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets = {}
+
+    def tokens(self, limit: Limit, key: str, now: float) -> float:
+        buckets = self._buckets.get(limit)
+        if buckets is None:
+            buckets = self._buckets.setdefault(limit, TTLCache(self.maxsize, limit.seconds))
+        entry = buckets.get(key)
+        return limit.requests if entry is None else min(limit.requests, entry[0] + (now - entry[1]) * limit.rate)
+
+    def check(self, checks, take=True) -> float:
+        # Seconds until a token is due in the first bucket without one, else 0 once a token
+        # was taken from each: a request refused by one limit costs nothing in the others
+        now = time.monotonic()
+        levels = []
+        for limit, key in checks:
+            tokens = self.tokens(limit, key, now)
+            if tokens < 1:
+                return (1 - tokens) / limit.rate
+            levels.append(tokens)
+        if not take:
+            return 0.0
+        for (limit, key), tokens in zip(checks, levels):
+            self._buckets[limit].set(key, (tokens - 1, now))
+        return 0.0
+
+    def stats(self) -> dict:
+        caches = [buckets.stats() for buckets in list(self._buckets.values())]
+        return {
+            "keys": sum(stats["size"] for stats in caches),
+            "evictions": sum(stats["evictions"] for stats in caches),
+        }
+
+
+# Takes a token when one is due. A refused update returns no row, and the bucket is read
+# back for the wait. Wall clock rather than monotonic time: the file outlives reboots.
+TAKE = text("""
+    INSERT INTO rate_limit_buckets (key, tokens, updated, expires)
+    VALUES (:key, :requests - 1, :now, :now + :seconds)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = min(:requests, tokens + (:now - updated) * :rate) - 1,
+        updated = :now,
+        expires = :now + :seconds
+    WHERE min(:requests, tokens + (:now - updated) * :rate) >= 1
+    RETURNING tokens
+""")
+BUCKET = text("SELECT tokens, updated FROM rate_limit_buckets WHERE key = :key")
+PURGE = text("DELETE FROM rate_limit_buckets WHERE expires <= :now")
+
+
+class SQLiteStore:
+    """Buckets in a SQLite file shared by the workers of `python -m app.serve`."""
+
+    def __init__(self, path: str):
+        url = f"sqlite:///{path}"
+        self.engine = create_engine(url, connect_args={"check_same_thread": False, **SQLITE_CONNECT_ARGS}, **pool_options(url))
+        configure_sqlite(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, expires REAL NOT NULL) WITHOUT ROWID"
+            ))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_expires ON rate_limit_buckets (expires)"))
+        self._checks = 0
+
+    def _check(self, checks, take=True) -> float:
+        now = time.time()
+        if not take:
+            return self._wait(checks, now)
+        with self.engine.connect() as conn:
+            for limit, key in checks:
+                params = {"key": key, "requests": limit.requests, "seconds": limit.seconds, "rate": limit.rate, "now": now}
+                if conn.execute(TAKE, params).first() is None:
+                    tokens, updated = conn.execute(BUCKET, {"key": key}).one()
+                    # The tokens already taken from the other limits go back with the rollback
+                    conn.rollback()
+                    tokens = min(limit.requests, tokens + (now - updated) * limit.rate)
+                    return max((1 - tokens) / limit.rate, 0.001)
+            self._checks += 1
+            if self._checks % PURGE_EVERY == 0:
+                conn.execute(PURGE, {"now": now})
+            conn.commit()
+        return 0.0
+
+    def _wait(self, checks, now) -> float:
+        # Reads the buckets only: no write lock, no token taken
+        with self.engine.connect() as conn:
+            for limit, key in checks:
+                bucket = conn.execute(BUCKET, {"key": key}).first()
+                if bucket is not None:
+                    tokens = min(limit.requests, bucket.tokens + (now - bucket.updated) * limit.rate)
+                    if tokens < 1:
+                        return max((1 - tokens) / limit.rate, 0.001)
+        return 0.0
+
+    async def check(self, checks, take=True) -> float:
+        return await run_in_threadpool(self._check, checks, take)
+
+
+if RATE_LIMIT_STORE not in STORES:
+    raise ValueError(f"RATE_LIMIT_STORE must be one of {', '.join(STORES)}, not {RATE_LIMIT_STORE!r}")
+
+RULES = parse_rules(RATE_LIMIT_RULES)
+
+_lock = threading.Lock()
+_stats = {
+    "allowed": 0,
+    "limited": 0,
+    "store_errors": 0,
+}
+_store = None
+
+
+def count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+def get_store():
+    # Created on first use: the shared store opens (and creates) its file
+    global _store
+    if _store is None:
+        _store = SQLiteStore(RATE_LIMIT_DATABASE) if RATE_LIMIT_STORE == "sqlite" else MemoryStore(RATE_LIMIT_MAX_KEYS)
+    return _store
+
+
+async def check(route: str, values: dict, take=True) -> float:
+    """Takes a token from each limit of `route` with a value (`values` maps the limit's key
+    to the client's address or account), or from none of them when one has no token left.
+    Seconds until the request may be retried, else 0. With take=False the buckets are only
+    looked at, to refuse early a request that a later check would refuse anyway."""
+    checks = [(limit, f"{route} {limit.key} {values[limit.key]}") for limit in RULES[route] if values.get(limit.key)]
+    if not checks:
+        return 0.0
+    store = get_store()
+    try:
+        wait = await store.check(checks, take) if isinstance(store, SQLiteStore) else store.check(checks, take)
+    except Exception as e:
+        logger.error(f"Rate limit check failed, request let through: {repr(e)}")
+        count("store_errors")
+        return 0.0
+    if wait or take:
+        count("limited" if wait else "allowed")
+    return wait
+
+
+def limit_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    if isinstance(_store, MemoryStore):
+        stats.update(_store.stats())
+    return stats
@@ -0,0 +1,76 @@
+"""Cross-worker cache invalidation for `python -m app.serve`.
+
+The launcher creates a small file in shared memory (WORKER_SIGNALS) before it starts
+its workers, and every worker maps it. Each channel is one 8-byte slot: a worker that
+invalidates a cache writes a fresh random stamp into the cache's slot, and the other
+workers compare the slot with the stamp they last saw on their next lookup. A read is
+a memory access, so this is cheaper than polling `PRAGMA data_version` (a query per
+lookup) and also reaches workers that don't share a connection. Without the launcher
+nothing is mapped and channels do nothing: a single process has no one to tell.
+"""
+import logging
+import mmap
+import os
+import random
+import struct
+
+from app.core.config import WORKER_SIGNALS
+
+logger = logging.getLogger("ecommerce_logger")
+
+# One slot per channel, at the same offset in every worker
+CHANNELS = ("product_detail", "product_listing", "principals", "revoked_tokens")
+SLOT = struct.Struct("<Q")
+SIZE = SLOT.size * len(CHANNELS)
+
+_map = None
+_random = random.SystemRandom()
+
+
+class Channel:
+    def __init__(self, name: str):
+        self.name = name
+        self.offset = CHANNELS.index(name) * SLOT.size
+
+    def read(self) -> int:
+        if _map is None:
+            return 0
+        return SLOT.unpack_from(_map, self.offset)[0]
+
+    def publish(self) -> int:
+        # A random stamp rather than a counter: two workers publishing at once can't
+        # write the same value back and hide each other's change
+        if _map is None:
+            return 0
+        stamp = _random.getrandbits(64) or 1
+        SLOT.pack_into(_map, self.offset, stamp)
+        return stamp
+
+
+def create(path: str):
+    # Called by the launcher before any worker starts
+    with open(path, "wb") as f:
+        f.write(bytes(SIZE))
+
+
+def attach():
+    global _map
+    if _map is not None or not WORKER_SIGNALS:
+        return _map is not None
+    try:
+        fd = os.open(WORKER_SIGNALS, os.O_RDWR)
+    except OSError as e:
+        logger.error(f"Cannot open worker signals file {WORKER_SIGNALS}: {e}")
+        return False
+    try:
+        _map = mmap.mmap(fd, SIZE)
+    finally:
+        os.close(fd)
+    return True
+
+
+def detach():
+    global _map
+    signals_map, _map = _map, None
+    if signals_map is not None:
+        signals_map.close()
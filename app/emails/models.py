@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, Enum as SqlEnum
+from datetime import datetime, timezone
+from app.core.database import Base
+from enum import Enum
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class EmailStatus(str, Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class OutboxEmail(Base):
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(SqlEnum(EmailStatus), default=EmailStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    # Earliest time a worker may (re)try; pushed forward while a worker holds the row
+    next_attempt_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+
+# The worker's claim query: WHERE status = 'pending' AND next_attempt_at <= now ORDER BY next_attempt_at
+Index("ix_email_outbox_status_next_attempt", OutboxEmail.status, OutboxEmail.next_attempt_at)
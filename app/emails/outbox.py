@@ -0,0 +1,14 @@
+from app.emails import worker
+from app.emails.models import OutboxEmail
+
+
+def enqueue(db, recipient: str, subject: str, body: str):
+    # Joins the caller's transaction, so the email exists only if the caller commits
+    email = OutboxEmail(recipient=recipient, subject=subject, body=body)
+    db.add(email)
+    return email
+
+
+def notify():
+    # Call after commit to deliver now rather than at the next poll
+    worker.wake()
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import random
+import smtplib
+import ssl
+import threading
+import time
+from datetime import timedelta
+from email.message import EmailMessage
+from sqlalchemy import bindparam, select, update
+from starlette.concurrency import run_in_threadpool
+from app.core.config import (
+    EMAIL_USER, EMAIL_PASSWORD, EMAIL_FROM, SMTP_SERVER, SMTP_PORT, SMTP_SECURITY, SMTP_TIMEOUT,
+    EMAIL_BATCH_SIZE, EMAIL_POLL_INTERVAL, EMAIL_MAX_ATTEMPTS, EMAIL_RETRY_BACKOFF, EMAIL_CLAIM_TIMEOUT,
+)
+from app.core.database import SessionLocal
+from app.emails.models import OutboxEmail, EmailStatus, utcnow
+
+logger = logging.getLogger("ecommerce_logger")
+
+# Longest wait between retries of one email
+MAX_RETRY_DELAY = 3600
+
+_lock = threading.Lock()
+_stats = {
+    "sent": 0,
+    "retried": 0,
+    "failed": 0,
+    "batches": 0,
+    "connections_opened": 0,
+    "send_seconds_total": 0.0,
+    "send_seconds_max": 0.0,
+}
+
+_wakeup = None
+_task = None
+
+
+def count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+def delivery_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats["send_seconds_avg"] = stats["send_seconds_total"] / stats["sent"] if stats["sent"] else 0.0
+    return stats
+
+
+class SMTPConnection:
+    """One SMTP session reused across messages and batches, reopened when the server drops it."""
+
+    def __init__(self):
+        self._smtp = None
+
+    def _connect(self):
+        if SMTP_SECURITY == "ssl":
+            smtp = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+            if SMTP_SECURITY == "starttls":
+                smtp.starttls(context=ssl.create_default_context())
+        if EMAIL_USER and EMAIL_PASSWORD:
+            smtp.login(EMAIL_USER, EMAIL_PASSWORD)
+        count("connections_opened")
+        return smtp
+
+    def send(self, message):
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.send_message(message)
+        except Exception as e:
+            if not is_dropped(e):
+                raise
+            # Idle sessions get closed by the server; one fresh connection, then give up
+            self.close()
+            self._smtp = self._connect()
+            self._smtp.send_message(message)
+
+    def close(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                smtp.close()
+
+
+def build_message(recipient, subject, body):
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = EMAIL_FROM
+    message["To"] = recipient
+    message.set_content(body)
+    return message
+
+
+def is_dropped(error):
+    # smtplib errors subclass OSError; a bare OSError is a socket-level failure
+    return isinstance(error, smtplib.SMTPServerDisconnected) or (
+        isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+    )
+
+
+def is_connection_error(error):
+    # Failures that say nothing about the message itself: retry it, and stop the batch
+    return is_dropped(error) or isinstance(error, (smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError))
+
+
+def is_permanent(error):
+    # 5xx replies reject this message for good; 4xx and connection problems are worth retrying
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException) and not isinstance(error, smtplib.SMTPAuthenticationError):
+        return error.smtp_code >= 500
+    return False
+
+
+def retry_delay(attempts):
+    delay = min(EMAIL_RETRY_BACKOFF * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_batch(db, now):
+    # Pushing next_attempt_at forward hides the rows from other workers; if this worker
+    # dies mid-batch they become due again after EMAIL_CLAIM_TIMEOUT
+    due = (OutboxEmail.status == EmailStatus.PENDING) & (OutboxEmail.next_attempt_at <= now)
+    ids = select(OutboxEmail.id).where(due).order_by(OutboxEmail.next_attempt_at, OutboxEmail.id).limit(EMAIL_BATCH_SIZE)
+    claimed = db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(ids.scalar_subquery()), due)
+        .values(next_attempt_at=now + timedelta(seconds=EMAIL_CLAIM_TIMEOUT), attempts=OutboxEmail.attempts + 1)
+        .returning(OutboxEmail.id, OutboxEmail.recipient, OutboxEmail.subject, OutboxEmail.body, OutboxEmail.attempts)
+    ).all()
+    db.commit()
+    return claimed
+
+
+def deliver_batch(connection):
+    """Claim up to EMAIL_BATCH_SIZE due emails, send them over `connection` and record
+    the outcome. Returns the number claimed."""
+    with SessionLocal() as db:
+        claimed = claim_batch(db, utcnow())
+        if not claimed:
+            return 0
+
+        sent, retry, failed = [], [], []
+        for index, email in enumerate(claimed):
+            started = time.perf_counter()
+            try:
+                connection.send(build_message(email.recipient, email.subject, email.body))
+            except Exception as e:
+                if is_connection_error(e):
+                    logger.warning(f"SMTP connection failed, deferring {len(claimed) - index} emails: {e!r}")
+                    connection.close()
+                    retry.extend((pending, repr(e)) for pending in claimed[index:])
+                    break
+                (failed if is_permanent(e) else retry).append((email, repr(e)))
+                continue
+            elapsed = time.perf_counter() - started
+            sent.append(email)
+            with _lock:
+                _stats["send_seconds_total"] += elapsed
+                _stats["send_seconds_max"] = max(_stats["send_seconds_max"], elapsed)
+
+        # Out of attempts counts as failed
+        failed += [(email, error) for email, error in retry if email.attempts >= EMAIL_MAX_ATTEMPTS]
+        retry = [(email, error) for email, error in retry if email.attempts < EMAIL_MAX_ATTEMPTS]
+
+        now = utcnow()
+        table = OutboxEmail.__table__
+        by_id = table.c.id == bindparam("email_id")
+        if sent:
+            db.execute(
+                update(table).where(by_id).values(status=EmailStatus.SENT, sent_at=now, last_error=None),
+                [{"email_id": email.id} for email in sent],
+            )
+        if retry:
+            db.execute(
+                update(table).where(by_id).values(next_attempt_at=bindparam("retry_at"), last_error=bindparam("error")),
+                [
+                    {"email_id": email.id, "retry_at": now + timedelta(seconds=retry_delay(email.attempts)), "error": error}
+                    for email, error in retry
+                ],
+            )
+        if failed:
+            db.execute(
+                update(table).where(by_id).values(status=EmailStatus.FAILED, last_error=bindparam("error")),
+                [{"email_id": email.id, "error": error} for email, error in failed],
+            )
+        db.commit()
+
+    for email, error in failed:
+        logger.error(f"Giving up on email {email.id} to {email.recipient} after {email.attempts} attempts: {error}")
+    with _lock:
+        _stats["batches"] += 1
+        _stats["sent"] += len(sent)
+        _stats["retried"] += len(retry)
+        _stats["failed"] += len(failed)
+    return len(claimed)
+
+
+async def _run():
+    connection = SMTPConnection()
+    try:
+        while True:
+            _wakeup.clear()
+            try:
+                claimed = await run_in_threadpool(deliver_batch, connection)
+            except Exception as e:
+                logger.error(f"Email delivery batch failed: {e!r}")
+                claimed = 0
+            if claimed < EMAIL_BATCH_SIZE:
+                # Drained: sleep until the next poll or until a request enqueues mail
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), EMAIL_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        await run_in_threadpool(connection.close)
+
+
+def wake():
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def start():
+    global _wakeup, _task
+    if _task is None:
+        _wakeup = asyncio.Event()
+        _task = asyncio.create_task(_run())
+        logger.info("Email delivery worker started")
+
+
+async def stop():
+    global _wakeup, _task
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _wakeup = None
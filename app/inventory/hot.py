@@ -0,0 +1,377 @@
+"""In-process stock counters for hot products.
+
+Each worker process reserves a shard of a hot product's stock (a stock_shards row
+whose `allotted` units stay counted in products.stock) and sells from it in memory,
+so checkouts never write products.stock. Each sale is recorded in the order's own
+transaction as a stock_shard_sales row; the flush loop writes those through to
+products.stock every HOT_STOCK_FLUSH_INTERVAL and drops them. Shards of a worker
+that stopped without releasing them are reclaimed on the next flush of any worker,
+sales included, so nothing is lost or sold twice across restarts.
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+from sqlalchemy import Integer, bindparam, delete, exists, func, insert, or_, select, update
+from starlette.concurrency import run_in_threadpool
+from app.core.config import HOT_STOCK_FLUSH_INTERVAL, HOT_STOCK_SHARD_TIMEOUT
+from app.core.database import SessionLocal
+from app.inventory.models import HotProduct, ShardSale, StockShard, utcnow
+from app.products.cache import invalidate_stock
+from app.products.models import Product
+
+logger = logging.getLogger("ecommerce_logger")
+
+HOST = socket.gethostname()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "sold": 0,
+    "refused": 0,
+    "claims": 0,
+    "claimed_units": 0,
+    "flushes": 0,
+    "flushed_units": 0,
+    "reclaimed_shards": 0,
+}
+
+# Set by start(), in the worker process itself (not in a parent that forks workers)
+_owner = None
+_shards = {}
+_retired = []
+_wakeup = None
+_task = None
+
+
+def count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def stock_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    shards = list(_shards.values())
+    stats["hot_products"] = len(shards)
+    stats["units_in_memory"] = sum(shard.remaining for shard in shards)
+    return stats
+
+
+class Shard:
+    """This worker's reservation of one hot product."""
+
+    def __init__(self, product_id: int, shard_size: int):
+        self.product_id = product_id
+        self.shard_size = shard_size
+        self.id = None
+        self.remaining = 0
+        # Units taken by checkouts that have not committed or rolled back yet
+        self.in_flight = 0
+        self.retired = False
+        self.refilling = asyncio.Lock()
+        self._lock = threading.Lock()
+
+    def take(self, quantity: int):
+        # The shard id at the time of taking, so a sale is never charged to a newer shard
+        with self._lock:
+            if self.retired or self.remaining < quantity:
+                return None
+            self.remaining -= quantity
+            self.in_flight += 1
+            return self.id
+
+    def finish(self, shard_id: int, quantity: int, sold: bool):
+        with self._lock:
+            self.in_flight -= 1
+            # Units of a shard row that was reclaimed meanwhile went back with it
+            if not sold and shard_id == self.id:
+                self.remaining += quantity
+
+    def granted(self, shard_id: int, units: int):
+        with self._lock:
+            if shard_id != self.id:
+                # A new shard row: the units of the old one went back with it
+                self.id, self.remaining = shard_id, 0
+            self.remaining += units
+
+    def idle(self):
+        with self._lock:
+            return self.in_flight == 0
+
+
+def is_hot(product_id: int) -> bool:
+    return product_id in _shards
+
+
+def owner_gone(owner: str) -> bool:
+    # An earlier process on this host: its pid is gone, or it is ours after a restart
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != HOST or os.name != "posix":
+        return False
+    if int(pid) == os.getpid():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def claim(shard: Shard, quantity: int):
+    """Move enough free units of products.stock into the shard to cover `quantity`
+    and refill it to shard_size. Free means not allotted to any shard."""
+    with SessionLocal() as db:
+        now = utcnow()
+        # Write before reading: on SQLite this takes the write lock, so the free
+        # stock read below cannot change before the grant is written
+        shard_id = shard.id
+        if shard_id is not None:
+            alive = db.execute(
+                update(StockShard).where(StockShard.id == shard_id, StockShard.owner == _owner).values(heartbeat_at=now)
+            ).rowcount
+            if not alive:
+                logger.warning(f"Hot stock shard {shard_id} of product {shard.product_id} was reclaimed, starting a new one")
+                shard_id = None
+        if shard_id is None:
+            shard_id = db.execute(
+                insert(StockShard)
+                .values(product_id=shard.product_id, owner=_owner, allotted=0, heartbeat_at=now)
+                .returning(StockShard.id)
+            ).scalar_one()
+
+        stock = db.scalar(select(Product.stock).where(Product.id == shard.product_id).with_for_update()) or 0
+        allotted = db.scalar(
+            select(func.coalesce(func.sum(StockShard.allotted), 0)).where(StockShard.product_id == shard.product_id)
+        )
+        remaining = shard.remaining if shard_id == shard.id else 0
+        units = max(0, min(max(shard.shard_size, quantity) - remaining, stock - allotted))
+        if units:
+            db.execute(update(StockShard).where(StockShard.id == shard_id).values(allotted=StockShard.allotted + units))
+        db.commit()
+
+    shard.granted(shard_id, units)
+    count("claims")
+    count("claimed_units", units)
+
+
+async def take(shard: Shard, quantity: int):
+    shard_id = shard.take(quantity)
+    if shard_id is not None:
+        return shard_id
+    async with shard.refilling:
+        # Another checkout may have refilled the shard while this one waited
+        shard_id = shard.take(quantity)
+        if shard_id is not None or shard.retired:
+            return shard_id
+        try:
+            await run_in_threadpool(claim, shard, quantity)
+        except Exception as e:
+            logger.error(f"Hot stock claim for product {shard.product_id} failed: {e!r}")
+            return None
+        return shard.take(quantity)
+
+
+async def reserve(quantities: dict):
+    """Take {product_id: quantity} of hot products from this worker's shards.
+
+    Returns the reservation to pass to record_sales() and finish(), or None, with
+    nothing taken, when a line cannot be covered."""
+    taken = []
+    for product_id, quantity in quantities.items():
+        shard = _shards.get(product_id)
+        shard_id = await take(shard, quantity) if shard is not None else None
+        if shard_id is None:
+            finish(taken, sold=False)
+            count("refused")
+            return None
+        taken.append((shard, shard_id, quantity))
+    return taken
+
+
+def record_sales(session, taken) -> bool:
+    """Write the reservation's sales in the caller's (order) transaction.
+
+    False if one of its shards has been reclaimed meanwhile; the caller must roll back."""
+    if not taken:
+        return True
+    shard_id = bindparam("b_shard_id", type_=Integer)
+    written = session.execute(
+        insert(ShardSale.__table__).from_select(
+            ["shard_id", "quantity"],
+            select(shard_id, bindparam("b_quantity", type_=Integer)).where(exists().where(StockShard.id == shard_id)),
+        ),
+        [{"b_shard_id": shard_id, "b_quantity": quantity} for _, shard_id, quantity in taken],
+    )
+    return written.rowcount == len(taken)
+
+
+def finish(taken, sold: bool):
+    # After commit (sold) or rollback: unsold units go back to their shard
+    for shard, shard_id, quantity in taken or ():
+        shard.finish(shard_id, quantity, sold)
+    if sold and taken:
+        count("sold", sum(quantity for _, _, quantity in taken))
+
+
+def load_hot_products():
+    with SessionLocal() as db:
+        return dict(db.execute(select(HotProduct.product_id, HotProduct.shard_size)).all())
+
+
+async def refresh():
+    """Follow hot_products: new hot products get a shard (claimed right away), shards
+    of products no longer hot stop selling and are released by the next flush."""
+    hot = await run_in_threadpool(load_hot_products)
+    for product_id, shard_size in hot.items():
+        shard = _shards.get(product_id)
+        if shard is None:
+            shard = _shards[product_id] = Shard(product_id, shard_size)
+            async with shard.refilling:
+                await run_in_threadpool(claim, shard, 0)
+        shard.shard_size = shard_size
+    for product_id in [product_id for product_id in _shards if product_id not in hot]:
+        retire(_shards.pop(product_id))
+
+
+def retire(shard: Shard):
+    shard.retired = True
+    if shard.id is not None:
+        _retired.append(shard)
+
+
+def flush():
+    """Apply this worker's sales to products.stock, refresh its heartbeats, and release
+    retired shards and those of workers that stopped. Returns the product ids whose
+    stock changed."""
+    with SessionLocal() as db:
+        now = utcnow()
+        mine = [shard.id for shard in _shards.values() if shard.id is not None]
+        released = [shard for shard in _retired if shard.idle()]
+        mine += [shard.id for shard in released]
+        if mine:
+            # First write takes the SQLite write lock for the rest of the flush
+            db.execute(update(StockShard).where(StockShard.id.in_(mine)).values(heartbeat_at=now))
+
+        others = db.scalars(select(StockShard.owner).where(StockShard.owner != _owner).distinct()).all()
+        stale = or_(
+            StockShard.heartbeat_at < now - timedelta(seconds=HOT_STOCK_SHARD_TIMEOUT),
+            StockShard.owner.in_([owner for owner in others if owner_gone(owner)]),
+        )
+        reclaimed = []
+        if others and db.scalar(select(exists().where(StockShard.owner != _owner, stale))):
+            # Taking the rows over first means two workers never apply the same sales
+            reclaimed = db.scalars(
+                update(StockShard).where(StockShard.owner != _owner, stale)
+                .values(owner=_owner, heartbeat_at=now).returning(StockShard.id)
+            ).all()
+
+        shard_ids = mine + reclaimed
+        sold = db.execute(
+            select(
+                ShardSale.shard_id, StockShard.product_id,
+                func.sum(ShardSale.quantity).label("quantity"), func.max(ShardSale.id).label("last_id"),
+            )
+            .join(StockShard, StockShard.id == ShardSale.shard_id)
+            .where(ShardSale.shard_id.in_(shard_ids))
+            .group_by(ShardSale.shard_id, StockShard.product_id)
+        ).all() if shard_ids else []
+
+        if sold:
+            params = [
+                {"b_shard_id": row.shard_id, "b_product_id": row.product_id, "b_quantity": row.quantity, "b_last_id": row.last_id}
+                for row in sold
+            ]
+            products, shards, sales = Product.__table__, StockShard.__table__, ShardSale.__table__
+            db.execute(
+                update(products).where(products.c.id == bindparam("b_product_id"))
+                .values(stock=products.c.stock - bindparam("b_quantity")),
+                params,
+            )
+            db.execute(
+                update(shards).where(shards.c.id == bindparam("b_shard_id"))
+                .values(allotted=shards.c.allotted - bindparam("b_quantity")),
+                params,
+            )
+            # Sales written after the read above belong to the next flush
+            db.execute(
+                delete(sales).where(sales.c.shard_id == bindparam("b_shard_id"), sales.c.id <= bindparam("b_last_id")),
+                params,
+            )
+        drained = [shard.id for shard in released] + reclaimed
+        if drained:
+            db.execute(delete(StockShard).where(StockShard.id.in_(drained)))
+        db.commit()
+
+    for shard in released:
+        _retired.remove(shard)
+    count("flushes")
+    count("flushed_units", sum(row.quantity for row in sold))
+    count("reclaimed_shards", len(reclaimed))
+    if reclaimed:
+        logger.warning(f"Reclaimed {len(reclaimed)} hot stock shards of stopped workers")
+    return {row.product_id for row in sold}
+
+
+async def flush_now():
+    changed = await run_in_threadpool(flush)
+    if changed:
+        invalidate_stock(changed)
+
+
+async def _run():
+    while True:
+        _wakeup.clear()
+        try:
+            await refresh()
+            await flush_now()
+        except Exception as e:
+            logger.error(f"Hot stock flush failed: {e!r}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), HOT_STOCK_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def wake():
+    # After marking or unmarking a product, to pick it up before the next interval
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def start():
+    """Reconcile shards left by stopped workers, reserve shards for the hot products,
+    then keep flushing in the background."""
+    global _owner, _wakeup, _task
+    if _task is not None:
+        return
+    _owner = f"{HOST}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    await refresh()
+    await flush_now()
+    _wakeup = asyncio.Event()
+    _task = asyncio.create_task(_run())
+    logger.info(f"Hot stock counters started for {len(_shards)} products")
+
+
+async def stop():
+    """Flush the last sales and hand unsold units back to products.stock."""
+    global _wakeup, _task
+    task, _task = _task, None
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    _wakeup = None
+    for product_id in list(_shards):
+        retire(_shards.pop(product_id))
+    try:
+        await flush_now()
+    except Exception as e:
+        logger.error(f"Hot stock release failed, shards are reclaimed after HOT_STOCK_SHARD_TIMEOUT: {e!r}")
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from datetime import datetime, timezone
+from app.core.database import Base
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class HotProduct(Base):
+    """A product whose stock is sold from per-worker shards instead of products.stock."""
+    __tablename__ = "hot_products"
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    shard_size = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+
+
+class StockShard(Base):
+    """Units of one product reserved by one worker process.
+
+    `allotted` is still counted in products.stock: it covers the worker's unsold units
+    plus sales not yet flushed. Shards never hold more than products.stock in total."""
+    __tablename__ = "stock_shards"
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    # host:pid:boot token of the worker process
+    owner = Column(String, nullable=False, index=True)
+    allotted = Column(Integer, default=0, nullable=False)
+    # Refreshed by every flush; a shard left stale for HOT_STOCK_SHARD_TIMEOUT is reclaimed
+    heartbeat_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+
+class ShardSale(Base):
+    """Units sold from a shard, written with the order and applied to products.stock by the next flush."""
+    __tablename__ = "stock_shard_sales"
+    id = Column(Integer, primary_key=True)
+    shard_id = Column(Integer, ForeignKey("stock_shards.id", ondelete="CASCADE"), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import HOT_STOCK_SHARD_SIZE
+from app.core.database import dialect_insert
+from app.utils.dependency import get_db, require_admin
+from app.inventory import hot as hot_stock, schemas
+from app.inventory.models import HotProduct, ShardSale, StockShard
+from app.products.models import Product
+
+import logging
+
+logger = logging.getLogger("ecommerce_logger")
+
+router = APIRouter(prefix="/admin/inventory", tags=["Admin - Inventory"])
+
+
+def hot_products_query():
+    shards = (
+        select(
+            StockShard.product_id,
+            func.count(StockShard.id).label("shards"),
+            func.sum(StockShard.allotted).label("allotted"),
+        )
+        .group_by(StockShard.product_id)
+        .subquery()
+    )
+    unflushed = (
+        select(StockShard.product_id, func.sum(ShardSale.quantity).label("quantity"))
+        .join(ShardSale, ShardSale.shard_id == StockShard.id)
+        .group_by(StockShard.product_id)
+        .subquery()
+    )
+    pending = func.coalesce(unflushed.c.quantity, 0)
+    return (
+        select(
+            HotProduct.product_id,
+            HotProduct.shard_size,
+            (Product.stock - pending).label("stock"),
+            (func.coalesce(shards.c.allotted, 0) - pending).label("reserved"),
+            func.coalesce(shards.c.shards, 0).label("shards"),
+        )
+        .join(Product, Product.id == HotProduct.product_id)
+        .outerjoin(shards, shards.c.product_id == HotProduct.product_id)
+        .outerjoin(unflushed, unflushed.c.product_id == HotProduct.product_id)
+        .order_by(HotProduct.product_id)
+    )
+
+
+@router.get("/hot", response_model=list[schemas.HotProductOut])
+async def list_hot_products(db: AsyncSession = Depends(get_db), _ = Depends(require_admin)):
+    try:
+        return [row._mapping for row in (await db.execute(hot_products_query())).all()]
+    except Exception as e:
+        logger.error(f"Failed to list hot products: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to list hot products")
+
+
+@router.put("/hot/{product_id}", response_model=schemas.HotProductOut)
+async def mark_hot(
+    product_id: int,
+    data: schemas.HotProductIn = schemas.HotProductIn(),
+    db: AsyncSession = Depends(get_db),
+    _ = Depends(require_admin)
+):
+    try:
+        if await db.scalar(select(Product.id).where(Product.id == product_id)) is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        shard_size = data.shard_size or HOT_STOCK_SHARD_SIZE
+        statement = dialect_insert(HotProduct.__table__).values(product_id=product_id, shard_size=shard_size)
+        await db.execute(statement.on_conflict_do_update(index_elements=["product_id"], set_={"shard_size": shard_size}))
+        await db.commit()
+        # This worker takes its shard now; the others within HOT_STOCK_FLUSH_INTERVAL
+        hot_stock.wake()
+        logger.info(f"Product {product_id} marked hot (shard size {shard_size})")
+        return (await db.execute(hot_products_query().where(HotProduct.product_id == product_id))).one()._mapping
+
+    except HTTPException as http_exc:
+        raise http_exc
+
+    except Exception as e:
+        logger.error(f"Failed to mark product {product_id} hot: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to mark product hot")
+
+
+@router.delete("/hot/{product_id}")
+async def unmark_hot(product_id: int, db: AsyncSession = Depends(get_db), _ = Depends(require_admin)):
+    try:
+        removed = await db.execute(delete(HotProduct).where(HotProduct.product_id == product_id))
+        if not removed.rowcount:
+            raise HTTPException(status_code=404, detail="Product is not hot")
+        await db.commit()
+        # Workers stop selling from their shards and hand the units back on their next flush
+        hot_stock.wake()
+        logger.info(f"Product {product_id} no longer hot")
+        return {"message": "Product no longer hot"}
+
+    except HTTPException as http_exc:
+        raise http_exc
+
+    except Exception as e:
+        logger.error(f"Failed to unmark product {product_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to unmark product")
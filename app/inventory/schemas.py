@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class HotProductIn(BaseModel):
+    shard_size: Optional[int] = Field(None, gt=0, description="units each worker reserves at a time")
+
+class HotProductOut(BaseModel):
+    product_id: int
+    shard_size: int
+    # Sales not yet flushed are already subtracted from both
+    stock: int
+    reserved: int
+    shards: int
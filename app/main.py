@@ -1,33 +1,149 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from app.core.database import Base, engine
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from app.core.config import (
+    CACHE_WARMUP, EMAIL_WORKER_ENABLED, FAST_JSON, MAINTENANCE_ENABLED, METRICS_ENABLED, RATE_LIMIT_ENABLED,
+    SCHEMA_PREPARED,
+)
+from app.core.database import Base, engine, async_engine
+from app.core.logging_setup import setup_logging, logging_stats
+from app.core import metrics, rate_limit, signals
+from app.auth import password_pool, principals, revocation
+from app.products import cache as product_cache
+from app.emails import worker as email_worker
+from app.inventory import hot as hot_stock
+from app.checkout import writer as checkout_writer
+from app.maintenance import scheduler as maintenance
+from app.products.search import ensure_search_index
+from app.products.facets import ensure_facets
+from app.reports.rollups import ensure_rollups
 from app.auth.routes import router as auth_router
 from app.products.routes import router as admin_products_router
-from app.products.public_routes import router as public_products_router
+from app.products.public_routes import router as public_products_router, warm_cache
 from app.cart.routes import router as cart_router
 from app.checkout.routes import router as checkout_router
-from app.orders.routes import router as order_router
-from fastapi.responses import JSONResponse
+from app.orders.routes import router as order_router, admin_router as admin_orders_router
+from app.inventory.routes import router as inventory_router
+from app.reports.routes import router as reports_router
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 import logging
+import os
+import time
 import traceback
 from app.middlewares.logging_middleware import LoggingMiddleware
+from app.middlewares.metrics_middleware import MetricsMiddleware
+from app.middlewares.rate_limit_middleware import RateLimitMiddleware
+
+logger = logging.getLogger("ecommerce_logger")
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic")
+
+
+def check_schema():
+    """Refuse to start on a database older than the models. create_all() adds missing
+    tables but never missing columns, so such a database would fail on every query
+    that touches them. Returns True for an empty database."""
+    with engine.connect() as conn:
+        current = MigrationContext.configure(conn).get_current_revision()
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+        if current is not None:
+            head = ScriptDirectory(MIGRATIONS).get_current_head()
+            if current != head:
+                raise RuntimeError(
+                    f"Database schema is at revision {current}, this code needs {head}: run `alembic upgrade head`"
+                )
+            return False
+        # Not managed by alembic (made by create_all): compare the columns themselves
+        missing = [
+            f"{table.name}.{column.name}"
+            for table in Base.metadata.sorted_tables if table.name in tables
+            for column in table.columns
+            if column.name not in {c["name"] for c in inspector.get_columns(table.name)}
+        ]
+    if missing:
+        raise RuntimeError(f"Database schema is missing columns {', '.join(missing)}: run `alembic upgrade head`")
+    return not tables
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    handlers=[
-        logging.FileHandler("logs/app.log"),  
-        logging.StreamHandler()
-    ]
-)
 
-Base.metadata.create_all(bind=engine)
+def prepare_database():
+    # Schema DDL, search index, facet counts and sales rollups. Run once per start: by the
+    # launcher (python -m app.serve) before it starts its workers, else by the lifespan below.
+    fresh = check_schema()
+    Base.metadata.create_all(bind=engine)
+    if fresh:
+        # Created at the current schema: later migrations apply to it from here
+        with engine.begin() as conn:
+            MigrationContext.configure(conn).stamp(ScriptDirectory(MIGRATIONS), "heads")
+    ensure_search_index(engine)
+    ensure_facets(engine)
+    ensure_rollups(engine)
 
-app = FastAPI(title="E-commerce Backend System Using API")
 
-# Add logging middleware
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # Setup logging: handlers run on a background thread behind a bounded queue
+    setup_logging()
+    if SCHEMA_PREPARED:
+        ensure_search_index(engine, build=False)
+        ensure_facets(engine, build=False)
+    else:
+        prepare_database()
+    signals.attach()
+    if EMAIL_WORKER_ENABLED:
+        email_worker.start()
+    await hot_stock.start()
+    revocation.start()
+    if MAINTENANCE_ENABLED:
+        maintenance.start()
+    if CACHE_WARMUP:
+        try:
+            entries = await warm_cache()
+            logger.info(f"Cache warm-up built {entries} responses")
+        except Exception as e:
+            logger.error(f"Cache warm-up failed: {repr(e)}")
+    logger.info(f"Worker {os.getpid()} ready in {(time.perf_counter() - started) * 1000:.0f}ms")
+    yield
+    await maintenance.stop()
+    await revocation.stop()
+    # Queued hot-product orders settle their reservations before the shards are released
+    await checkout_writer.stop()
+    await hot_stock.stop()
+    await email_worker.stop()
+    password_pool.shutdown()
+    signals.detach()
+
+
+app = FastAPI(
+    title="E-commerce Backend System Using API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if FAST_JSON else JSONResponse,
+)
+
+# Add rate limiting, metrics and logging middleware (the last added runs first, so
+# refused requests are still counted and logged)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+if METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(async_engine.sync_engine)
+    metrics.register_collector("product_cache", product_cache.cache_stats)
+    metrics.register_collector("principal_cache", principals.principal_cache.stats)
+    metrics.register_collector("token_cache", principals.token_cache.stats)
+    metrics.register_collector("token_revocation", revocation.revocation_stats)
+    metrics.register_collector("password_pool", password_pool.pool_stats)
+    metrics.register_collector("email_delivery", email_worker.delivery_stats)
+    metrics.register_collector("hot_stock", hot_stock.stock_stats)
+    metrics.register_collector("maintenance", maintenance.maintenance_stats)
+    metrics.register_collector("log_queue", logging_stats)
+    if RATE_LIMIT_ENABLED:
+        metrics.register_collector("rate_limit", rate_limit.limit_stats)
+    app.add_middleware(MetricsMiddleware)
 app.add_middleware(LoggingMiddleware)
 
 # Include all routers
@@ -37,11 +153,19 @@ app.include_router(public_products_router)
 app.include_router(cart_router)
 app.include_router(checkout_router)
 app.include_router(order_router)
+app.include_router(admin_orders_router)
+app.include_router(inventory_router)
+app.include_router(reports_router)
 
 @app.get("/")
 def root():
     return {"message": "Welcome to the E-commerce Backend API"}
 
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Log HTTPException errors
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
@@ -49,6 +173,7 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     return JSONResponse(
         status_code=exc.status_code,
         content={"error": True, "message": exc.detail, "code": exc.status_code},
+        headers=getattr(exc, "headers", None),
     )
 
 #Log Validation errors 
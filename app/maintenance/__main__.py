@@ -0,0 +1,47 @@
+"""Runs the maintenance jobs once, e.g. from cron with MAINTENANCE_ENABLED=false.
+
+    python -m app.maintenance                         # the jobs in MAINTENANCE_JOBS
+    python -m app.maintenance expire_carts analyze
+    python -m app.maintenance --enable-incremental-vacuum
+
+A database created before incremental auto-vacuum was configured keeps its free pages
+until --enable-incremental-vacuum converts it. That takes a full VACUUM, which
+rewrites the file and holds the write lock until it is done: stop the app first.
+"""
+import argparse
+import asyncio
+import sys
+
+from app.maintenance.jobs import JOBS, enable_incremental_vacuum
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", nargs="*", metavar="job", help=f"any of {', '.join(JOBS)}")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true")
+    args = parser.parse_args()
+    unknown = [job for job in args.jobs if job not in JOBS]
+    if unknown:
+        parser.error(f"unknown jobs {', '.join(unknown)}")
+
+    from app.core.logging_setup import setup_logging
+    from app.maintenance import scheduler
+
+    setup_logging()
+    if args.enable_incremental_vacuum:
+        if not enable_incremental_vacuum():
+            print("auto_vacuum is not INCREMENTAL after VACUUM (not a SQLite database?)")
+            sys.exit(1)
+        print("Database rebuilt with auto_vacuum=INCREMENTAL")
+        if not args.jobs:
+            return
+
+    results = asyncio.run(scheduler.run_jobs(args.jobs))
+    for name, (rows, seconds) in results.items():
+        print(f"{name:20s} {rows:10d} rows {seconds * 1000:10.0f}ms")
+    if len(results) < len(args.jobs or scheduler.MAINTENANCE_JOBS):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Maintenance jobs for tables that only ever grow, and for the SQLite file itself.
+
+Each job is a generator of short steps: a step deletes at most MAINTENANCE_BATCH_SIZE
+rows, analyzes one table or frees MAINTENANCE_VACUUM_PAGES pages, commits, and yields
+how many rows (tables, pages) it touched. The scheduler runs one step at a time and
+lets other writers have the lock in between, so no job holds it for long.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, exists, func, select
+from app.auth.models import PasswordResetToken
+from app.cart.models import CartItem
+from app.core.config import (
+    CART_EXPIRY_DAYS, DATABASE_URL, EMAIL_OUTBOX_RETENTION_DAYS, MAINTENANCE_ANALYSIS_LIMIT, MAINTENANCE_BATCH_SIZE,
+    MAINTENANCE_VACUUM_PAGES,
+)
+from app.core.database import engine, is_sqlite
+from app.emails.models import EmailStatus, OutboxEmail
+
+logger = logging.getLogger("ecommerce_logger")
+
+# PRAGMA auto_vacuum value of a database that can give pages back with incremental_vacuum
+AUTO_VACUUM_INCREMENTAL = 2
+
+_vacuum_warned = False
+
+
+def utcnow():
+    # Naive UTC, the form the DateTime columns hold
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def purge_reset_tokens():
+    # Used tokens stay until they expire (minutes later), so a second use is still told
+    # "Token already used". Tokens expire in the order they were created: the expired
+    # ones are the lowest ids, found at the start of the primary key without an index.
+    tokens = PasswordResetToken.__table__
+    cutoff = utcnow()
+    expired = select(tokens.c.id).where(tokens.c.expiration_time < cutoff).order_by(tokens.c.id).limit(MAINTENANCE_BATCH_SIZE)
+    while True:
+        with engine.begin() as conn:
+            deleted = conn.execute(delete(tokens).where(tokens.c.id.in_(expired))).rowcount
+        yield deleted
+        if deleted < MAINTENANCE_BATCH_SIZE:
+            return
+
+
+def purge_outbox():
+    # Sent and permanently failed emails, whose bodies hold reset links in plain text, go
+    # EMAIL_OUTBOX_RETENTION_DAYS after they were queued. Rows are queued in id order, so
+    # the old ones are at the start of the primary key; pending ones are always kept.
+    outbox = OutboxEmail.__table__
+    cutoff = utcnow() - timedelta(days=EMAIL_OUTBOX_RETENTION_DAYS)
+    done = (
+        select(outbox.c.id)
+        .where(outbox.c.status.in_([EmailStatus.SENT, EmailStatus.FAILED]), outbox.c.created_at < cutoff)
+        .order_by(outbox.c.id)
+        .limit(MAINTENANCE_BATCH_SIZE)
+    )
+    while True:
+        with engine.begin() as conn:
+            deleted = conn.execute(delete(outbox).where(outbox.c.id.in_(done))).rowcount
+        yield deleted
+        if deleted < MAINTENANCE_BATCH_SIZE:
+            return
+
+
+def expire_carts():
+    # Empties carts none of whose lines changed for CART_EXPIRY_DAYS. The table is walked
+    # in id ranges of MAINTENANCE_BATCH_SIZE lines; a line goes only when its user has no
+    # recent one, checked in the DELETE itself so a line changed meanwhile is kept.
+    cart = CartItem.__table__
+    recent = cart.alias("recent")
+    cutoff = utcnow() - timedelta(days=CART_EXPIRY_DAYS)
+    touched_since = exists().where(recent.c.user_id == cart.c.user_id, recent.c.updated_at >= cutoff)
+    after = 0
+    while True:
+        batch = select(cart.c.id).where(cart.c.id > after).order_by(cart.c.id).limit(MAINTENANCE_BATCH_SIZE).subquery()
+        with engine.connect() as conn:
+            upto = conn.scalar(select(func.max(batch.c.id)))
+        if upto is None:
+            return
+        with engine.begin() as conn:
+            deleted = conn.execute(
+                delete(cart).where(cart.c.id > after, cart.c.id <= upto, cart.c.updated_at < cutoff, ~touched_since)
+            ).rowcount
+        yield deleted
+        after = upto
+
+
+def analyze():
+    # Planner statistics, one table per step. analysis_limit samples each index instead
+    # of reading all of it, which bounds how long a large table holds the lock.
+    if not is_sqlite(DATABASE_URL):
+        return  # server databases keep their own statistics
+    with engine.connect() as conn:
+        tables = conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+            "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%' ORDER BY name"
+        ).scalars().all()
+    for table in tables:
+        with engine.connect() as conn:
+            conn.exec_driver_sql(f"PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}")
+            conn.exec_driver_sql(f'ANALYZE "{table}"')
+            conn.commit()
+        yield 1
+
+
+def incremental_vacuum():
+    # Gives free pages back to the file system. One page per PRAGMA call: the sqlite3
+    # driver runs only the first step of `incremental_vacuum(N)`, which frees one page.
+    global _vacuum_warned
+    if not is_sqlite(DATABASE_URL):
+        return
+    while True:
+        with engine.connect() as conn:
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != AUTO_VACUUM_INCREMENTAL:
+                if not _vacuum_warned:
+                    logger.warning(
+                        "Incremental vacuum skipped: the database was created without auto_vacuum=INCREMENTAL, "
+                        "run `python -m app.maintenance --enable-incremental-vacuum` with the app stopped"
+                    )
+                    _vacuum_warned = True
+                return
+            free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            if not free:
+                return
+            pages = min(free, MAINTENANCE_VACUUM_PAGES)
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            for _ in range(pages):
+                conn.exec_driver_sql("PRAGMA incremental_vacuum(1)")
+            conn.commit()
+        yield pages
+
+
+JOBS = {
+    "purge_reset_tokens": purge_reset_tokens,
+    "purge_outbox": purge_outbox,
+    "expire_carts": expire_carts,
+    "analyze": analyze,
+    "incremental_vacuum": incremental_vacuum,
+}
+
+
+def enable_incremental_vacuum():
+    """Switches an existing database to incremental auto-vacuum. Takes a full VACUUM, which
+    rewrites the file and holds the write lock throughout: run it with the app stopped."""
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        return conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == AUTO_VACUUM_INCREMENTAL
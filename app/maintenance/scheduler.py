@@ -0,0 +1,145 @@
+"""Runs the maintenance jobs (app.maintenance.jobs) in the background of one worker.
+
+Every worker starts the scheduler. On each run the workers of `python -m app.serve`
+try to take an exclusive lock on a file next to the SQLite database: the worker that
+gets it runs the jobs and keeps the lock until it stops, the others try again on the
+next run. The lock is released when its process dies, so another worker takes over.
+Steps run in the threadpool, with MAINTENANCE_BATCH_PAUSE after every step that
+changed something, so requests get the write lock between them.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from sqlalchemy.engine import make_url
+from starlette.concurrency import run_in_threadpool
+from app.core.config import (
+    DATABASE_URL, MAINTENANCE_BATCH_PAUSE, MAINTENANCE_INITIAL_DELAY, MAINTENANCE_INTERVAL, MAINTENANCE_JOBS,
+)
+from app.maintenance.jobs import JOBS
+
+try:
+    import fcntl
+except ImportError:  # Windows: no app.serve workers to elect one from
+    fcntl = None
+
+logger = logging.getLogger("ecommerce_logger")
+
+unknown = [job for job in MAINTENANCE_JOBS if job not in JOBS]
+if unknown:
+    raise ValueError(f"Unknown MAINTENANCE_JOBS {', '.join(unknown)}; jobs are {', '.join(JOBS)}")
+
+_lock = threading.Lock()
+_stats = {
+    f"{job}_{key}": 0
+    for job in JOBS
+    for key in ("runs", "rows", "seconds", "last_rows", "last_seconds", "errors")
+}
+_stats["leader"] = 0
+
+_task = None
+_lock_fd = None
+
+
+def count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+def maintenance_stats():
+    with _lock:
+        return dict(_stats)
+
+
+def lock_path():
+    # Next to the database file, which the workers share; None for other databases
+    database = make_url(DATABASE_URL).database
+    if make_url(DATABASE_URL).get_backend_name() != "sqlite" or database in (None, "", ":memory:"):
+        return None
+    return os.path.abspath(database) + "-maintenance.lock"
+
+
+def lead() -> bool:
+    # Whether this process runs the jobs: the first to lock the file does, until it exits
+    global _lock_fd
+    if _lock_fd is not None:
+        return True
+    path = lock_path()
+    if fcntl is None or path is None:
+        return True
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return False
+    _lock_fd = fd
+    with _lock:
+        _stats["leader"] = 1
+    logger.info(f"Worker {os.getpid()} runs the maintenance jobs")
+    return True
+
+
+async def run_job(name) -> tuple[int, float]:
+    """(rows touched, seconds) of one run of the job."""
+    steps = JOBS[name]()
+    rows, started = 0, time.perf_counter()
+    while (touched := await run_in_threadpool(next, steps, None)) is not None:
+        rows += touched
+        if touched:
+            await asyncio.sleep(MAINTENANCE_BATCH_PAUSE)
+    seconds = time.perf_counter() - started
+    with _lock:
+        _stats[f"{name}_runs"] += 1
+        _stats[f"{name}_rows"] += rows
+        _stats[f"{name}_seconds"] += seconds
+        _stats[f"{name}_last_rows"] = rows
+        _stats[f"{name}_last_seconds"] = seconds
+    logger.info(f"Maintenance job {name}: {rows} rows in {seconds * 1000:.0f}ms")
+    return rows, seconds
+
+
+async def run_jobs(names=None) -> dict:
+    """Runs the jobs one after the other; {name: (rows, seconds)} of those that succeeded."""
+    results = {}
+    for name in names or MAINTENANCE_JOBS:
+        try:
+            results[name] = await run_job(name)
+        except Exception as e:
+            logger.error(f"Maintenance job {name} failed: {repr(e)}")
+            count(f"{name}_errors")
+    return results
+
+
+async def _run():
+    await asyncio.sleep(MAINTENANCE_INITIAL_DELAY)
+    while True:
+        try:
+            if lead():
+                await run_jobs()
+        except Exception as e:
+            logger.error(f"Maintenance run failed: {repr(e)}")
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
+
+
+def start():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task, _lock_fd
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    fd, _lock_fd = _lock_fd, None
+    if fd is not None:
+        os.close(fd)
+        with _lock:
+            _stats["leader"] = 0
@@ -1,11 +1,55 @@
 import logging
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+import time
+import uuid
+from app.core.config import ACCESS_LOG
+from app.core.logging_setup import request_id
 
-logger = logging.getLogger("ecommerce_logger")
+logger = logging.getLogger("ecommerce_logger.access")
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        logger.info(f"{request.client.host} - {request.method} {request.url.path}")
-        response = await call_next(request)
-        return response
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+class LoggingMiddleware:
+    """Plain ASGI middleware: tags each request with an ID (the caller's X-Request-ID
+    or a new one, echoed in the response) and logs one access record when it ends."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        token = request_id.set(rid)
+        started = time.perf_counter()
+        response = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, rid.encode("latin-1"))]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if ACCESS_LOG:
+                duration_ms = (time.perf_counter() - started) * 1000
+                client = scope["client"][0] if scope.get("client") else "-"
+                path = scope["path"]
+                logger.info(
+                    f"{client} - {scope['method']} {path} {response['status']} {response['bytes']}B {duration_ms:.1f}ms",
+                    extra={
+                        "client": client,
+                        "method": scope["method"],
+                        "path": path,
+                        "status": response["status"],
+                        "bytes": response["bytes"],
+                        "duration_ms": round(duration_ms, 2),
+                    },
+                )
+            request_id.reset(token)
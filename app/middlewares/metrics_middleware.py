@@ -0,0 +1,33 @@
+import time
+from app.core import metrics
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware recording latency, status and DB usage per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = metrics.RequestStats(scope)
+        token = metrics.current_request.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.request_started(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.request_finished(method, stats.route, status, time.perf_counter() - started, stats)
+            metrics.current_request.reset(token)
@@ -0,0 +1,97 @@
+import json
+import math
+from fastapi.responses import JSONResponse
+from app.core import rate_limit
+from app.core.config import RATE_LIMIT_MAX_BODY, RATE_LIMIT_TRUST_FORWARDED
+
+FORWARDED_HEADER = b"x-forwarded-for"
+LENGTH_HEADER = b"content-length"
+
+
+def client_address(scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = dict(scope["headers"]).get(FORWARDED_HEADER, b"").decode("latin-1")
+        if forwarded:
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return scope["client"][0] if scope.get("client") else ""
+
+
+def account_of(body: bytes) -> str:
+    # The email a signin or password reset is for; anything else has no account to limit
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return ""
+    email = payload.get("email") if isinstance(payload, dict) else None
+    return email.strip().lower() if isinstance(email, str) else ""
+
+
+def refusal(status_code: int, message: str, headers=None):
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": True, "message": message, "code": status_code},
+        headers=headers,
+    )
+
+
+def too_many(retry_after: float):
+    return refusal(429, "Too many requests, try again later", {"Retry-After": str(math.ceil(retry_after))})
+
+
+class RateLimitMiddleware:
+    """Plain ASGI middleware: refuses requests over their route's limits (app.core.rate_limit)
+    with 429 and Retry-After before the handler runs, so they cost no hashing or query."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = f"{scope['method']} {scope['path']}"
+        limits = rate_limit.RULES.get(route)
+        if not limits:
+            await self.app(scope, receive, send)
+            return
+
+        values = {"ip": client_address(scope)}
+        if any(limit.key == "account" for limit in limits):
+            # A client over its address limit is refused before its body is read. Looking
+            # takes no token: the check below takes them from all limits or none.
+            retry_after = await rate_limit.check(route, {"ip": values["ip"]}, take=False)
+            if retry_after:
+                await too_many(retry_after)(scope, receive, send)
+                return
+            # Read the body for its email, then hand the same messages to the app. The
+            # bodies of these routes are a few fields, so a large one is refused unread.
+            length = dict(scope["headers"]).get(LENGTH_HEADER, b"")
+            if length.isdigit() and int(length) > RATE_LIMIT_MAX_BODY:
+                await refusal(413, "Request body too large")(scope, receive, send)
+                return
+            messages, body = [], b""
+            while True:
+                message = await receive()
+                messages.append(message)
+                if message["type"] != "http.request":
+                    break
+                body += message.get("body", b"")
+                if len(body) > RATE_LIMIT_MAX_BODY:
+                    await refusal(413, "Request body too large")(scope, receive, send)
+                    return
+                if not message.get("more_body"):
+                    break
+            values["account"] = account_of(body)
+
+            async def replay():
+                if messages:
+                    return messages.pop(0)
+                return await receive()
+
+            receive = replay
+
+        retry_after = await rate_limit.check(route, values)
+        if retry_after:
+            await too_many(retry_after)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
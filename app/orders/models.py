@@ -1,6 +1,5 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Enum as SqlE 
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Index, Enum as SqlE 
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
 from datetime import datetime, timezone
 from app.core.database import Base
 from enum import Enum
@@ -16,7 +15,8 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     total_amount = Column(Float)
     status = Column(SqlE(OrderStatus), default=OrderStatus.PENDING)
-    created_at = Column(DateTime(timezone=True), default=func.now())
+    # Set in Python (UTC) so stored values share the format of bound cursor/filter values
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     
     items = relationship("OrderItem", back_populates="order")
     user = relationship("User", back_populates="orders")
@@ -24,11 +24,15 @@ class Order(Base):
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"))
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), index=True)
     product_id = Column(Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True)
     product_name = Column(String) 
     quantity = Column(Integer)
     price_at_purchase = Column(Float)
     
     order = relationship("Order", back_populates="items")
-    product = relationship("Product", passive_deletes=True)
\ No newline at end of file
+    product = relationship("Product", passive_deletes=True)
+
+
+# Serves a user's order history newest first: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+Index("ix_orders_user_created_id", Order.user_id, Order.created_at, Order.id)
@@ -1,29 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.utils.dependency import require_user, get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.core.config import FAST_JSON
+from app.utils.dependency import require_admin, require_user, get_db
+from app.utils import export, serialization
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_before, set_next_cursor
 from app.orders import models, schemas
+from datetime import datetime, timezone
+from typing import Literal, Optional
 import logging
 
 logger = logging.getLogger("ecommerce_logger")
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
+admin_router = APIRouter(prefix="/admin/orders", tags=["Admin - Orders"])
+
+
+# Newest first; id breaks ties between orders placed in the same instant
+HISTORY_ORDER = [models.Order.created_at, models.Order.id]
+
+
+# Columns selected by the FAST_JSON path, in response model field order
+ORDER_OUT_FIELDS, ORDER_OUT_COLUMNS = serialization.model_columns(schemas.OrderOut, models.Order.__table__)
+ITEM_OUT_FIELDS, ITEM_OUT_COLUMNS = serialization.model_columns(schemas.OrderItemOut, models.OrderItem.__table__)
+
+
+def as_utc(value: Optional[datetime]):
+    # Stored timestamps are naive UTC
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def history_cursor(page, limit: int):
+    # Orders or rows alike: both have created_at and id attributes
+    if len(page) < limit:
+        return None
+    last = page[-1]
+    return encode_cursor([last.created_at.isoformat(), last.id])
+
+
+async def order_records(db, rows):
+    # FAST_JSON: OrderOut dicts for a page of order rows, items loaded with one IN query
+    orders = serialization.records(ORDER_OUT_FIELDS, rows)
+    by_id = {}
+    for order in orders:
+        order["items"] = []
+        by_id[order["id"]] = order
+    if by_id:
+        items = await db.execute(
+            select(models.OrderItem.order_id, *ITEM_OUT_COLUMNS)
+            .where(models.OrderItem.order_id.in_(by_id))
+            .order_by(models.OrderItem.id)
+        )
+        for order_id, *item in items:
+            by_id[order_id]["items"].append(dict(zip(ITEM_OUT_FIELDS, item)))
+    return orders
 
 
 @router.get("/", response_model=list[schemas.OrderOut])
-def order_history(db: Session = Depends(get_db), user=Depends(require_user)):
+async def order_history(
+    response: Response,
+    status: Optional[models.OrderStatus] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header value of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_user)
+):
     try:
-        orders = db.query(models.Order).filter_by(user_id=user.id).all()
+        query = (
+            select(models.Order)
+            .filter_by(user_id=user.id)
+            .order_by(*(col.desc() for col in HISTORY_ORDER))
+        )
+        if status:
+            query = query.where(models.Order.status == status)
+        if created_from:
+            query = query.where(models.Order.created_at >= as_utc(created_from))
+        if created_to:
+            query = query.where(models.Order.created_at < as_utc(created_to))
+        if cursor:
+            created_at, last_id = decode_cursor(cursor, 2)
+            try:
+                created_at = as_utc(datetime.fromisoformat(created_at))
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.where(keyset_before(HISTORY_ORDER, [created_at, last_id]))
+
+        # Two statements per page however many orders the user has: the page, then its items
+        if FAST_JSON:
+            rows = (await db.execute(query.with_only_columns(*ORDER_OUT_COLUMNS).limit(limit))).all()
+            orders = await order_records(db, rows)
+            logger.info(f"Fetched order history for user {user.id}")
+            return serialization.json_response(serialization.dumps(orders), history_cursor(rows, limit))
+
+        orders = (await db.scalars(query.options(selectinload(models.Order.items)).limit(limit))).all()
+        set_next_cursor(response, history_cursor(orders, limit))
         logger.info(f"Fetched order history for user {user.id}")
         return orders
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"Error fetching order history for user {user.id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Something went wrong while fetching order history")
 
 
 @router.get("/{order_id}", response_model=schemas.OrderOut)
-def order_detail(order_id: int, db: Session = Depends(get_db), user=Depends(require_user)):
+async def order_detail(order_id: int, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
     try:
-        order = db.query(models.Order).filter_by(id=order_id, user_id=user.id).first()
+        order = await db.scalar(
+            select(models.Order)
+            .options(selectinload(models.Order.items))
+            .filter_by(id=order_id, user_id=user.id)
+        )
 
         if not order:
             logger.warning(f"Order not found (User: {user.id}, Order ID: {order_id})")
@@ -38,3 +130,68 @@ def order_detail(order_id: int, db: Session = Depends(get_db), user=Depends(requ
     except Exception as e:
         logger.error(f"Error fetching order details for user {user.id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Something went wrong while fetching order details")
+
+
+ORDER_FIELDS = ["user_id", "status", "total_amount", "created_at"]
+ITEM_FIELDS = ["product_id", "product_name", "quantity", "price_at_purchase"]
+EXPORT_COLUMNS = ["order_id", *ORDER_FIELDS, "item_id", *ITEM_FIELDS]
+
+
+async def group_items(batches):
+    # Rows arrive ordered by order id, one per item; an order may straddle two batches
+    pending = None
+    async for records in batches:
+        orders = []
+        for record in records:
+            if pending is None or pending["id"] != record["order_id"]:
+                if pending is not None:
+                    orders.append(pending)
+                pending = {"id": record["order_id"], **{key: record[key] for key in ORDER_FIELDS}, "items": []}
+            if record["item_id"] is not None:
+                pending["items"].append({"id": record["item_id"], **{key: record[key] for key in ITEM_FIELDS}})
+        if orders:
+            yield orders
+    if pending is not None:
+        yield [pending]
+
+
+@admin_router.get("/export")
+async def export_orders(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    status: Optional[models.OrderStatus] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    _ = Depends(require_admin)
+):
+    # One joined query walked in order id order (no sort step), streamed as it is read.
+    # NDJSON nests each order's items; CSV has one line per item.
+    try:
+        order, item = models.Order.__table__, models.OrderItem.__table__
+        query = (
+            select(
+                order.c.id.label("order_id"),
+                *(order.c[key] for key in ORDER_FIELDS),
+                item.c.id.label("item_id"),
+                *(item.c[key] for key in ITEM_FIELDS),
+            )
+            .select_from(order.outerjoin(item, item.c.order_id == order.c.id))
+            .order_by(order.c.id)
+        )
+        if status:
+            query = query.where(order.c.status == status)
+        if created_from:
+            query = query.where(order.c.created_at >= as_utc(created_from))
+        if created_to:
+            query = query.where(order.c.created_at < as_utc(created_to))
+
+        batches = export.stream_rows(query)
+        if format == "ndjson":
+            batches = group_items(batches)
+        logger.info(f"Order export started ({format}{', gzip' if gzip else ''})")
+        return export.export_response(batches, "orders", format, EXPORT_COLUMNS, gzip)
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        logger.error(f"Failed to export orders: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to export orders")
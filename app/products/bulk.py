@@ -0,0 +1,240 @@
+import codecs
+import csv
+import json
+import time
+from pydantic import ValidationError
+from sqlalchemy import case, select
+from app.core.config import PRODUCT_IMPORT_BATCH_SIZE, PRODUCT_IMPORT_MAX_ERRORS
+from app.core.database import dialect_insert
+from app.products import cache, models, schemas
+from app.inventory.models import HotProduct
+
+import logging
+
+logger = logging.getLogger("ecommerce_logger")
+
+FORMATS = ("csv", "ndjson")
+FIELDS = list(schemas.ProductCreate.model_fields)
+REQUIRED_FIELDS = [name for name, field in schemas.ProductCreate.model_fields.items() if field.is_required()]
+OPTIONAL_FIELDS = [name for name in FIELDS if name not in REQUIRED_FIELDS]
+MAX_LINE_LENGTH = 1024 * 1024
+# A CSV record spanning lines (quoted newlines) is held until its quotes balance
+MAX_RECORD_LENGTH = MAX_LINE_LENGTH
+MAX_RECORD_LINES = 1000
+
+class ImportAborted(Exception):
+    pass
+
+
+class RowError(ValueError):
+    """A row that could not be read; the import goes on with the next one."""
+
+
+def detect_format(content_type: str):
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or "json-lines" in content_type:
+        return "ndjson"
+    return None
+
+
+async def read_lines(chunks):
+    """(line number, text) for each line of a streamed UTF-8 body, holding one partial line at most."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    line_no = 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            line_no += 1
+            yield line_no, line + "\n"
+        if len(pending) > MAX_LINE_LENGTH:
+            raise ImportAborted(f"Line {line_no + 1} is longer than {MAX_LINE_LENGTH} characters")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield line_no + 1, pending
+
+
+async def csv_rows(lines):
+    header = None
+    parts, length, quoted, first_line = [], 0, False, None
+    skipping = False
+    async for line_no, line in lines:
+        first_line = first_line or line_no
+        # A quoted field may span lines; the record ends once its quotes balance.
+        # Only this line's quotes are counted, the record so far is never rescanned.
+        if line.count('"') % 2:
+            quoted = not quoted
+        if skipping:
+            # The rest of a record already rejected as too long: read past it, keep nothing
+            if not quoted:
+                skipping, first_line = False, None
+            continue
+        parts.append(line)
+        length += len(line)
+        if quoted:
+            if length > MAX_RECORD_LENGTH or len(parts) > MAX_RECORD_LINES:
+                if header is None:
+                    raise ImportAborted(f"CSV header starting on line {first_line} has an unterminated quoted field")
+                yield first_line, RowError(
+                    f"Record is longer than {MAX_RECORD_LENGTH} characters or {MAX_RECORD_LINES} lines"
+                    " (unterminated quoted field?)"
+                )
+                parts, length, skipping = [], 0, True
+            continue
+        values = next(csv.reader(["".join(parts)]), [])
+        start, parts, length, first_line = first_line, [], 0, None
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            missing = [name for name in REQUIRED_FIELDS if name not in header]
+            if missing:
+                raise ImportAborted(f"CSV header is missing columns: {', '.join(missing)}")
+            continue
+        # Empty cells mean "not given" for optional columns (sku), and stay "" otherwise
+        yield start, {
+            name: value for name, value in zip(header, values)
+            if value != "" or name not in OPTIONAL_FIELDS
+        }
+    if quoted:
+        raise ImportAborted(f"Unterminated quoted field starting on line {first_line}")
+
+
+async def ndjson_rows(lines):
+    async for line_no, line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, e
+
+
+def validate_row(data):
+    """(product values, None) or (None, error list)."""
+    if isinstance(data, RowError):
+        return None, [{"field": None, "message": str(data)}]
+    if isinstance(data, ValueError):
+        return None, [{"field": None, "message": f"Invalid JSON: {data}"}]
+    if not isinstance(data, dict):
+        return None, [{"field": None, "message": "Expected an object"}]
+    try:
+        return schemas.ProductCreate.model_validate(data).model_dump(), None
+    except ValidationError as e:
+        return None, [
+            {"field": ".".join(str(part) for part in error["loc"]) or None, "message": error["msg"]}
+            for error in e.errors()
+        ]
+
+
+def upsert_statement():
+    # Rows with a sku update the existing product in place; rows without one are inserted.
+    # One Core statement run with executemany: compiled once and cached, where a multi-row
+    # VALUES statement would be re-rendered with thousands of parameters for every batch.
+    table = models.Product.__table__
+    statement = dialect_insert(table)
+    set_ = {name: statement.excluded[name] for name in FIELDS if name != "sku"}
+    # Hot products keep their stock: part of it sits in workers' stock shards
+    set_["stock"] = case(
+        (table.c.id.in_(select(HotProduct.product_id)), table.c.stock), else_=statement.excluded.stock
+    )
+    return statement.on_conflict_do_update(index_elements=[table.c.sku], set_=set_)
+
+
+UPSERT = upsert_statement()
+
+
+class ImportReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.errors_truncated = False
+        self.aborted = None
+
+    def reject(self, line_no, errors, count=1):
+        # The report is the only thing that grows with the upload, so it is capped too
+        self.failed += count
+        if len(self.errors) < PRODUCT_IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line_no, "errors": errors})
+        else:
+            self.errors_truncated = True
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed else None,
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+            "aborted": self.aborted,
+        }
+
+
+async def write_batch(db, batch, report):
+    """Upsert one batch of (line number, values) in its own transaction."""
+    # Later rows win when a feed repeats a sku within one statement
+    by_sku = {}
+    rows = []
+    for _, values in batch:
+        if values["sku"] is None:
+            rows.append(values)
+        else:
+            by_sku[values["sku"]] = values
+    rows.extend(by_sku.values())
+
+    try:
+        existing = set((await db.scalars(
+            select(models.Product.sku).where(models.Product.sku.in_(list(by_sku)))
+        )).all()) if by_sku else set()
+        await db.execute(UPSERT, rows)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Product import batch at line {batch[0][0]} failed: {str(e)}")
+        report.reject(batch[0][0], [{
+            "field": None,
+            "message": f"Batch of {len(batch)} rows (lines {batch[0][0]}-{batch[-1][0]}) was not saved: {e.__class__.__name__}",
+        }], count=len(batch))
+        return
+
+    updated = len(existing) + (len(batch) - len(rows))
+    report.updated += updated
+    report.inserted += len(batch) - updated
+    cache.invalidate_all()
+
+
+async def import_products(db, chunks, fmt: str) -> dict:
+    """Validate and upsert a streamed CSV or NDJSON body, PRODUCT_IMPORT_BATCH_SIZE rows at a time."""
+    report = ImportReport()
+    parse = csv_rows if fmt == "csv" else ndjson_rows
+    batch = []
+    try:
+        async for line_no, data in parse(read_lines(chunks)):
+            report.rows += 1
+            values, errors = validate_row(data)
+            if errors:
+                report.reject(line_no, errors)
+                continue
+            batch.append((line_no, values))
+            if len(batch) >= PRODUCT_IMPORT_BATCH_SIZE:
+                await write_batch(db, batch, report)
+                batch = []
+    except ImportAborted as e:
+        # Rows before the problem are still saved; the report says where reading stopped
+        report.aborted = str(e)
+    except UnicodeDecodeError as e:
+        report.aborted = f"Body is not valid UTF-8: {e.reason}"
+    if batch:
+        await write_batch(db, batch, report)
+    return report.as_dict()
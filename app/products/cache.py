@@ -0,0 +1,63 @@
+from pydantic import TypeAdapter
+from app.core.cache import TTLCache
+from app.core.config import PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL
+from app.core.signals import Channel
+from app.products.models import Product
+from app.products.schemas import FacetsOut, ProductOut
+from app.utils.serialization import dump_rows, model_columns
+
+# Single products are invalidated one key at a time; listings and searches can
+# gain or lose rows on any product change, so they are dropped together. Both are
+# dropped in the other workers as well.
+detail_cache = TTLCache(maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL, channel=Channel("product_detail"))
+listing_cache = TTLCache(maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL, channel=Channel("product_listing"))
+
+product_adapter = TypeAdapter(ProductOut)
+product_list_adapter = TypeAdapter(list[ProductOut])
+facets_adapter = TypeAdapter(FacetsOut)
+
+# Columns selected by the FAST_JSON list path, in ProductOut field order
+PRODUCT_FIELDS, PRODUCT_COLUMNS = model_columns(ProductOut, Product.__table__)
+
+
+def serialize_product(product) -> bytes:
+    return product_adapter.dump_json(product_adapter.validate_python(product, from_attributes=True))
+
+
+def serialize_products(products) -> bytes:
+    return product_list_adapter.dump_json(product_list_adapter.validate_python(products, from_attributes=True))
+
+
+def serialize_product_rows(rows) -> bytes:
+    return dump_rows(PRODUCT_FIELDS, rows)
+
+
+def serialize_facets(facets: dict) -> bytes:
+    return facets_adapter.dump_json(facets_adapter.validate_python(facets))
+
+
+def invalidate_product(product_id: int):
+    detail_cache.delete(product_id)
+    listing_cache.clear()
+
+
+def invalidate_listings():
+    listing_cache.clear()
+
+
+def invalidate_all():
+    detail_cache.clear()
+    listing_cache.clear()
+
+
+def invalidate_stock(product_ids):
+    # Stock-only changes (checkout) refresh the detail pages right away; listings
+    # catch up within PRODUCT_CACHE_TTL instead of being flushed on every order.
+    # Other workers' detail pages catch up the same way: telling them would empty
+    # their whole detail cache on every checkout.
+    for product_id in product_ids:
+        detail_cache.delete(product_id, broadcast=False)
+
+
+def cache_stats() -> dict:
+    return {"detail": detail_cache.stats(), "listing": listing_cache.stats()}
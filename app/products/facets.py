@@ -0,0 +1,207 @@
+from sqlalchemy import and_, case, func, literal, or_, select, text
+from app.core.config import PRODUCT_FACET_PRICE_EDGES, PRODUCT_FACET_PRICE_SLICES
+from app.products.models import Product
+
+# Product counts per (category, price slice, in stock), kept current by triggers on
+# every write to the products table like the search index. Facets are read from these
+# few thousand rows instead of grouping the whole catalog on each request.
+# Histogram bucket i holds prices from EDGES[i] up to (not including) EDGES[i + 1] and
+# the last one is open. Counts are kept per slice, a bucket cut into equal parts, so a
+# price bound between two edges leaves only the products of one slice to count.
+EDGES = PRODUCT_FACET_PRICE_EDGES
+
+
+def price_slices():
+    # (low, high, bucket) of every slice, in price order
+    slices = []
+    for i, low in enumerate(EDGES):
+        if i + 1 == len(EDGES):
+            slices.append((low, None, i))
+            break
+        high = EDGES[i + 1]
+        points = [low + (high - low) * j / PRODUCT_FACET_PRICE_SLICES for j in range(PRODUCT_FACET_PRICE_SLICES)]
+        slices += [(start, end, i) for start, end in zip(points, points[1:] + [high])]
+    # The first slice also holds anything priced below the first edge (prices are positive)
+    slices[0] = (min(slices[0][0], 0.0),) + slices[0][1:]
+    return slices
+
+
+SLICES = price_slices()
+
+
+def slice_sql(price: str) -> str:
+    whens = " ".join(f"WHEN {price} < {high!r} THEN {k}" for k, (_, high, _) in enumerate(SLICES[:-1]))
+    return f"CASE {whens} ELSE {len(SLICES) - 1} END" if whens else "0"
+
+
+def slice_expression(price):
+    whens = [(price < high, k) for k, (_, high, _) in enumerate(SLICES[:-1])]
+    return case(*whens, else_=len(SLICES) - 1) if whens else literal(0)
+
+
+def facet_ddl():
+    def change(row: str, delta: int) -> str:
+        return f"""
+            INSERT INTO product_facets (category, slice, in_stock, products)
+            VALUES (coalesce({row}.category, ''), {slice_sql(f"{row}.price")}, {row}.stock > 0, {delta})
+            ON CONFLICT (category, slice, in_stock) DO UPDATE SET products = products + excluded.products;
+        """
+
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS product_facets (
+            category TEXT NOT NULL,
+            slice INTEGER NOT NULL,
+            in_stock INTEGER NOT NULL,
+            products INTEGER NOT NULL,
+            PRIMARY KEY (category, slice, in_stock)
+        ) WITHOUT ROWID
+        """,
+        f"CREATE TRIGGER product_facets_ai AFTER INSERT ON products BEGIN {change('new', 1)} END",
+        f"CREATE TRIGGER product_facets_ad AFTER DELETE ON products BEGIN {change('old', -1)} END",
+        # Only changes that move a product to another facet row touch the table
+        f"""
+        CREATE TRIGGER product_facets_au AFTER UPDATE OF category, price, stock ON products
+        WHEN coalesce(old.category, '') != coalesce(new.category, '')
+            OR (old.price != new.price AND {slice_sql("old.price")} != {slice_sql("new.price")})
+            OR (old.stock > 0) != (new.stock > 0)
+        BEGIN {change('old', -1)} {change('new', 1)} END
+        """,
+    ]
+
+
+REBUILD_SQL = f"""
+    INSERT INTO product_facets (category, slice, in_stock, products)
+    SELECT coalesce(category, ''), {slice_sql("price")}, stock > 0, count(*)
+    FROM products GROUP BY 1, 2, 3
+"""
+
+_facets_enabled = False
+
+
+def ensure_facets(engine, build: bool = True):
+    # build=False only checks the counts are there for these slices, else facets fall back to GROUP BY
+    global _facets_enabled
+    if engine.dialect.name != "sqlite":
+        _facets_enabled = False
+        return False
+
+    ddl = facet_ddl()
+    with engine.begin() as conn:
+        current = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'product_facets_ai'")
+        ).scalar()
+        current = current is not None and current.split() == ddl[1].split()
+        if not build:
+            _facets_enabled = current
+            return current
+        # Missing triggers or other price slices: recount everything under the new ones
+        if not current:
+            for trigger in ("product_facets_ai", "product_facets_ad", "product_facets_au"):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+            conn.execute(text("DROP TABLE IF EXISTS product_facets"))
+            for statement in ddl:
+                conn.execute(text(statement))
+            conn.execute(text(REBUILD_SQL))
+
+    _facets_enabled = True
+    return True
+
+
+def bucket_bounds(i: int):
+    return EDGES[i], EDGES[i + 1] if i + 1 < len(EDGES) else None
+
+
+def price_coverage(k: int, min_price: float, max_price):
+    # "all", "none" or "part" of slice k lies within min_price <= price <= max_price
+    low, high, _ = SLICES[k]
+    if (high is not None and high <= min_price) or (max_price is not None and low > max_price):
+        return "none"
+    if low >= min_price and (max_price is None or (high is not None and high <= max_price)):
+        return "all"
+    return "part"
+
+
+async def facet_rows(db):
+    # (category, slice, in_stock, products) for the whole catalog
+    if _facets_enabled:
+        result = await db.execute(text(
+            "SELECT category, slice, in_stock, products FROM product_facets WHERE products > 0"
+        ))
+    else:
+        price_slice = slice_expression(Product.price)
+        category = func.coalesce(Product.category, "")
+        in_stock = Product.stock > 0
+        result = await db.execute(
+            select(category, price_slice, in_stock, func.count()).group_by(category, price_slice, in_stock)
+        )
+    return [(category, price_slice, bool(in_stock), products) for category, price_slice, in_stock, products in result]
+
+
+async def partial_rows(db, slices, min_price: float, max_price):
+    # (category, in_stock, products) for the prices in range that fall in partly covered slices.
+    # Each slice is its own bounded range so the price index is scanned only there.
+    ranges = []
+    for k in slices:
+        low, high, _ = SLICES[k]
+        bounds = [Product.price >= max(low, min_price)]
+        if max_price is not None and (high is None or max_price < high):
+            bounds.append(Product.price <= max_price)
+        elif high is not None:
+            bounds.append(Product.price < high)
+        ranges.append(and_(*bounds))
+    category = func.coalesce(Product.category, "")
+    in_stock = Product.stock > 0
+    result = await db.execute(select(category, in_stock, func.count()).where(or_(*ranges)).group_by(category, in_stock))
+    return [(category, bool(in_stock), products) for category, in_stock, products in result]
+
+
+def tally(counts: dict, key, in_stock: bool, products: int):
+    entry = counts.setdefault(key, [0, 0])
+    entry[0] += products
+    if in_stock:
+        entry[1] += products
+
+
+async def compute_facets(db, category, min_price: float, max_price):
+    """Category counts under the price filter, the price histogram under the category
+    filter, and totals under both. `category` is lowercase, as in the listing."""
+    rows = await facet_rows(db)
+    coverage = [price_coverage(k, min_price, max_price) for k in range(len(SLICES))]
+    partial = [k for k, covered in enumerate(coverage) if covered == "part"]
+
+    in_range = [(name, in_stock, products) for name, k, in_stock, products in rows if coverage[k] == "all"]
+    if partial:
+        # Only the slices a price bound falls inside are counted row by row
+        in_range += await partial_rows(db, partial, min_price, max_price)
+
+    totals, by_category, spellings = {}, {}, {}
+    for name, in_stock, products in in_range:
+        if category is None or name.lower() == category:
+            tally(totals, None, in_stock, products)
+        if name:
+            # The listing filter ignores case, so spellings of one category count together
+            tally(by_category, name.lower(), in_stock, products)
+            spellings[name] = spellings.get(name, 0) + products
+
+    histogram = {}
+    for name, k, in_stock, products in rows:
+        if category is None or name.lower() == category:
+            tally(histogram, SLICES[k][2], in_stock, products)
+    # Each category is shown under its most common spelling
+    labels = {}
+    for name, products in sorted(spellings.items(), key=lambda item: (-item[1], item[0])):
+        labels.setdefault(name.lower(), name)
+
+    categories = [
+        {"category": labels[key], "count": products, "in_stock": in_stock}
+        for key, (products, in_stock) in by_category.items()
+    ]
+    categories.sort(key=lambda entry: (-entry["count"], entry["category"]))
+    price_ranges = []
+    for i in range(len(EDGES)):
+        low, high = bucket_bounds(i)
+        products, in_stock = histogram.get(i, (0, 0))
+        price_ranges.append({"min": low, "max": high, "count": products, "in_stock": in_stock})
+    total, total_in_stock = totals.get(None, (0, 0))
+    return {"total": total, "in_stock": total_in_stock, "categories": categories, "price_ranges": price_ranges}
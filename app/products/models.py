@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, Index, func
 from app.core.database import Base
 from sqlalchemy.orm import relationship
 
@@ -11,5 +11,16 @@ class Product(Base):
     stock = Column(Integer, nullable=False)
     category = Column(String)
     image_url = Column(String)
+    sku = Column(String)
     
-    cart_items = relationship("CartItem", back_populates="product", cascade="all, delete-orphan")
\ No newline at end of file
+    cart_items = relationship("CartItem", back_populates="product", cascade="all, delete-orphan")
+
+
+# Composite indexes matching the keyset orders used by the product listings
+Index("ix_products_price_id", Product.price, Product.id)
+Index("ix_products_name_id", Product.name, Product.id)
+Index("ix_products_category_price_id", func.lower(Product.category), Product.price, Product.id)
+Index("ix_products_category_name_id", func.lower(Product.category), Product.name, Product.id)
+
+# Natural key for supplier feeds; optional, and SQLite/Postgres allow many NULLs
+Index("ix_products_sku", Product.sku, unique=True)
@@ -1,65 +1,155 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
-from app.utils.dependency import get_db
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import FAST_JSON
+from app.utils.dependency import get_db, open_db
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_after
+from app.utils.serialization import json_response
 from app.products.models import Product
-from app.products.schemas import ProductOut
+from app.products.schemas import FacetsOut, ProductOut
+from app.products import cache, facets, search
 from typing import Literal, Optional
+import json
 import logging
 
 logger = logging.getLogger("ecommerce_logger")
 
 router = APIRouter(prefix="/products", tags=["Public - Products"])
 
+# Keyset order for each sort option; id breaks ties so every row has a unique position
+SORT_COLUMNS = {
+    None: [Product.id],
+    "price": [Product.price, Product.id],
+    "name": [Product.name, Product.id],
+}
+
+# Categories whose first listing page and facets are built by warm_cache()
+WARMUP_CATEGORIES = 10
+
+
 @router.get("/", response_model=list[ProductOut])
-def list_products(
+async def list_products(
     category: Optional[str] = None,
     min_price: float = 0,
     max_price: Optional[float] = None,
     sort_by: Optional[Literal["price", "name"]] = Query(None, description="Sort by 'price' or 'name' only"),
-    page: int = 1,
-    page_size: int = 10,
-    db: Session = Depends(get_db)
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header value of the previous page"),
+    db: AsyncSession = Depends(get_db)
 ):
     logger.info("Fetching product list with filters")
-    query = db.query(Product)
+    category = category.lower() if category else None
+    key = ("list", category, min_price, max_price, sort_by, None if cursor else page, page_size, cursor)
+    cached = cache.listing_cache.get(key)
+    if cached is not None:
+        return json_response(*cached)
+    generation = cache.listing_cache.generation
+
+    query = select(Product)
 
     if category:
-        query = query.filter(func.lower(Product.category).like(f"%{category.lower()}%"))
+        query = query.where(func.lower(Product.category) == category)
     if min_price is not None:
-        query = query.filter(Product.price >= min_price)
+        query = query.where(Product.price >= min_price)
     if max_price is not None:
-        query = query.filter(Product.price <= max_price)
+        query = query.where(Product.price <= max_price)
+
+    sort_key = sort_by or "id"
+    sort_columns = SORT_COLUMNS[sort_by]
+    query = query.order_by(*sort_columns)
+    if cursor:
+        values = decode_cursor(cursor, len(sort_columns) + 1)
+        if values[0] != sort_key:
+            raise HTTPException(status_code=400, detail="Cursor does not match sort_by")
+        query = query.where(keyset_after(sort_columns, values[1:]))
+    else:
+        # Offset paging kept for existing clients
+        query = query.offset((page - 1) * page_size)
 
-    if sort_by == "price":
-        query = query.order_by(Product.price)
-    elif sort_by == "name":
-        query = query.order_by(Product.name)
+    if FAST_JSON:
+        products = (await db.execute(query.with_only_columns(*cache.PRODUCT_COLUMNS).limit(page_size))).all()
+    else:
+        products = (await db.scalars(query.limit(page_size))).all()
+    next_cursor = None
+    if len(products) == page_size:
+        last = products[-1]
+        next_cursor = encode_cursor([sort_key] + [getattr(last, col.key) for col in sort_columns])
 
-    offset = (page - 1) * page_size
-    return query.offset(offset).limit(page_size).all()
+    body = cache.serialize_product_rows(products) if FAST_JSON else cache.serialize_products(products)
+    cached = (body, next_cursor)
+    cache.listing_cache.set(key, cached, generation)
+    return json_response(*cached)
 
 @router.get("/search", response_model=list[ProductOut])
-def search_products(
+async def search_products(
     keyword: str = Query(..., min_length=1),
-    db: Session = Depends(get_db)
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
 ):
     logger.info(f"Searching products with keyword: {keyword}")
-    keyword = keyword.lower()
-    query = db.query(Product).filter(
-        or_(
-            func.lower(Product.name).like(f"%{keyword}%"),
-            func.lower(Product.description).like(f"%{keyword}%")
-        )
-    )
-    return query.all()
+    key = ("search", tuple(search.search_terms(keyword)), page, page_size)
+    body = cache.listing_cache.get(key)
+    if body is None:
+        generation = cache.listing_cache.generation
+        offset = (page - 1) * page_size
+        if FAST_JSON:
+            statement = search.search_statement(keyword, page_size, offset, cache.PRODUCT_COLUMNS)
+            products = (await db.execute(statement)).all() if statement is not None else []
+            body = cache.serialize_product_rows(products)
+        else:
+            statement = search.search_statement(keyword, limit=page_size, offset=offset)
+            products = (await db.scalars(statement)).all() if statement is not None else []
+            body = cache.serialize_products(products)
+        cache.listing_cache.set(key, body, generation)
+    return json_response(body)
+
+@router.get("/facets", response_model=FacetsOut)
+async def product_facets(
+    category: Optional[str] = None,
+    min_price: float = 0,
+    max_price: Optional[float] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    # Same filters as the listing. Each facet leaves out its own filter, so the
+    # other categories and price ranges stay visible with their counts.
+    logger.info("Fetching product facets")
+    category = category.lower() if category else None
+    key = ("facets", category, min_price, max_price)
+    body = cache.listing_cache.get(key)
+    if body is None:
+        generation = cache.listing_cache.generation
+        body = cache.serialize_facets(await facets.compute_facets(db, category, min_price, max_price))
+        cache.listing_cache.set(key, body, generation)
+    return json_response(body)
 
 @router.get("/{id}", response_model=ProductOut)
-def get_product_detail(id: int, db: Session = Depends(get_db)):
+async def get_product_detail(id: int, db: AsyncSession = Depends(get_db)):
     logger.info(f"Fetching product with ID: {id}")
-    product = db.query(Product).filter_by(id=id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    body = cache.detail_cache.get(id)
+    if body is None:
+        generation = cache.detail_cache.generation
+        product = await db.get(Product, id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        body = cache.serialize_product(product)
+        cache.detail_cache.set(id, body, generation)
+    return json_response(body)
 
 
+async def warm_cache():
+    """Builds the default first listing page for every sort, the facets, and the first
+    page and facets of the largest categories, so the first visitors of a freshly
+    started worker don't each pay for them. Goes through the route functions, which
+    store what they build under the same keys as real requests."""
+    listing = {"category": None, "min_price": 0, "max_price": None, "sort_by": None, "page": 1, "page_size": 10, "cursor": None}
+    async with open_db() as db:
+        response = await product_facets(category=None, min_price=0, max_price=None, db=db)
+        top = [entry["category"] for entry in json.loads(response.body)["categories"][:WARMUP_CATEGORIES]]
+        for sort_by in SORT_COLUMNS:
+            await list_products(**{**listing, "sort_by": sort_by}, db=db)
+        for category in top:
+            await list_products(**{**listing, "category": category}, db=db)
+            await product_facets(category=category, min_price=0, max_price=None, db=db)
+    return 1 + len(SORT_COLUMNS) + 2 * len(top)
@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import FAST_JSON
 from app.utils.dependency import get_db, require_admin 
-from app.products import schemas, models
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_after, set_next_cursor
+from app.utils import export, serialization
+from app.products import bulk, cache, schemas, models
 from app.orders.models import OrderItem
+from app.inventory.models import HotProduct
+from app.reports.models import ProductSales
+from typing import Literal, Optional
 
 import logging
 
@@ -12,12 +19,12 @@ router = APIRouter(prefix="/admin/products", tags=["Admin - Products"])
 
 
 @router.post("/", response_model=schemas.ProductOut)
-def create_product(data: schemas.ProductCreate, db: Session = Depends(get_db), _ = Depends(require_admin)):
+async def create_product(data: schemas.ProductCreate, db: AsyncSession = Depends(get_db), _ = Depends(require_admin)):
     try:
         product = models.Product(**data.model_dump())
         db.add(product)
-        db.commit()
-        db.refresh(product)
+        await db.commit()
+        cache.invalidate_listings()
         logger.info(f"Product created with ID: {product.id}")
         return product
     
@@ -29,21 +36,104 @@ def create_product(data: schemas.ProductCreate, db: Session = Depends(get_db), _
         raise HTTPException(status_code=500, detail="Failed to create product")
 
 
+@router.post("/bulk")
+async def bulk_import_products(
+    request: Request,
+    format: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    _ = Depends(require_admin)
+):
+    # The body is read as it arrives (not as a multipart form), so a feed of any size
+    # is parsed, validated and written in PRODUCT_IMPORT_BATCH_SIZE chunks
+    try:
+        fmt = format or bulk.detect_format(request.headers.get("content-type"))
+        if fmt not in bulk.FORMATS:
+            raise HTTPException(
+                status_code=415,
+                detail="Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson",
+            )
+        report = await bulk.import_products(db, request.stream(), fmt)
+        logger.info(
+            f"Product import: {report['inserted']} inserted, {report['updated']} updated, "
+            f"{report['failed']} failed, {report['rows_per_second']} rows/s"
+        )
+        return report
+
+    except HTTPException as http_exc:
+        raise http_exc
+
+    except Exception as e:
+        logger.error(f"Product import failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to import products")
+
+
 @router.get("/", response_model=list[schemas.ProductOut])
-def get_products(skip: int = 0, limit: int = 10, db: Session = Depends(get_db), _ = Depends(require_admin)):
+async def get_products(
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    _ = Depends(require_admin)
+):
     try:
-        products = db.query(models.Product).offset(skip).limit(limit).all()
+        query = select(models.Product).order_by(models.Product.id)
+        if cursor:
+            query = query.where(keyset_after([models.Product.id], decode_cursor(cursor, 1)))
+        else:
+            query = query.offset(skip)
+
+        if FAST_JSON:
+            rows = (await db.execute(query.with_only_columns(*cache.PRODUCT_COLUMNS).limit(limit))).all()
+            next_cursor = encode_cursor([rows[-1].id]) if rows and len(rows) == limit else None
+            logger.info("Fetched all products")
+            return serialization.json_response(cache.serialize_product_rows(rows), next_cursor)
+
+        products = (await db.scalars(query.limit(limit))).all()
+        if products and len(products) == limit:
+            set_next_cursor(response, encode_cursor([products[-1].id]))
         logger.info("Fetched all products")
         return products
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"Error fetching products: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch products")
 
 
+@router.get("/export")
+async def export_products(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    category: Optional[str] = None,
+    _ = Depends(require_admin)
+):
+    # Streams plain rows off one server-side cursor: no OFFSET pages, no ORM objects
+    try:
+        table = models.Product.__table__
+        query = select(table).order_by(table.c.id)
+        if category:
+            query = query.where(func.lower(table.c.category) == category.lower())
+        logger.info(f"Product export started ({format}{', gzip' if gzip else ''})")
+        return export.export_response(
+            export.stream_rows(query), "products", format, [column.name for column in table.columns], gzip
+        )
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        logger.error(f"Failed to export products: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to export products")
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(_ = Depends(require_admin)):
+    return cache.cache_stats()
+
+
 @router.get("/{id}", response_model=schemas.ProductOut)
-def get_product(id: int, db: Session = Depends(get_db), _ = Depends(require_admin)):
+async def get_product(id: int, db: AsyncSession = Depends(get_db), _ = Depends(require_admin)):
     try:
-        product = db.query(models.Product).filter_by(id=id).first()
+        product = await db.get(models.Product, id)
         if not product:
             logger.warning(f"Product with ID {id} not found")
             raise HTTPException(status_code=404, detail="Product not found")
@@ -59,19 +149,22 @@ def get_product(id: int, db: Session = Depends(get_db), _ = Depends(require_admi
 
 
 @router.put("/{id}", response_model=schemas.ProductOut)
-def update_product(id: int, data: schemas.ProductUpdate, db: Session = Depends(get_db), _ = Depends(require_admin)):
+async def update_product(id: int, data: schemas.ProductUpdate, db: AsyncSession = Depends(get_db), _ = Depends(require_admin)):
     try:
-        product = db.query(models.Product).filter_by(id=id).first()
+        product = await db.get(models.Product, id)
         if not product:
             logger.warning(f"Product with ID {id} not found for update")
             raise HTTPException(status_code=404, detail="Product not found")
         
         update_data = data.model_dump(exclude_unset=True)
+        if "stock" in update_data and await db.get(HotProduct, id):
+            # Part of the stock sits in workers' shards; set it once the sale is over
+            raise HTTPException(status_code=409, detail="Stock of a hot product can't be set, unmark it first")
         for key, value in update_data.items():
             setattr(product, key, value)
         
-        db.commit()
-        db.refresh(product)
+        await db.commit()
+        cache.invalidate_product(id)
         logger.info(f"Product with ID {id} updated")
         return product
     
@@ -84,17 +177,20 @@ def update_product(id: int, data: schemas.ProductUpdate, db: Session = Depends(g
 
 
 @router.delete("/{id}")
-def delete_product(id: int, db: Session = Depends(get_db), _ = Depends(require_admin)):
+async def delete_product(id: int, db: AsyncSession = Depends(get_db), _ = Depends(require_admin)):
     try:
-        product = db.query(models.Product).filter_by(id=id).first()
+        product = await db.get(models.Product, id)
         if not product:
             logger.warning(f"Product with ID {id} not found for deletion")
             raise HTTPException(status_code=404, detail="Product not found")
         
-        db.query(OrderItem).filter_by(product_id=id).update({OrderItem.product_id: None})
+        await db.execute(update(OrderItem).where(OrderItem.product_id == id).values(product_id=None))
+        await db.execute(delete(HotProduct).where(HotProduct.product_id == id))
+        await db.execute(delete(ProductSales).where(ProductSales.product_id == id))
         
-        db.delete(product)
-        db.commit()
+        await db.delete(product)
+        await db.commit()
+        cache.invalidate_product(id)
         logger.info(f"Product with ID {id} deleted")
         return {"message": "Product deleted"}
     
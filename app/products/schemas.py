@@ -8,6 +8,7 @@ class ProductBase(BaseModel):
     stock: int=Field(..., ge=0, description="enter valid stock")
     category: str
     image_url: str
+    sku: Optional[str] = Field(None, min_length=1, max_length=64)
 
 class ProductCreate(ProductBase):
     pass
@@ -19,6 +20,7 @@ class ProductUpdate(BaseModel):
     stock: Optional[int] = Field(None, ge=0, description="enter valid stock")
     category: Optional[str] = None
     image_url: Optional[str] = None
+    sku: Optional[str] = Field(None, min_length=1, max_length=64)
     model_config = ConfigDict(extra="forbid")
 
 class ProductOut(ProductBase):
@@ -26,3 +28,20 @@ class ProductOut(ProductBase):
     model_config = {
         "from_attributes": True
     }
+
+class CategoryFacet(BaseModel):
+    category: str
+    count: int
+    in_stock: int
+
+class PriceRangeFacet(BaseModel):
+    min: float
+    max: Optional[float] = None
+    count: int
+    in_stock: int
+
+class FacetsOut(BaseModel):
+    total: int
+    in_stock: int
+    categories: list[CategoryFacet]
+    price_ranges: list[PriceRangeFacet]
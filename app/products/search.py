@@ -0,0 +1,118 @@
+import re
+from sqlalchemy import Float, Integer, column, or_, func, select, text
+from app.products.models import Product
+
+# External-content FTS5 index over products.name/description. The triggers keep it
+# in sync with every write to the products table (admin routes, scripts, migrations).
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+# Name matches weigh more than description matches when ranking
+RANK_FUNCTION = "bm25(10.0, 1.0)"
+
+# Rank and page inside the index first so only one page of rows is joined back
+FTS_HITS_SQL = text("""
+    SELECT rowid, rank FROM products_fts
+    WHERE products_fts MATCH :match
+    ORDER BY rank
+    LIMIT :limit OFFSET :offset
+""").columns(column("rowid", Integer), column("rank", Float))
+
+_fts_enabled = False
+
+
+def ensure_search_index(engine, build: bool = True):
+    # build=False only looks for the index (workers of app.serve, whose launcher built it)
+    global _fts_enabled
+    if engine.dialect.name != "sqlite":
+        _fts_enabled = False
+        return False
+
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+        ).first()
+        if not build:
+            _fts_enabled = exists is not None
+            return _fts_enabled
+        for ddl in SEARCH_INDEX_DDL:
+            conn.execute(text(ddl))
+        conn.execute(
+            text("INSERT INTO products_fts(products_fts, rank) VALUES ('rank', :rank)"),
+            {"rank": RANK_FUNCTION}
+        )
+        if not exists:
+            # Index whatever was in the catalog before the index existed
+            conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+    _fts_enabled = True
+    return True
+
+
+def search_terms(keyword: str):
+    return re.findall(r"\w+", keyword.lower())
+
+
+def build_match_query(terms):
+    # Every term must match, each as a token prefix ("mou" finds "mouse")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def fts_statement(terms, limit: int, offset: int = 0, entities=(Product,)):
+    hits = FTS_HITS_SQL.bindparams(match=build_match_query(terms), limit=limit, offset=offset).subquery("hits")
+    return (
+        select(*entities)
+        .join_from(hits, Product, Product.id == hits.c.rowid)
+        .order_by(hits.c.rank, Product.id)
+    )
+
+
+def like_statement(terms, limit: int, offset: int = 0, entities=(Product,)):
+    query = select(*entities)
+    for term in terms:
+        query = query.where(
+            or_(
+                func.lower(Product.name).like(f"%{term}%"),
+                func.lower(Product.description).like(f"%{term}%")
+            )
+        )
+    return query.order_by(Product.id).offset(offset).limit(limit)
+
+
+def search_statement(keyword: str, limit: int, offset: int = 0, entities=(Product,)):
+    # None when the keyword has no searchable terms. `entities` are what the
+    # statement selects: the Product entity, or columns of products for plain rows.
+    terms = search_terms(keyword)
+    if not terms:
+        return None
+    if _fts_enabled:
+        return fts_statement(terms, limit, offset, entities)
+    return like_statement(terms, limit, offset, entities)
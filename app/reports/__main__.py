@@ -0,0 +1,26 @@
+"""Rebuilds the sales rollups of the admin reports from the order history.
+
+    python -m app.reports
+
+Checkout keeps the rollups current, so this is for orders written some other way:
+imported or deleted orders, or a database restored from before the rollups existed
+(the app also rebuilds them on startup when they are empty and orders are not).
+History is aggregated without blocking checkouts; they only wait for the final swap.
+"""
+import argparse
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+
+    from app.core.database import engine
+    from app.core.logging_setup import setup_logging
+    from app.reports import rollups
+
+    setup_logging()
+    days, products = rollups.rebuild(engine)
+    print(f"Sales rollups rebuilt: {days} days, {products} products")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, Float, String, Date, ForeignKey, Index
+from app.core.database import Base
+
+
+class DailySales(Base):
+    """Paid orders of one UTC day, added to by the transaction of every checkout."""
+    __tablename__ = "sales_daily"
+    day = Column(Date, primary_key=True)
+    orders = Column(Integer, default=0, nullable=False)
+    units = Column(Integer, default=0, nullable=False)
+    revenue = Column(Float, default=0, nullable=False)
+
+
+class ProductSales(Base):
+    """Units and revenue of one product over all paid orders, likewise kept by checkout.
+
+    Deleted with the product, whose order lines lose their product_id then: SQLite may
+    give the id to the next product. Its sales stay counted in the daily totals."""
+    __tablename__ = "sales_by_product"
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    product_name = Column(String, nullable=False)
+    orders = Column(Integer, default=0, nullable=False)
+    units = Column(Integer, default=0, nullable=False)
+    revenue = Column(Float, default=0, nullable=False)
+
+
+# Top sellers: ORDER BY units (or revenue) DESC, product_id DESC LIMIT n, read from the index end
+Index("ix_sales_by_product_units", ProductSales.units, ProductSales.product_id)
+Index("ix_sales_by_product_revenue", ProductSales.revenue, ProductSales.product_id)
@@ -0,0 +1,174 @@
+"""Sales rollups: per-day and per-product totals of paid orders.
+
+Checkout adds each order to them in its own transaction (record_orders), so the
+reports read a few rows per day or product instead of grouping orders and
+order_items. rebuild() recomputes them from history, for existing databases and
+after any change made to orders outside checkout.
+"""
+import logging
+from sqlalchemy import Column, MetaData, Table, delete, func, insert, select
+from app.core.database import dialect_insert
+from app.orders.models import Order, OrderItem, OrderStatus
+from app.products.models import Product
+from app.reports.models import DailySales, ProductSales
+
+logger = logging.getLogger("ecommerce_logger")
+
+COUNTERS = ("orders", "units", "revenue")
+
+
+def upsert(table, key):
+    # Adds a row's counters to those of the row with the same key, if there is one
+    statement = dialect_insert(table)
+    set_ = {name: table.c[name] + statement.excluded[name] for name in COUNTERS}
+    if "product_name" in table.c:
+        set_["product_name"] = statement.excluded.product_name
+    return statement.on_conflict_do_update(index_elements=[key], set_=set_)
+
+
+# Built once: checkout runs them with every order
+DAILY_UPSERT = upsert(DailySales.__table__, "day")
+PRODUCT_UPSERT = upsert(ProductSales.__table__, "product_id")
+
+
+def record_orders(session, orders):
+    """Adds orders to the rollups in the caller's transaction. `orders` holds a
+    (day, quantities, products, total) tuple per order, `products` rows with the
+    name and price of each product id in `quantities`."""
+    days, by_product = {}, {}
+    for day, quantities, products, total in orders:
+        totals = days.setdefault(day, {"day": day, "orders": 0, "units": 0, "revenue": 0.0})
+        totals["orders"] += 1
+        totals["units"] += sum(quantities.values())
+        totals["revenue"] += total
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            totals = by_product.setdefault(
+                product_id, {"product_id": product_id, "product_name": product.name, "orders": 0, "units": 0, "revenue": 0.0}
+            )
+            totals["orders"] += 1
+            totals["units"] += quantity
+            totals["revenue"] += quantity * product.price
+    # In key order, so concurrent checkouts lock rows in the same order on server databases
+    session.execute(DAILY_UPSERT, [days[day] for day in sorted(days)])
+    session.execute(PRODUCT_UPSERT, [by_product[key] for key in sorted(by_product)])
+
+
+def daily_totals(*where):
+    # Per UTC day: paid orders, units and revenue, computed from the order tables
+    orders, items = Order.__table__, OrderItem.__table__
+    per_order = (
+        select(
+            func.date(orders.c.created_at).label("day"),
+            orders.c.total_amount,
+            func.sum(items.c.quantity).label("units"),
+        )
+        .join(items, items.c.order_id == orders.c.id)
+        .where(orders.c.status == OrderStatus.PAID, *where)
+        .group_by(orders.c.id)
+        .subquery()
+    )
+    return (
+        select(
+            per_order.c.day,
+            func.count().label("orders"),
+            func.sum(per_order.c.units).label("units"),
+            func.sum(per_order.c.total_amount).label("revenue"),
+        )
+        .group_by(per_order.c.day)
+    )
+
+
+def product_totals(*where):
+    # Per product still referenced by its order lines, named as in the catalog if it's still there
+    orders, items = Order.__table__, OrderItem.__table__
+    catalog = Product.__table__
+    name = select(catalog.c.name).where(catalog.c.id == items.c.product_id).scalar_subquery()
+    return (
+        select(
+            items.c.product_id,
+            func.coalesce(name, func.max(items.c.product_name), "").label("product_name"),
+            func.count().label("orders"),
+            func.sum(items.c.quantity).label("units"),
+            func.sum(items.c.quantity * items.c.price_at_purchase).label("revenue"),
+        )
+        .join(orders, orders.c.id == items.c.order_id)
+        .where(orders.c.status == OrderStatus.PAID, items.c.product_id.is_not(None), *where)
+        .group_by(items.c.product_id)
+    )
+
+
+# Per-connection copies of the rollups that rebuild() fills before swapping them in
+_staging = MetaData()
+STAGED = {
+    table: Table(f"staged_{table.name}", _staging, *(Column(c.name, c.type) for c in table.c), prefixes=["TEMPORARY"])
+    for table in (DailySales.__table__, ProductSales.__table__)
+}
+
+
+def stage(conn, *where):
+    daily, products = STAGED.values()
+    conn.execute(insert(daily).from_select(list(daily.c.keys()), daily_totals(*where)))
+    conn.execute(insert(products).from_select(list(products.c.keys()), product_totals(*where)))
+
+
+def rebuild(engine) -> tuple[int, int]:
+    """Recomputes the rollups from all paid orders. Returns (days, products).
+
+    History up to the newest order is aggregated into temporary tables first, which
+    takes no write lock. The lock is then held only to add the orders placed
+    meanwhile and swap the rollups' rows, so checkouts don't wait for the scan."""
+    orders = Order.__table__
+    daily, products = STAGED.values()
+    sqlite = engine.dialect.name == "sqlite"
+    with engine.connect() as conn:
+        for staged in STAGED.values():
+            staged.create(conn)
+        conn.commit()
+        try:
+            upto = conn.scalar(select(func.coalesce(func.max(orders.c.id), 0)))
+            if sqlite:
+                # Deferred: only the temporary tables are written, the database is just read
+                conn.exec_driver_sql("BEGIN")
+            stage(conn, orders.c.id <= upto)
+            conn.commit()
+
+            if sqlite:
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+            else:
+                conn.exec_driver_sql("LOCK TABLE sales_daily, sales_by_product IN SHARE ROW EXCLUSIVE MODE")
+            # Orders committed since have higher ids, and no checkout commits until this does
+            stage(conn, orders.c.id > upto)
+            conn.execute(delete(DailySales.__table__))
+            conn.execute(insert(DailySales.__table__).from_select(
+                ["day", *COUNTERS],
+                select(daily.c.day, *(func.sum(daily.c[name]) for name in COUNTERS)).group_by(daily.c.day),
+            ))
+            conn.execute(delete(ProductSales.__table__))
+            conn.execute(insert(ProductSales.__table__).from_select(
+                ["product_id", "product_name", *COUNTERS],
+                select(
+                    products.c.product_id, func.max(products.c.product_name), *(func.sum(products.c[name]) for name in COUNTERS)
+                ).group_by(products.c.product_id),
+            ))
+            conn.commit()
+            days = conn.scalar(select(func.count()).select_from(DailySales.__table__))
+            sold = conn.scalar(select(func.count()).select_from(ProductSales.__table__))
+        finally:
+            conn.rollback()
+            for staged in STAGED.values():
+                staged.drop(conn)
+            conn.commit()
+    logger.info(f"Sales rollups rebuilt: {days} days, {sold} products")
+    return days, sold
+
+
+def ensure_rollups(engine):
+    # A database that had orders before the rollups existed starts with them empty
+    daily, orders = DailySales.__table__, Order.__table__
+    with engine.connect() as conn:
+        if conn.scalar(select(daily.c.day).limit(1)) is not None:
+            return
+        if conn.scalar(select(orders.c.id).where(orders.c.status == OrderStatus.PAID).limit(1)) is None:
+            return
+    rebuild(engine)
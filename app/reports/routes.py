@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.dependency import get_db, require_admin
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_after, set_next_cursor
+from app.reports import schemas
+from app.reports.models import DailySales, ProductSales
+from datetime import date, datetime, timedelta, timezone
+from typing import Literal, Optional
+import logging
+
+logger = logging.getLogger("ecommerce_logger")
+
+router = APIRouter(prefix="/admin/reports", tags=["Admin - Reports"])
+
+# Every report reads the rollup tables only: a row per day or per product, never the order tables
+DEFAULT_DAYS = 30
+
+
+@router.get("/daily", response_model=schemas.DailyReportOut)
+async def daily_revenue(
+    start: Optional[date] = Query(None, description=f"first day (UTC), default {DEFAULT_DAYS - 1} days before end"),
+    end: Optional[date] = Query(None, description="last day (UTC), included; default today"),
+    db: AsyncSession = Depends(get_db),
+    _ = Depends(require_admin)
+):
+    try:
+        end = end or datetime.now(timezone.utc).date()
+        start = start or end - timedelta(days=DEFAULT_DAYS - 1)
+        if start > end:
+            raise HTTPException(status_code=400, detail="start is after end")
+        days = (await db.execute(
+            select(DailySales.day, DailySales.orders, DailySales.units, DailySales.revenue)
+            .where(DailySales.day >= start, DailySales.day <= end)
+            .order_by(DailySales.day)
+        )).all()
+        return {
+            "start": start,
+            "end": end,
+            "orders": sum(day.orders for day in days),
+            "units": sum(day.units for day in days),
+            "revenue": sum(day.revenue for day in days),
+            "days": [day._mapping for day in days],
+        }
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        logger.error(f"Failed to build the daily revenue report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to build the daily revenue report")
+
+
+@router.get("/products", response_model=list[schemas.ProductSalesOut])
+async def product_sales(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header value of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    _ = Depends(require_admin)
+):
+    # Units and revenue of every product ever sold, in product id order
+    try:
+        query = select(*ProductSales.__table__.c).order_by(ProductSales.product_id).limit(limit)
+        if cursor:
+            query = query.where(keyset_after([ProductSales.product_id], decode_cursor(cursor, 1)))
+        rows = (await db.execute(query)).all()
+        if len(rows) == limit:
+            set_next_cursor(response, encode_cursor([rows[-1].product_id]))
+        return [row._mapping for row in rows]
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        logger.error(f"Failed to build the product sales report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to build the product sales report")
+
+
+@router.get("/top-sellers", response_model=list[schemas.ProductSalesOut])
+async def top_sellers(
+    by: Literal["units", "revenue"] = "units",
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    _ = Depends(require_admin)
+):
+    # Read from the end of ix_sales_by_product_units (or _revenue), no sort
+    try:
+        rows = (await db.execute(
+            select(*ProductSales.__table__.c)
+            .order_by(ProductSales.__table__.c[by].desc(), ProductSales.product_id.desc())
+            .limit(limit)
+        )).all()
+        return [row._mapping for row in rows]
+    except Exception as e:
+        logger.error(f"Failed to build the top sellers report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to build the top sellers report")
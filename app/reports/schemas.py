@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from datetime import date
+
+
+class DailySalesOut(BaseModel):
+    day: date
+    orders: int
+    units: int
+    revenue: float
+
+class DailyReportOut(BaseModel):
+    start: date
+    end: date
+    # Over the days listed; days without sales are left out
+    orders: int
+    units: int
+    revenue: float
+    days: list[DailySalesOut]
+
+class ProductSalesOut(BaseModel):
+    product_id: int
+    product_name: str
+    orders: int
+    units: int
+    revenue: float
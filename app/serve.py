@@ -0,0 +1,62 @@
+"""Runs the API with several uvicorn worker processes.
+
+    python -m app.serve --workers 4 --port 8000
+
+The launcher creates the schema, search index and facet counts once, then starts
+the workers, which only check the indexes are there before serving. It also creates
+the shared memory file the workers announce cache invalidations through
+(app.core.signals), and removes it on exit.
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger("ecommerce_logger")
+
+
+def signals_file() -> str:
+    # Shared memory where there is one; any local file works, it's only mapped
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    fd, path = tempfile.mkstemp(prefix="ecommerce-signals-", dir=directory)
+    os.close(fd)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    # uvicorn re-raises the signal it stopped on once it has shut down; leave through
+    # the finally below on SIGTERM as on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    path = signals_file()
+    # Read by app.core.config, in this process and in the workers, which inherit them
+    os.environ["WORKER_SIGNALS"] = path
+    os.environ["SCHEMA_PREPARED"] = "true"
+    try:
+        import uvicorn
+        from app.core import signals
+        from app.core.database import engine
+        from app.core.logging_setup import setup_logging
+        from app.main import prepare_database
+
+        setup_logging()
+        started = time.perf_counter()
+        prepare_database()
+        engine.dispose()
+        signals.create(path)
+        logger.info(f"Database prepared in {(time.perf_counter() - started) * 1000:.0f}ms, starting {args.workers} workers")
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,69 @@
+from contextlib import asynccontextmanager
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
-from app.auth import models, utils
-from app.core.database import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth import models, principals, revocation, utils
+from app.core.config import DB_ASYNC
+from app.core.database import AsyncSessionLocal, ThreadedSession, ThreadedSessionLocal
 
 bearer_scheme = HTTPBearer()
 
-def get_db():
-    db = SessionLocal()  
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_db():
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = ThreadedSession(ThreadedSessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
 
-def get_current_user(
+# For work that outlives the request's own session, e.g. a StreamingResponse body
+# (FastAPI closes yield dependencies before the body is sent)
+open_db = asynccontextmanager(get_db)
+
+async def get_current_user(
     token: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    try:
-        payload = jwt.decode(token.credentials, utils.SECRET_KEY, algorithms=[utils.ALGORITHM])
+    cached = principals.cached_token(token.credentials)
+    if cached is None:
+        try:
+            payload = jwt.decode(token.credentials, utils.SECRET_KEY, algorithms=[utils.ALGORITHM])
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Token error")
         if payload.get("token_type") != "access":  
             raise HTTPException(status_code=401, detail="Invalid token type")
-        email = payload.get("sub")
-        role = payload.get("role")
-        user = db.query(models.User).filter_by(email=email).first()
+        email, family = payload.get("sub"), payload.get("fam")
+        principals.remember_token(token.credentials, email, payload.get("exp"), family)
+    else:
+        email, family = cached
+    # A revoked family (refresh token reuse) also ends the access tokens issued with it
+    if family is not None and await revocation.is_family_revoked(db, family):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return await load_principal(db, email)
+
+
+async def load_principal(db, email: str):
+    principal = principals.principal_cache.get(email)
+    if principal is None:
+        generation = principals.principal_cache.generation
+        user = await db.scalar(select(models.User).filter_by(email=email))
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Token error")
+        principal = principals.from_user(user)
+        principals.principal_cache.set(email, principal, generation)
+    return principal
 
-def require_admin(current_user: models.User = Depends(get_current_user)):
+def require_admin(current_user: principals.Principal = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admins only")
     return current_user
 
-def require_user(current_user: models.User = Depends(get_current_user)):
+def require_user(current_user: principals.Principal = Depends(get_current_user)):
     if current_user.role != "user":
         raise HTTPException(status_code=403, detail="Users only")
     return current_user
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from enum import Enum
+from fastapi.responses import StreamingResponse
+from app.core.config import EXPORT_BATCH_SIZE
+from app.utils.dependency import open_db
+
+import logging
+
+logger = logging.getLogger("ecommerce_logger")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+async def stream_rows(statement):
+    """Row mappings from a server-side cursor, EXPORT_BATCH_SIZE at a time.
+
+    Runs in its own session because the response body is produced after the
+    request's dependencies have been closed."""
+    async with open_db() as db:
+        result = await db.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        try:
+            async for rows in result.partitions(EXPORT_BATCH_SIZE):
+                yield [{key: plain(value) for key, value in row._mapping.items()} for row in rows]
+        finally:
+            await result.close()
+
+
+async def encode_ndjson(batches):
+    async for records in batches:
+        yield "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records).encode()
+
+
+async def encode_csv(batches, columns):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    # Header goes out before the first query returns
+    yield buffer.getvalue().encode()
+    async for records in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(records)
+        yield buffer.getvalue().encode()
+
+
+async def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        # Sync flush per batch so the client sees data as it is produced, not at the end
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+async def logged(chunks, name):
+    # Headers are already sent when the body fails, so all that is left is to log and cut it short
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        logger.error(f"Export {name} failed mid-stream: {str(e)}")
+        raise
+
+
+def export_response(batches, name: str, format: str, columns: list, gzip: bool = False):
+    """StreamingResponse for an async iterator of record batches, as NDJSON or CSV, optionally gzipped."""
+    chunks = encode_csv(batches, columns) if format == "csv" else encode_ndjson(batches)
+    filename = f"{name}.{format}"
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        logged(chunks, name),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,58 @@
+import base64
+import json
+from fastapi import HTTPException, Response
+from sqlalchemy import bindparam, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Only the scalars encode_cursor writes; bool is an int to isinstance but never one of them
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _matches(column, value) -> bool:
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        return True
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def _bound(columns, values):
+    # Bind each cursor value with its column's type so e.g. datetimes compare as stored.
+    # A value of another type (a crafted cursor) would fail in the driver, as a 500.
+    if not all(_matches(col, value) for col, value in zip(columns, values)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple_(*(bindparam(None, value, type_=col.type) for col, value in zip(columns, values)))
+
+
+def keyset_after(columns, values):
+    # (col1, col2, ..., id) > (v1, v2, ..., last_id), served by a matching composite index
+    return tuple_(*columns) > _bound(columns, values)
+
+
+def keyset_before(columns, values):
+    # Same as keyset_after for descending orders
+    return tuple_(*columns) < _bound(columns, values)
+
+
+def set_next_cursor(response: Response, cursor):
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
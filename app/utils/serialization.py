@@ -0,0 +1,34 @@
+"""Fast path for list responses, enabled with FAST_JSON=true.
+
+List routes then select only the columns of their response model as row tuples,
+zip them into dicts and encode the whole page with orjson, instead of loading ORM
+objects and validating each one into the model. Values are encoded as stored, so
+the selected columns must already have the model's types.
+"""
+import orjson
+from fastapi import Response
+from app.utils.pagination import set_next_cursor
+
+
+def model_columns(schema, table):
+    # (names, columns) of the response model's fields stored in `table`, in field order
+    names = [name for name in schema.model_fields if name in table.c]
+    return names, [table.c[name] for name in names]
+
+
+def records(names, rows) -> list[dict]:
+    return [dict(zip(names, row)) for row in rows]
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content)
+
+
+def dump_rows(names, rows) -> bytes:
+    return orjson.dumps(records(names, rows))
+
+
+def json_response(body: bytes, next_cursor=None):
+    response = Response(content=body, media_type="application/json")
+    set_next_cursor(response, next_cursor)
+    return response
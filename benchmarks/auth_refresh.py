@@ -0,0 +1,195 @@
+"""Cost of renewing an access token: signing in again versus POST /auth/refresh.
+
+    python -m benchmarks.auth_refresh --clients 20 --renewals 10
+
+Every client holds a session and renews it --renewals times, concurrently with the
+other clients, either by signing in again (bcrypt verify in the password hashing
+pool plus a users lookup) or by exchanging its refresh token (signature check and
+one insert). Each mode runs in its own process. Reports renewals per second,
+latency percentiles, CPU per renewal (the app process and the hashing pool's) and
+how many renewals the pool turned away with 503 under the load; rejected renewals
+are retried. The refresh run also checks that replaying a used refresh token is
+refused, and times the revoked-family check every authenticated request makes,
+which the Bloom filter answers without a query for families never revoked.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import app_client, create_schema, isolated_environment
+
+MODES = ("signin", "refresh")
+PASSWORD = "Passw0rd!"
+
+
+def prepare(db_path, clients, families):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import insert
+    from app.auth.models import RevokedToken, User
+    from app.auth.utils import hash_password, new_token_id
+
+    engine = create_schema(db_path)
+    # One bcrypt hash at the configured cost, shared by every user
+    hashed = hash_password(PASSWORD)
+    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"user{i}", "email": f"user{i}@example.com", "hashed_password": hashed, "role": "user"}
+            for i in range(clients)
+        ])
+        # Families revoked by other sessions, for the filter to hold
+        if families:
+            conn.execute(insert(RevokedToken), [
+                {"token_id": new_token_id(), "is_family": True, "expires_at": expires_at} for _ in range(families)
+            ])
+    engine.dispose()
+
+
+def pool_cpu():
+    # CPU of the password hashing processes since the last call: they are only counted once reaped
+    from app.auth import password_pool
+
+    executor, password_pool._executor = password_pool._executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def post(client, path, body, counts):
+    while True:
+        response = await client.post(path, json=body)
+        if response.status_code != 503:
+            response.raise_for_status()
+            return response.json()
+        counts["rejected"] += 1
+        await asyncio.sleep(0.05)
+
+
+async def renew(mode, clients, renewals):
+    from app.auth import revocation
+
+    latencies, counts = [], {"rejected": 0}
+    # The lifespan loads the revoked families at startup; the ASGI transport skips it
+    await revocation.rebuild()
+    async with app_client() as client:
+        credentials = [{"email": f"user{i}@example.com", "password": PASSWORD} for i in range(clients)]
+        sessions = await asyncio.gather(*(post(client, "/auth/signin", body, counts) for body in credentials))
+        first_refresh_token = sessions[0]["refresh_token"]
+        counts["rejected"] = 0
+        pool_before = pool_cpu()
+
+        async def run(i):
+            tokens = sessions[i]
+            for _ in range(renewals):
+                started = time.perf_counter()
+                if mode == "signin":
+                    tokens = await post(client, "/auth/signin", credentials[i], counts)
+                else:
+                    tokens = await post(client, "/auth/refresh", {"refresh_token": tokens["refresh_token"]}, counts)
+                latencies.append(time.perf_counter() - started)
+
+        cpu, wall = time.process_time(), time.perf_counter()
+        await asyncio.gather(*(run(i) for i in range(clients)))
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        pool = pool_cpu() - pool_before
+
+        replay = None
+        if mode == "refresh":
+            replay = (await client.post("/auth/refresh", json={"refresh_token": first_refresh_token})).status_code
+
+    latencies.sort()
+    total = len(latencies)
+    return {
+        "rps": total / wall,
+        "p50": latencies[total // 2],
+        "p95": latencies[min(total - 1, int(total * 0.95))],
+        "cpu": cpu / total,
+        "pool_cpu": pool / total,
+        "rejected": counts["rejected"],
+        "replay_status": replay,
+    }
+
+
+async def time_family_checks(checks):
+    # A family that was never revoked: answered by the filter, and by a query without it
+    from sqlalchemy import select
+    from app.auth import revocation
+    from app.auth.models import RevokedToken
+    from app.auth.utils import new_token_id
+    from app.utils.dependency import open_db
+
+    families = [new_token_id() for _ in range(checks)]
+    async with open_db() as db:
+        await revocation.sync(db)
+        started = time.perf_counter()
+        for family in families:
+            await revocation.is_family_revoked(db, family)
+        filtered = (time.perf_counter() - started) / checks
+        started = time.perf_counter()
+        for family in families:
+            await db.scalar(select(RevokedToken.id).where(RevokedToken.token_id == family, RevokedToken.is_family.is_(True)))
+        queried = (time.perf_counter() - started) / checks
+    stats = revocation.revocation_stats()
+    return {"filtered": filtered, "queried": queried, "families": stats["families"],
+            "filter_bytes": stats["filter_bytes"], "false_positives": stats["false_positives"]}
+
+
+def child(mode, args):
+    import logging
+
+    with isolated_environment(LOG_LEVEL="WARNING", ACCESS_LOG="false", METRICS_ENABLED="false") as db_path:
+        prepare(db_path, args.clients, args.families)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        result = asyncio.run(renew(mode, args.clients, args.renewals))
+        if mode == "refresh":
+            result["checks"] = asyncio.run(time_family_checks(args.checks))
+        print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20, help="concurrent sessions")
+    parser.add_argument("--renewals", type=int, default=10, help="renewals per session")
+    parser.add_argument("--families", type=int, default=10000, help="revoked families in the table")
+    parser.add_argument("--checks", type=int, default=5000, help="revoked-family checks timed")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args)
+        return
+
+    results = {}
+    for mode in MODES:
+        command = [sys.executable, "-m", "benchmarks.auth_refresh", "--mode", mode, "--clients", str(args.clients),
+                   "--renewals", str(args.renewals), "--families", str(args.families), "--checks", str(args.checks)]
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{args.clients} concurrent sessions x {args.renewals} renewals")
+    print(f"{'':8s} {'renewals/s':>10s} {'p50':>9s} {'p95':>9s} {'app cpu':>9s} {'pool cpu':>9s} {'503s':>6s}")
+    for mode in MODES:
+        r = results[mode]
+        print(f"{mode:8s} {r['rps']:10.1f} {r['p50'] * 1000:7.1f}ms {r['p95'] * 1000:7.1f}ms "
+              f"{r['cpu'] * 1000:7.2f}ms {r['pool_cpu'] * 1000:7.2f}ms {r['rejected']:6d}")
+    signin, refresh = results["signin"], results["refresh"]
+    print(f"refresh: {refresh['rps'] / signin['rps']:.0f}x the renewals/s, "
+          f"{(signin['cpu'] + signin['pool_cpu']) / (refresh['cpu'] + refresh['pool_cpu']):.0f}x less CPU per renewal")
+
+    checks = refresh["checks"]
+    print(f"\nrevoked-family check with {checks['families']:,} families revoked "
+          f"({checks['filter_bytes'] / 1024:.0f} KiB filter): {checks['filtered'] * 1e6:.1f}us "
+          f"vs {checks['queried'] * 1e6:.1f}us per query, {checks['false_positives']} false positives")
+    replayed = refresh["replay_status"]
+    print(f"replayed refresh token: {replayed} ({'refused' if replayed == 401 else 'ACCEPTED'})")
+    if replayed != 401:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
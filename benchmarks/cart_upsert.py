@@ -0,0 +1,77 @@
+"""Check that concurrent adds to one cart line neither duplicate it nor lose increments.
+
+    python -m benchmarks.cart_upsert --adds 200 --stock 150
+
+Fires --adds concurrent POST /cart/ requests (quantity 1) for the same user and
+product. Exactly min(adds, stock) must succeed, the rest must be refused for
+stock, and the cart must end up with a single line holding that quantity. Also
+prints the SQL statements one add takes. Exits non-zero on any mismatch.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks.harness import StatementCounter, app_client, create_schema, isolated_environment, token_for
+
+
+def prepare(db_path, stock):
+    from sqlalchemy import insert
+    from app.auth.models import User
+    from app.products.models import Product
+
+    engine = create_schema(db_path)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"name": "shopper", "email": "shopper@example.com", "hashed_password": "x", "role": "user"}])
+        conn.execute(insert(Product), [
+            {"name": "Hot item", "description": "d", "price": 10.0, "stock": stock, "category": "Home", "image_url": "x"},
+            {"name": "Other item", "description": "d", "price": 10.0, "stock": 1000, "category": "Home", "image_url": "x"},
+        ])
+    engine.dispose()
+
+
+async def measure(adds):
+    headers = {"Authorization": f"Bearer {token_for('shopper@example.com')}"}
+    async with app_client() as client:
+        with StatementCounter() as counter:
+            # Warm-up caches the principal so only the add itself is counted
+            await client.get("/cart/", headers=headers)
+            counter.reset()
+            await client.post("/cart/", json={"product_id": 2, "quantity": 1}, headers=headers)
+            statements = counter.reset()
+
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/cart/", json={"product_id": 1, "quantity": 1}, headers=headers) for _ in range(adds)
+        ))
+        elapsed = time.perf_counter() - started
+        cart = (await client.get("/cart/", headers=headers)).json()
+    statuses = {}
+    for response in responses:
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    lines = [line for line in cart if line["product_id"] == 1]
+    return statements, elapsed, statuses, lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--adds", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=150)
+    args = parser.parse_args()
+
+    with isolated_environment(LOG_LEVEL="ERROR", ACCESS_LOG="false") as db_path:
+        prepare(db_path, args.stock)
+        statements, elapsed, statuses, lines = asyncio.run(measure(args.adds))
+
+    expected = min(args.adds, args.stock)
+    print(f"one add: {statements} statements")
+    print(f"{args.adds} concurrent adds in {elapsed:.2f}s: statuses {statuses}")
+    print(f"cart lines for the product: {[line['quantity'] for line in lines]} (expected [{expected}])")
+    if [line["quantity"] for line in lines] != [expected] or statuses.get(200, 0) != expected \
+            or statuses.get(400, 0) != args.adds - expected:
+        print("lost or duplicated cart updates")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
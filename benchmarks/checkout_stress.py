@@ -0,0 +1,147 @@
+"""Fire concurrent checkouts at a few hot SKUs and check that nothing oversells.
+
+    python -m benchmarks.checkout_stress --users 300 --skus 3 --stock 100
+
+Every user has one unit of every hot SKU in their cart, so demand exceeds
+stock and most checkouts must be refused. Each mode runs in its own process
+with a fresh database:
+  cold    stock decremented in products.stock by every checkout
+  hot     SKUs marked hot: sold from the worker's in-memory stock shard and
+          flushed to products.stock write-behind
+The run fails if, once the last sales are flushed, the units sold plus the
+remaining stock differ from the starting stock, or if any stock goes negative.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import app_client, create_schema, isolated_environment, start_app, token_for
+
+
+MODES = ("cold", "hot")
+
+
+def prepare(db_path, users, skus, stock, hot, shard_size):
+    from sqlalchemy import insert
+    from app.auth.models import User
+    from app.cart.models import CartItem
+    from app.inventory.models import HotProduct
+    from app.products.models import Product
+
+    engine = create_schema(db_path)
+    with engine.begin() as conn:
+        conn.execute(insert(Product), [
+            {"name": f"Hot SKU {i}", "description": "flash sale", "price": 99.0,
+             "stock": stock, "category": "Deals", "image_url": "x"}
+            for i in range(skus)
+        ])
+        # Tokens are minted directly, so the password hash is never checked
+        conn.execute(insert(User), [
+            {"name": f"buyer{i}", "email": f"buyer{i}@example.com", "hashed_password": "x", "role": "user"}
+            for i in range(users)
+        ])
+        conn.execute(insert(CartItem), [
+            {"user_id": user_id, "product_id": product_id, "quantity": 1}
+            for user_id in range(1, users + 1)
+            for product_id in range(1, skus + 1)
+        ])
+        if hot:
+            conn.execute(insert(HotProduct), [
+                {"product_id": product_id, "shard_size": shard_size} for product_id in range(1, skus + 1)
+            ])
+    engine.dispose()
+
+
+async def fire(users, concurrency):
+    from app.inventory import hot
+
+    tokens = [token_for(f"buyer{i}@example.com") for i in range(users)]
+    limit = asyncio.Semaphore(concurrency)
+    statuses = {}
+
+    # The ASGI transport skips the app's lifespan, which starts and stops the stock shards
+    await hot.start()
+    async with app_client() as client:
+        async def checkout(token):
+            async with limit:
+                response = await client.post("/checkout/", headers={"Authorization": f"Bearer {token}"})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(checkout(token) for token in tokens))
+        elapsed = time.perf_counter() - started
+    # Flushes the last sales and hands unsold shard units back
+    await hot.stop()
+    return statuses, elapsed
+
+
+def verify(db_path, skus, stock):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    lines = []
+    for product_id in range(1, skus + 1):
+        remaining = conn.execute("SELECT stock FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+        sold = conn.execute(
+            "SELECT COALESCE(SUM(quantity), 0) FROM order_items WHERE product_id = ?", (product_id,)
+        ).fetchone()[0]
+        consistent = remaining >= 0 and sold + remaining == stock
+        lines.append({"sku": product_id, "sold": sold, "remaining": remaining, "ok": consistent})
+    shards = conn.execute("SELECT COUNT(*) FROM stock_shards").fetchone()[0]
+    conn.close()
+    return lines, shards
+
+
+def child(mode, args):
+    import logging
+
+    with isolated_environment(LOG_LEVEL="WARNING", ACCESS_LOG="false") as db_path:
+        prepare(db_path, args.users, args.skus, args.stock, mode == "hot", args.shard_size)
+        start_app()
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        statuses, elapsed = asyncio.run(fire(args.users, args.concurrency))
+        lines, shards = verify(db_path, args.skus, args.stock)
+        print(json.dumps({"statuses": statuses, "elapsed": elapsed, "lines": lines, "shards": shards}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--skus", type=int, default=3)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--shard-size", type=int, default=50, help="units per worker shard in hot mode")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args)
+        return
+
+    ok = True
+    for mode in args.modes:
+        command = [sys.executable, "-m", "benchmarks.checkout_stress", "--mode", mode]
+        for name in ("users", "skus", "stock", "concurrency", "shard_size"):
+            command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        statuses = {int(status): n for status, n in result["statuses"].items()}
+        print(
+            f"{mode:5s} {args.users} checkouts in {result['elapsed']:.2f}s "
+            f"({args.users / result['elapsed']:.0f}/s), statuses: {statuses}"
+        )
+        for line in result["lines"]:
+            ok = ok and line["ok"]
+            print(f"      sku {line['sku']}: sold={line['sold']} remaining={line['remaining']} {'ok' if line['ok'] else 'OVERSOLD'}")
+        if result["shards"]:
+            ok = False
+            print(f"      {result['shards']} stock shards left behind")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Bulk-generate a realistic catalog, users, carts and order history.
+
+    python -m benchmarks.datagen --db /tmp/shop.db --scale large
+    python -m benchmarks.datagen --db /tmp/shop.db --products 2000000 --users 300000
+
+Rows go in through Core executemany in large batches, seeded so that the same
+arguments always produce the same database. The search index is built once at
+the end rather than row by row through its triggers, and the sales rollups are
+computed from the finished order history.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, insert
+
+# Head words are common across the catalog, the synthetic tail mimics a real
+# vocabulary (brands, models, materials) where most terms are rare.
+HEAD_WORDS = [
+    "wireless", "mouse", "keyboard", "bluetooth", "speaker", "running", "shoes",
+    "portable", "gaming", "cotton", "shirt", "leather", "wallet", "steel", "bottle",
+    "smart", "watch", "usb", "charger", "desk", "lamp", "yoga", "mat", "coffee", "mug",
+]
+TAIL_WORDS = [f"{a}{b}{c}" for a in "bcdfgklmnprst" for b in "aeiou" for c in ("lo", "rex", "vin", "tor", "na", "mix")]
+CATEGORIES = ["Electronics", "Footwear", "Home", "Apparel", "Sports", "Kitchen", "Books", "Toys"]
+
+SCALES = {
+    "tiny": {"products": 10_000, "users": 2_000, "carts": 1_000, "orders": 10_000},
+    "small": {"products": 100_000, "users": 20_000, "carts": 10_000, "orders": 100_000},
+    "large": {"products": 1_000_000, "users": 200_000, "carts": 100_000, "orders": 1_000_000},
+}
+
+BATCH_SIZE = 20_000
+HISTORY_START = datetime(2024, 1, 1)
+HISTORY_DAYS = 730
+
+
+def pick_words(rng, k):
+    return [rng.choice(HEAD_WORDS) if rng.random() < 0.3 else rng.choice(TAIL_WORDS) for _ in range(k)]
+
+
+def user_email(user_id):
+    return f"user{user_id}@example.com"
+
+
+def skewed_user(rng, users):
+    # A few heavy buyers, a long tail of occasional ones
+    return int(users * rng.random() ** 3) + 1
+
+
+def batches(count, make_row, batch_size=BATCH_SIZE):
+    for start in range(0, count, batch_size):
+        yield [make_row(i) for i in range(start, min(start + batch_size, count))]
+
+
+def fill_products(conn, count, rng):
+    from app.products.models import Product
+
+    def product(_):
+        return {
+            "name": " ".join(pick_words(rng, 3)).title(),
+            "description": " ".join(pick_words(rng, 12)),
+            "price": round(rng.uniform(10, 5000), 2),
+            "stock": rng.randint(0, 500),
+            "category": rng.choice(CATEGORIES),
+            "image_url": "https://example.com/images/item.jpg",
+        }
+
+    for rows in batches(count, product):
+        conn.execute(insert(Product), rows)
+
+
+def fill_users(conn, count):
+    from app.auth.models import User
+
+    # Tokens are minted directly by the load test, so no real password hash is needed
+    for rows in batches(count, lambda i: {
+        "name": f"user{i + 1}", "email": user_email(i + 1), "hashed_password": "x", "role": "user",
+    }):
+        conn.execute(insert(User), rows)
+
+
+def fill_carts(conn, count, users, products, rng):
+    from app.cart.models import CartItem
+
+    # `count` distinct users with 1-5 lines each
+    cart_users = rng.sample(range(1, users + 1), min(count, users))
+    rows = []
+    for user_id in cart_users:
+        for product_id in rng.sample(range(1, products + 1), rng.randint(1, 5)):
+            rows.append({"user_id": user_id, "product_id": product_id, "quantity": rng.randint(1, 3)})
+        if len(rows) >= BATCH_SIZE:
+            conn.execute(insert(CartItem), rows)
+            rows = []
+    if rows:
+        conn.execute(insert(CartItem), rows)
+
+
+def fill_orders(conn, count, users, products, rng):
+    from app.orders.models import Order, OrderItem, OrderStatus
+
+    statuses = [OrderStatus.PAID] * 8 + [OrderStatus.PENDING, OrderStatus.CANCELLED]
+    order_id = 0
+    for start in range(0, count, BATCH_SIZE):
+        orders, items = [], []
+        for _ in range(min(BATCH_SIZE, count - start)):
+            order_id += 1
+            total = 0.0
+            for _ in range(rng.randint(1, 4)):
+                price = round(rng.uniform(10, 5000), 2)
+                quantity = rng.randint(1, 3)
+                total += price * quantity
+                items.append({
+                    "order_id": order_id, "product_id": rng.randint(1, products),
+                    "product_name": " ".join(pick_words(rng, 3)).title(),
+                    "quantity": quantity, "price_at_purchase": price,
+                })
+            orders.append({
+                "id": order_id, "user_id": skewed_user(rng, users), "total_amount": round(total, 2),
+                "status": rng.choice(statuses),
+                "created_at": HISTORY_START + timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400)),
+            })
+        conn.execute(insert(Order), orders)
+        conn.execute(insert(OrderItem), items)
+
+
+def generate(db_path, products, users, carts, orders, seed=42, log=print):
+    """Create a fresh SQLite database at `db_path` filled to the given sizes."""
+    from app.core.database import Base
+    from app.auth import models as auth_models  # noqa: F401  (register tables)
+    from app.cart import models as cart_models  # noqa: F401
+    from app.emails import models as email_models  # noqa: F401
+    from app.orders import models as order_models  # noqa: F401
+    from app.products import models as product_models  # noqa: F401
+    from app.reports import models as report_models  # noqa: F401
+    from app.products.search import ensure_search_index
+    from app.products.facets import ensure_facets
+    from app.reports.rollups import ensure_rollups
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    engine = create_engine(f"sqlite:///{db_path}")
+
+    @event.listens_for(engine, "connect")
+    def bulk_load_pragmas(dbapi_connection, connection_record):
+        # Nothing to protect while loading; the app sets its own pragmas on connect
+        dbapi_connection.execute("PRAGMA journal_mode = WAL")
+        dbapi_connection.execute("PRAGMA synchronous = OFF")
+        dbapi_connection.execute("PRAGMA cache_size = -262144")
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    steps = [
+        ("products", lambda conn: fill_products(conn, products, rng)),
+        ("users", lambda conn: fill_users(conn, users)),
+        ("carts", lambda conn: fill_carts(conn, carts, users, products, rng)),
+        ("orders", lambda conn: fill_orders(conn, orders, users, products, rng)),
+    ]
+    for name, fill in steps:
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            fill(conn)
+        log(f"{name:9s} {time.perf_counter() - started:7.1f}s")
+
+    started = time.perf_counter()
+    ensure_search_index(engine)
+    ensure_facets(engine)
+    ensure_rollups(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    log(f"{'index':9s} {time.perf_counter() - started:7.1f}s")
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="SQLite file to (re)create")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--products", type=int)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--carts", type=int, help="users with a non-empty cart")
+    parser.add_argument("--orders", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sizes = {name: getattr(args, name) or default for name, default in SCALES[args.scale].items()}
+    generate(args.db, seed=args.seed, **sizes)
+    print(f"{args.db}: {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Deliver queued emails to a local SMTP stand-in; no network needed.
+
+    pip install aiosmtpd
+    python -m benchmarks.email_outbox --emails 500
+
+Starts an aiosmtpd server on localhost that defers the first delivery of some
+recipients (451) and rejects others outright (550), queues the emails through
+the outbox and runs the worker until the queue drains. Also times the old
+one-connection-per-email approach for comparison. The run fails unless every
+deliverable email arrives exactly once and every rejected one is marked failed.
+"""
+import argparse
+import socket
+import sys
+import time
+
+from benchmarks.harness import create_schema, isolated_environment
+
+
+class StandIn:
+    """aiosmtpd handler: 'defer*' recipients get one 451, 'bounce*' recipients a 550."""
+
+    def __init__(self):
+        self.received = []
+        self.deferred = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce"):
+            return "550 No such user"
+        if address.startswith("defer") and address not in self.deferred:
+            self.deferred.add(address)
+            return "451 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def recipients(emails):
+    # Every tenth email is deferred once, every fiftieth bounces
+    for i in range(emails):
+        if i % 50 == 0:
+            yield f"bounce{i}@example.com"
+        elif i % 10 == 0:
+            yield f"defer{i}@example.com"
+        else:
+            yield f"user{i}@example.com"
+
+
+def connection_per_email(port, addresses):
+    import smtplib
+    from app.emails.worker import build_message
+
+    started = time.perf_counter()
+    for address in addresses:
+        with smtplib.SMTP("127.0.0.1", port) as smtp:
+            smtp.send_message(build_message(address, "Your Password Reset Token", "token"))
+    return time.perf_counter() - started
+
+
+def drain():
+    from app.emails.worker import SMTPConnection, deliver_batch
+
+    connection = SMTPConnection()
+    started = time.perf_counter()
+    try:
+        # EMAIL_RETRY_BACKOFF=0 makes deferred emails due again right away
+        while deliver_batch(connection):
+            pass
+    finally:
+        connection.close()
+    return time.perf_counter() - started
+
+
+def main():
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        sys.exit("aiosmtpd is required: pip install aiosmtpd")
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    port = free_port()
+    env = {
+        "SMTP_SERVER": "127.0.0.1", "SMTP_PORT": port, "SMTP_SECURITY": "none",
+        "EMAIL_USERNAME": "", "EMAIL_FROM": "shop@example.com",
+        "EMAIL_BATCH_SIZE": args.batch_size, "EMAIL_RETRY_BACKOFF": 0,
+    }
+    handler = StandIn()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        with isolated_environment(**env) as db_path:
+            create_schema(db_path).dispose()
+            from sqlalchemy import func, select
+            from app.core.database import SessionLocal
+            from app.emails import outbox, worker
+            from app.emails.models import EmailStatus, OutboxEmail
+
+            addresses = list(recipients(args.emails))
+            deliverable = [a for a in addresses if not a.startswith("bounce")]
+            baseline = connection_per_email(port, [a for a in deliverable if not a.startswith("defer")])
+            handler.received.clear()
+
+            with SessionLocal() as db:
+                for address in addresses:
+                    outbox.enqueue(db, address, "Your Password Reset Token", "token")
+                db.commit()
+
+            elapsed = drain()
+            with SessionLocal() as db:
+                statuses = dict(db.execute(select(OutboxEmail.status, func.count()).group_by(OutboxEmail.status)).all())
+            stats = worker.delivery_stats()
+    finally:
+        controller.stop()
+
+    plain = len(deliverable) - len(handler.deferred)
+    print(f"connection per email: {plain} emails in {baseline:.2f}s ({plain / baseline:.0f}/s)")
+    print(f"outbox worker:        {len(handler.received)} emails in {elapsed:.2f}s ({len(handler.received) / elapsed:.0f}/s)")
+    print(f"statuses: { {status.value: n for status, n in statuses.items()} }")
+    print(f"stats: {stats}")
+
+    ok = (
+        sorted(handler.received) == sorted(deliverable)
+        and statuses.get(EmailStatus.SENT) == len(deliverable)
+        and statuses.get(EmailStatus.FAILED) == len(addresses) - len(deliverable)
+    )
+    if not ok:
+        print("delivery mismatch")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
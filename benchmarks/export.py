@@ -0,0 +1,130 @@
+"""Stream the catalog and order history out versus paging GET /admin/products/.
+
+    python -m benchmarks.datagen --db /tmp/shop.db --scale small
+    python -m benchmarks.export --db /tmp/shop.db
+
+Reports time to first byte, total time and size of each export, next to fetching
+the same catalog through skip/limit pages; --heap adds the Python heap peak
+(tracemalloc, slows everything down). Exports are read straight off the ASGI
+app, chunk by chunk, because httpx's ASGI transport buffers whole responses.
+"""
+import argparse
+import asyncio
+import shutil
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+from benchmarks.harness import app_client, isolated_environment, start_app, token_for
+
+ADMIN_EMAIL = "export-admin@example.com"
+
+
+def add_admin(db_path):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO users (name, email, hashed_password, role) VALUES ('admin', ?, 'x', 'admin')",
+            (ADMIN_EMAIL,),
+        )
+    conn.close()
+
+
+def heap_peak():
+    if not tracemalloc.is_tracing():
+        return ""
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    return f"  heap peak {peak / 2**20:5.1f} MB"
+
+
+async def timed_stream(app, path, params, headers):
+    # Minimal ASGI client that counts body chunks as they are sent and keeps none of them
+    stats = {"first_byte": None, "size": 0, "lines": 0}
+    started = time.perf_counter()
+
+    requested = asyncio.Event()
+
+    async def receive():
+        # The request body once; later calls (the disconnect listener) wait for good
+        if not requested.is_set():
+            requested.set()
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"{path} returned {message['status']}")
+        if message["type"] == "http.response.body" and message.get("body"):
+            stats["first_byte"] = stats["first_byte"] or time.perf_counter() - started
+            stats["size"] += len(message["body"])
+            stats["lines"] += message["body"].count(b"\n")
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": urlencode(params).encode(), "root_path": "",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    await app(scope, receive, send)
+    return stats["first_byte"], time.perf_counter() - started, stats["size"], stats["lines"]
+
+
+async def paged(client, headers, limit):
+    started = time.perf_counter()
+    skip = rows = 0
+    while True:
+        response = await client.get("/admin/products/", params={"skip": skip, "limit": limit}, headers=headers)
+        response.raise_for_status()
+        page = response.json()
+        rows += len(page)
+        if len(page) < limit:
+            break
+        skip += limit
+    return time.perf_counter() - started, rows
+
+
+async def measure(page_size, skip_paging):
+    from app.main import app
+
+    headers = {"Authorization": f"Bearer {token_for(ADMIN_EMAIL, role='admin')}"}
+    for path, params in [
+        ("/admin/products/export", {"format": "ndjson"}),
+        ("/admin/products/export", {"format": "csv"}),
+        ("/admin/products/export", {"format": "csv", "gzip": "true"}),
+        ("/admin/orders/export", {"format": "ndjson"}),
+        ("/admin/orders/export", {"format": "csv"}),
+    ]:
+        first_byte, elapsed, size, lines = await timed_stream(app, path, params, headers)
+        label = f"{path.split('/')[2]} {params['format']}{' gzip' if 'gzip' in params else ''}"
+        line_info = f"{lines:9d} lines" if "gzip" not in params else f"{'':15s}"
+        print(
+            f"{label:20s} ttfb {first_byte * 1000:7.1f} ms  total {elapsed:6.2f}s  {line_info}  "
+            f"{size / 2**20:6.1f} MB{heap_peak()}"
+        )
+    if not skip_paging:
+        async with app_client() as client:
+            elapsed, rows = await paged(client, headers, page_size)
+        print(f"{'skip/limit pages':20s} {'':15s} total {elapsed:6.2f}s  {rows:9d} rows  {'':9s}{heap_peak()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="database made by benchmarks.datagen (copied, never modified)")
+    parser.add_argument("--page-size", type=int, default=100, help="limit for the skip/limit comparison")
+    parser.add_argument("--skip-paging", action="store_true")
+    parser.add_argument("--heap", action="store_true", help="also report the Python heap peak")
+    args = parser.parse_args()
+
+    with isolated_environment(LOG_LEVEL="WARNING", ACCESS_LOG="false", SLOW_QUERY_MS="60000") as db_path:
+        shutil.copyfile(args.db, db_path)
+        add_admin(db_path)
+        start_app()
+        if args.heap:
+            tracemalloc.start()
+        asyncio.run(measure(args.page_size, args.skip_paging))
+
+
+if __name__ == "__main__":
+    main()
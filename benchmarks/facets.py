@@ -0,0 +1,138 @@
+"""Compare GET /products/facets served from the facet counts with per-request GROUP BY scans.
+
+    python -m benchmarks.facets --sizes 10000 100000 1000000
+
+For each catalog size, fills a fresh database with generated products, times the
+initial build of the facet counts, then times facet computation for a few filter
+sets both from the counts and by grouping the products table (the fallback used
+on databases without the triggers). Both must return the same facets. Also times
+product writes with and without the triggers that keep the counts current.
+Exits non-zero if the two methods disagree.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+from benchmarks.harness import create_schema, isolated_environment
+
+FILTERS = [
+    ("no filters", {}),
+    ("category", {"category": "electronics"}),
+    ("price on bucket edges", {"min_price": 100, "max_price": 500}),
+    ("price off bucket edges", {"min_price": 123.45, "max_price": 987.65}),
+    ("category + price off edges", {"category": "books", "min_price": 1234.5}),
+]
+
+TRIGGERS = ("product_facets_ai", "product_facets_ad", "product_facets_au")
+
+
+def prepare(db_path, size):
+    from sqlalchemy import text
+    from app.core.database import configure_sqlite
+    from app.products import facets
+    from benchmarks.datagen import fill_products
+
+    engine = create_schema(db_path)
+    configure_sqlite(engine)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        fill_products(conn, size, random.Random(42))
+    filled = time.perf_counter() - started
+
+    started = time.perf_counter()
+    facets.ensure_facets(engine)
+    built = time.perf_counter() - started
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+        rows = conn.execute(text("SELECT count(*) FROM product_facets")).scalar()
+    return engine, filled, built, rows
+
+
+async def time_facets(db_path, repeat):
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from app.core.database import configure_sqlite
+    from app.products import facets
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    configure_sqlite(async_engine.sync_engine)
+    results = []
+    async with AsyncSession(async_engine) as db:
+        for name, params in FILTERS:
+            args = (params.get("category"), params.get("min_price", 0), params.get("max_price"))
+            timings, answers = {}, {}
+            for method, enabled in (("counts", True), ("group by", False)):
+                facets._facets_enabled = enabled
+                samples = []
+                for _ in range(repeat if enabled else max(1, repeat // 5)):
+                    started = time.perf_counter()
+                    answers[method] = await facets.compute_facets(db, *args)
+                    samples.append(time.perf_counter() - started)
+                timings[method] = statistics.median(samples)
+            facets._facets_enabled = True
+            results.append((name, timings, answers["counts"] == answers["group by"]))
+    await async_engine.dispose()
+    return results
+
+
+def time_writes(engine, writes):
+    from sqlalchemy import text
+    from app.products import facets
+
+    # Every update moves a product to another price bucket, the most the triggers can cost
+    with engine.connect() as conn:
+        ids = conn.execute(text("SELECT id FROM products LIMIT :writes"), {"writes": writes}).scalars().all()
+
+    def run():
+        started = time.perf_counter()
+        for i, product_id in enumerate(ids):
+            with engine.begin() as conn:
+                conn.execute(
+                    text("UPDATE products SET price = :price WHERE id = :id"),
+                    {"price": 30.0 if i % 2 else 3000.0, "id": product_id}
+                )
+        return (time.perf_counter() - started) / len(ids)
+
+    with_triggers = run()
+    with engine.begin() as conn:
+        for trigger in TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER {trigger}"))
+    without_triggers = run()
+    facets.ensure_facets(engine)
+    return with_triggers, without_triggers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20, help="runs per filter set (a fifth of that for GROUP BY)")
+    parser.add_argument("--writes", type=int, default=2000, help="product updates timed with and without triggers")
+    args = parser.parse_args()
+
+    failed = False
+    with isolated_environment(LOG_LEVEL="ERROR") as db_path:
+        for size in args.sizes:
+            path = os.path.join(os.path.dirname(db_path), f"facets_{size}.db")
+            engine, filled, built, rows = prepare(path, size)
+            print(f"\n{size:,} products: generated in {filled:.1f}s, facet counts built in {built:.2f}s ({rows} rows)")
+            print(f"  {'filters':28s} {'counts':>10s} {'group by':>10s} {'speedup':>8s}")
+            for name, timings, same in asyncio.run(time_facets(path, args.repeat)):
+                counts, scan = timings["counts"] * 1000, timings["group by"] * 1000
+                print(f"  {name:28s} {counts:8.2f}ms {scan:8.2f}ms {scan / counts:7.1f}x{'' if same else '  MISMATCH'}")
+                failed |= not same
+            with_triggers, without_triggers = time_writes(engine, args.writes)
+            print(f"  price update moving buckets: {with_triggers * 1e6:.0f}us with triggers, "
+                  f"{without_triggers * 1e6:.0f}us without")
+            engine.dispose()
+            os.remove(path)
+
+    if failed:
+        print("facet counts disagree with the products table")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Shared setup for benchmarks that drive the real app in-process.
+
+The app reads DATABASE_URL and its settings at import time and opens logs/
+relative to the working directory, so `isolated_environment()` must be entered
+before anything imports `app.main`.
+"""
+import contextlib
+import os
+import tempfile
+import threading
+
+from sqlalchemy import create_engine, event
+
+
+@contextlib.contextmanager
+def isolated_environment(database=None, **env):
+    # `database` points the app at an existing SQLite file instead of a fresh temp one
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.abspath(database) if database else os.path.join(tmp, "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        # Benchmarks send every request from one address; rate limits are measured on their own
+        os.environ.update({key: str(value) for key, value in {"RATE_LIMIT_ENABLED": "false", **env}.items()})
+        os.makedirs(os.path.join(tmp, "logs"))
+        os.chdir(tmp)
+        try:
+            yield db_path
+        finally:
+            os.chdir(previous_cwd)
+
+
+def create_schema(db_path):
+    from app.core.database import Base
+    from app.auth import models as auth_models  # noqa: F401  (register tables)
+    from app.cart import models as cart_models  # noqa: F401
+    from app.emails import models as email_models  # noqa: F401
+    from app.inventory import models as inventory_models  # noqa: F401
+    from app.orders import models as order_models  # noqa: F401
+    from app.products import models as product_models  # noqa: F401
+    from app.reports import models as report_models  # noqa: F401
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def token_for(email, role="user"):
+    from app.auth.utils import create_access_token
+    return create_access_token(data={"sub": email, "role": role})
+
+
+_started = False
+
+
+def start_app():
+    # The one-time startup work of the app's lifespan, which the ASGI transport
+    # doesn't run: logging and the schema, search index and facet counts
+    global _started
+    if not _started:
+        from app.core.logging_setup import setup_logging
+        from app.main import prepare_database
+        setup_logging()
+        prepare_database()
+        _started = True
+
+
+def app_client():
+    import httpx
+    from app.main import app
+    start_app()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+class StatementCounter:
+    """Counts SQL statements sent by the app's engines while active."""
+
+    def __init__(self):
+        from app.core.database import async_engine, engine
+        self.engines = [engine, async_engine.sync_engine]
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _on_execute(self, *args, **kw):
+        with self._lock:
+            self.count += 1
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._on_execute)
+
+    def reset(self):
+        with self._lock:
+            count, self.count = self.count, 0
+        return count
@@ -0,0 +1,252 @@
+"""Reproducible load test: browse, search, cart, checkout and order-history flows.
+
+    python -m benchmarks.datagen --db /tmp/shop.db --scale small
+    python -m benchmarks.loadtest --db /tmp/shop.db --save baseline.json
+    ... change something ...
+    python -m benchmarks.loadtest --db /tmp/shop.db --compare baseline.json
+
+Runs each scenario against a copy of --db (generated with --scale when omitted)
+in-process through httpx's ASGI transport. Reports p50/p95/p99 latency,
+throughput, errors (5xx), refusals (4xx) and SQL statements per request for
+every endpoint. --save writes the numbers as JSON. --compare diffs a run against
+a saved baseline and flags p95, statement-count or error regressions. A run in
+which an endpoint answered nothing but 4xx/5xx fails: the scenario is broken
+(e.g. its users are not in the database), so its numbers mean nothing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks import datagen, scenarios
+from benchmarks.harness import app_client, isolated_environment, start_app
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, label, seconds, status):
+        self.latencies.setdefault(label, []).append(seconds)
+        counts = self.statuses.setdefault(label, {})
+        counts[status] = counts.get(status, 0) + 1
+
+    def endpoints(self, route_summary):
+        results = {}
+        for label, values in self.latencies.items():
+            values.sort()
+            statuses = self.statuses[label]
+            results[label] = {
+                "requests": len(values),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+                "errors": sum(n for status, n in statuses.items() if status >= 500),
+                # Some are expected (a product sold out, a concurrent checkout of the cart)
+                "client_errors": sum(n for status, n in statuses.items() if 400 <= status < 500),
+                "statuses": {str(status): n for status, n in sorted(statuses.items())},
+                "db_statements_avg": round(route_summary.get(label, {}).get("db_statements_avg", 0.0), 3),
+            }
+        return results
+
+
+async def run_scenario(name, sizes, iterations, concurrency, seed):
+    from app.core import metrics
+
+    flow = scenarios.SCENARIOS[name]
+    recorder = Recorder()
+    remaining = iter(range(iterations))
+    metrics.reset()
+
+    async with app_client() as client:
+        async def worker(index):
+            rng = scenarios.new_rng(seed, name, index)
+            for _ in remaining:
+                user_id = scenarios.pick_user(rng, name, sizes["users"])
+                await flow(scenarios.Visit(client, recorder, rng, sizes, user_id))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    endpoints = recorder.endpoints(metrics.route_summary())
+    requests = sum(e["requests"] for e in endpoints.values())
+    summary = {
+        "iterations": iterations,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "client_errors": sum(e["client_errors"] for e in endpoints.values()),
+    }
+    return summary, endpoints
+
+
+def table_sizes(db_path):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        return {
+            "products": conn.execute("SELECT MAX(id) FROM products").fetchone()[0] or 0,
+            "users": conn.execute("SELECT MAX(id) FROM users").fetchone()[0] or 0,
+            "orders": conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    import logging
+
+    # isolated_environment() changes into its own directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work:
+        db_path = os.path.join(work, "loadtest.db")
+        # Latency is reported per endpoint, so per-query warnings would only be noise.
+        # Entered before datagen imports app.*, which reads DATABASE_URL once.
+        with isolated_environment(
+            database=db_path,
+            LOG_LEVEL="WARNING", ACCESS_LOG="false", METRICS_ENABLED="true", SLOW_QUERY_MS="60000",
+        ):
+            if args.db:
+                # Checkouts and carts write, so every run starts from the same copy
+                shutil.copyfile(os.path.join(cwd, args.db), db_path)
+            else:
+                datagen.generate(db_path, seed=args.seed, log=lambda line: None, **datagen.SCALES[args.scale])
+            sizes = table_sizes(db_path)
+
+            start_app()
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+
+            report = {
+                "meta": {
+                    "revision": git_revision(),
+                    "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "db_async": os.getenv("DB_ASYNC", "true"),
+                    "sizes": sizes,
+                    "iterations": args.iterations,
+                    "concurrency": args.concurrency,
+                    "seed": args.seed,
+                },
+                "scenarios": {},
+                "endpoints": {},
+            }
+            for name in args.scenarios:
+                summary, endpoints = asyncio.run(
+                    run_scenario(name, sizes, args.iterations, args.concurrency, args.seed)
+                )
+                report["scenarios"][name] = summary
+                for label, stats in endpoints.items():
+                    report["endpoints"][f"{name}: {label}"] = stats
+    return report
+
+
+def print_report(report):
+    print(
+        f"{'endpoint':42s} {'reqs':>6s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'stmts':>6s} {'4xx':>5s} {'5xx':>4s}"
+    )
+    for label, e in report["endpoints"].items():
+        print(
+            f"{label:42s} {e['requests']:6d} {e['p50_ms']:8.2f} {e['p95_ms']:8.2f} {e['p99_ms']:8.2f} "
+            f"{e['db_statements_avg']:6.2f} {e['client_errors']:5d} {e['errors']:4d}"
+        )
+    print()
+    for name, s in report["scenarios"].items():
+        print(
+            f"{name:14s} {s['requests']:6d} requests in {s['seconds']:6.2f}s  {s['rps']:7.1f} req/s  "
+            f"{s['errors']} errors, {s['client_errors']} 4xx"
+        )
+
+
+def failed_endpoints(report):
+    # Endpoints that never answered 2xx/3xx: measuring them measured an error path
+    return [
+        label for label, e in report["endpoints"].items()
+        if e["requests"] and e["errors"] + e["client_errors"] == e["requests"]
+    ]
+
+
+def compare(report, baseline, threshold):
+    """Print per-endpoint changes against `baseline`; returns the regressed endpoints."""
+    regressions = []
+    print(f"\nvs baseline {baseline['meta'].get('revision')} ({baseline['meta'].get('created_at')}):")
+    for label, e in report["endpoints"].items():
+        base = baseline["endpoints"].get(label)
+        if base is None:
+            print(f"  {label:42s} new")
+            continue
+        p95_change = e["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        statements_change = e["db_statements_avg"] - base["db_statements_avg"]
+        flags = []
+        if p95_change > threshold:
+            flags.append("p95")
+        if statements_change > 0.5:
+            flags.append("statements")
+        if e["errors"] > base["errors"]:
+            flags.append("errors")
+        if e["client_errors"] > base.get("client_errors", 0) * (1 + threshold):
+            flags.append("4xx")
+        if flags:
+            regressions.append(label)
+        print(
+            f"  {label:42s} p95 {p95_change:+7.1%}  stmts {statements_change:+6.2f}"
+            f"{'  REGRESSION: ' + ', '.join(flags) if flags else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="database made by benchmarks.datagen (copied, never modified)")
+    parser.add_argument("--scale", choices=datagen.SCALES, default="tiny", help="generate data when --db is omitted")
+    parser.add_argument("--scenarios", nargs="+", choices=scenarios.SCENARIOS, default=list(scenarios.SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=300, help="visits per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="write the report as JSON")
+    parser.add_argument("--compare", help="baseline JSON to diff against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative p95 increase")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    failed = failed_endpoints(report)
+    if failed:
+        print(f"\nFAILED: no successful response from {', '.join(failed)}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
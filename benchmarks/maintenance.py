@@ -0,0 +1,197 @@
+"""Maintenance jobs on grown tables: their cost, and how long they keep writers waiting.
+
+    python -m benchmarks.maintenance --tokens 500000 --carts 50000
+
+Fills a database with --tokens expired password reset tokens and --carts carts of
+--lines lines, --stale of them untouched for longer than CART_EXPIRY_DAYS. Then runs
+every maintenance job while a writer changes a cart line every few milliseconds, and
+reports per job the rows (tables, pages) touched and the time taken, plus the writer's
+p50/p99/max latency over the whole run. The same work is then done on a fresh copy as
+one statement per job (single DELETEs, a full ANALYZE, one incremental_vacuum
+transaction), the way a naive cron script would, for comparison. Also reports the
+database size before and after. Each mode runs in its own process.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.harness import isolated_environment, start_app
+
+MODES = ("sliced", "single")
+WRITER_USER = 10 ** 9
+
+
+def prepare(tokens, carts, lines, stale):
+    from sqlalchemy import text
+    from app.core.database import engine
+
+    start_app()
+    with engine.begin() as conn:
+        conn.execute(text("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :tokens)
+            INSERT INTO password_reset_tokens (user_id, token, expiration_time, used)
+            SELECT i % 1000, hex(randomblob(24)), datetime('now', '-' || (1 + i % 30) || ' days'), i % 2 FROM n
+        """), {"tokens": tokens})
+        # Cart lines of stale carts are older than the expiry, the others changed today
+        conn.execute(text("""
+            WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < :rows - 1)
+            INSERT INTO cart (user_id, product_id, quantity, updated_at)
+            SELECT i / :lines, NULL, 1,
+                   CASE WHEN (i / :lines) % 100 < :stale_percent THEN datetime('now', '-90 days') ELSE datetime('now') END
+            FROM n
+        """), {"rows": carts * lines, "lines": lines, "stale_percent": round(stale * 100)})
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def single_statement_jobs():
+    # The same work without batches: each job is one statement and one transaction
+    from datetime import timedelta
+    from sqlalchemy import delete, exists
+    from app.auth.models import PasswordResetToken
+    from app.cart.models import CartItem
+    from app.core.config import CART_EXPIRY_DAYS
+    from app.core.database import engine
+    from app.maintenance.jobs import utcnow
+
+    tokens, cart = PasswordResetToken.__table__, CartItem.__table__
+    recent = cart.alias("recent")
+    cutoff = utcnow() - timedelta(days=CART_EXPIRY_DAYS)
+    results = {}
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        rows = conn.execute(delete(tokens).where(tokens.c.expiration_time < utcnow())).rowcount
+    results["purge_reset_tokens"] = (rows, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    touched_since = exists().where(recent.c.user_id == cart.c.user_id, recent.c.updated_at >= cutoff)
+    with engine.begin() as conn:
+        rows = conn.execute(delete(cart).where(cart.c.updated_at < cutoff, ~touched_since)).rowcount
+    results["expire_carts"] = (rows, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        tables = conn.exec_driver_sql("SELECT count(DISTINCT tbl) FROM sqlite_stat1").scalar()
+    results["analyze"] = (tables, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        pages = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        for _ in range(pages):
+            conn.exec_driver_sql("PRAGMA incremental_vacuum(1)")
+        conn.commit()
+    results["incremental_vacuum"] = (pages, time.perf_counter() - started)
+    return results
+
+
+class Writer(threading.Thread):
+    """Changes one cart line every `interval` seconds, timing each transaction."""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.latencies = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        from sqlalchemy import text
+        from app.core.database import engine
+
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO cart (user_id, product_id, quantity) VALUES (:user, NULL, 1)"), {"user": WRITER_USER})
+        while not self.stopped.is_set():
+            started = time.perf_counter()
+            with engine.begin() as conn:
+                conn.execute(text("UPDATE cart SET quantity = quantity + 1, updated_at = CURRENT_TIMESTAMP WHERE user_id = :user"),
+                             {"user": WRITER_USER})
+            self.latencies.append(time.perf_counter() - started)
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        latencies = sorted(self.latencies)
+        total = len(latencies)
+        return {
+            "writes": total,
+            "p50": latencies[total // 2],
+            "p99": latencies[min(total - 1, int(total * 0.99))],
+            "max": latencies[-1],
+        }
+
+
+def database_size(db_path):
+    from app.core.database import engine
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(db_path)
+
+
+def child(mode, args):
+    import asyncio
+
+    env = {"MAINTENANCE_BATCH_SIZE": args.batch, "MAINTENANCE_BATCH_PAUSE": args.pause}
+    with isolated_environment(LOG_LEVEL="WARNING", **env) as db_path:
+        prepare(args.tokens, args.carts, args.lines, args.stale)
+        size_before = database_size(db_path)
+        writer = Writer(args.interval)
+        writer.start()
+        time.sleep(0.2)
+        if mode == "sliced":
+            from app.maintenance import scheduler
+            jobs = asyncio.run(scheduler.run_jobs())
+        else:
+            jobs = single_statement_jobs()
+        time.sleep(0.2)
+        result = {"jobs": jobs, "writer": writer.stop(), "size_before": size_before, "size_after": database_size(db_path)}
+        print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=500_000, help="expired password reset tokens")
+    parser.add_argument("--carts", type=int, default=50_000)
+    parser.add_argument("--lines", type=int, default=10, help="lines per cart")
+    parser.add_argument("--stale", type=float, default=0.6, help="share of carts past the expiry")
+    parser.add_argument("--batch", type=int, default=500, help="MAINTENANCE_BATCH_SIZE")
+    parser.add_argument("--pause", type=float, default=0.01, help="MAINTENANCE_BATCH_PAUSE")
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between the writer's transactions")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args)
+        return
+
+    results = {}
+    for mode in MODES:
+        command = [sys.executable, "-m", "benchmarks.maintenance", "--mode", mode, "--tokens", str(args.tokens),
+                   "--carts", str(args.carts), "--lines", str(args.lines), "--stale", str(args.stale),
+                   "--batch", str(args.batch), "--pause", str(args.pause), "--interval", str(args.interval)]
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{args.tokens:,} expired reset tokens, {args.carts:,} carts x {args.lines} lines ({args.stale:.0%} stale), "
+          f"batches of {args.batch} with {args.pause * 1000:.0f}ms pauses")
+    for mode in MODES:
+        r = results[mode]
+        print(f"\n{mode}")
+        print(f"  {'job':20s} {'rows':>10s} {'time':>10s}")
+        for name, (rows, seconds) in r["jobs"].items():
+            print(f"  {name:20s} {rows:10,d} {seconds * 1000:8.0f}ms")
+        w = r["writer"]
+        print(f"  concurrent writer: {w['writes']} writes, p50 {w['p50'] * 1000:.1f}ms, "
+              f"p99 {w['p99'] * 1000:.1f}ms, max {w['max'] * 1000:.0f}ms")
+        print(f"  database size: {r['size_before'] / 2 ** 20:.1f} MiB -> {r['size_after'] / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Per-request and per-statement cost of the metrics instrumentation.
+
+    python -m benchmarks.metrics_overhead --iterations 100000
+
+Calls a no-op ASGI app directly, with and without MetricsMiddleware, and runs
+`SELECT 1` on an in-memory SQLite engine with and without the engine hooks.
+Neither measurement includes HTTP or routing, so the difference is the
+instrumentation alone.
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.core import metrics
+from app.middlewares.metrics_middleware import MetricsMiddleware
+
+
+class Route:
+    path = "/bench/{id}"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def time_requests(app, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        scope = {"type": "http", "method": "GET", "path": "/bench/1", "headers": []}
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def time_statements(engine, iterations):
+    with engine.connect() as conn:
+        statement = text("SELECT 1")
+        started = time.perf_counter()
+        for _ in range(iterations):
+            conn.execute(statement)
+        return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    bare = asyncio.run(time_requests(endpoint, args.iterations))
+    wrapped = asyncio.run(time_requests(MetricsMiddleware(endpoint), args.iterations))
+    print(f"request:   {bare:6.2f} us bare, {wrapped:6.2f} us with middleware  (+{wrapped - bare:.2f} us)")
+
+    engine = create_engine("sqlite://")
+    plain = time_statements(engine, args.iterations)
+    metrics.instrument_engine(engine)
+    hooked = time_statements(engine, args.iterations)
+    print(f"statement: {plain:6.2f} us bare, {hooked:6.2f} us with hooks       (+{hooked - plain:.2f} us)")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
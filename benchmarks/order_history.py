@@ -0,0 +1,93 @@
+"""Check that GET /orders runs a constant number of statements per page.
+
+    python -m benchmarks.order_history --sizes 10 100 1000 --items 3
+
+Seeds one user per size with that many orders, fetches a page of history for
+each and counts the SQL statements it took. The run fails if the count
+depends on how many orders the user has.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.harness import StatementCounter, app_client, create_schema, isolated_environment, token_for
+
+
+def prepare(db_path, sizes, items):
+    from sqlalchemy import insert
+    from app.auth.models import User
+    from app.orders.models import Order, OrderItem, OrderStatus
+
+    engine = create_schema(db_path)
+    started = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"customer{size}", "email": f"customer{size}@example.com", "hashed_password": "x", "role": "user"}
+            for size in sizes
+        ])
+        order_id = 0
+        for user_id, size in enumerate(sizes, start=1):
+            conn.execute(insert(Order), [
+                {"user_id": user_id, "total_amount": 10.0 * items, "status": OrderStatus.PAID,
+                 "created_at": started + timedelta(hours=n)}
+                for n in range(size)
+            ])
+            conn.execute(insert(OrderItem), [
+                {"order_id": order_id + n + 1, "product_id": None, "product_name": f"item {i}",
+                 "quantity": 1, "price_at_purchase": 10.0}
+                for n in range(size)
+                for i in range(items)
+            ])
+            order_id += size
+    engine.dispose()
+
+
+async def measure(sizes, limit):
+    results = []
+    async with app_client() as client:
+        with StatementCounter() as counter:
+            for size in sizes:
+                headers = {"Authorization": f"Bearer {token_for(f'customer{size}@example.com')}"}
+                # Warm-up loads the principal into its cache so only history queries are counted
+                await client.get("/orders/", headers=headers, params={"limit": limit})
+                counter.reset()
+
+                started = time.perf_counter()
+                response = await client.get("/orders/", headers=headers, params={"limit": limit})
+                elapsed = time.perf_counter() - started
+                statements = counter.reset()
+                response.raise_for_status()
+
+                cursor = response.headers.get("X-Next-Cursor")
+                pages = 1
+                while cursor:
+                    response = await client.get("/orders/", headers=headers, params={"limit": limit, "cursor": cursor})
+                    response.raise_for_status()
+                    cursor = response.headers.get("X-Next-Cursor")
+                    pages += 1
+                results.append((size, statements, elapsed, pages))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with isolated_environment() as db_path:
+        prepare(db_path, args.sizes, args.items)
+        results = asyncio.run(measure(args.sizes, args.limit))
+
+    for size, statements, elapsed, pages in results:
+        print(f"{size:6d} orders: {statements} statements, first page {elapsed * 1000:.1f} ms, {pages} pages")
+    if len({statements for _, statements, _, _ in results}) != 1:
+        print("statement count depends on order count")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
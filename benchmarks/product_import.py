@@ -0,0 +1,105 @@
+"""Load a supplier feed through POST /admin/products/bulk versus POST /admin/products/.
+
+    python -m benchmarks.product_import --rows 200000 --single 500
+
+Streams a generated CSV feed (never held in memory) through the bulk endpoint
+twice: the first pass inserts every sku, the second updates them all. With
+--heap, the Python heap peak (tracemalloc, slows the run) should be the same for
+a feed ten times larger. Process RSS also counts SQLite's page cache and mmap,
+which grow with the database file up to SQLITE_CACHE_SIZE_KB + SQLITE_MMAP_SIZE.
+`--single` rows go through the one-product-per-request endpoint for comparison.
+"""
+import argparse
+import asyncio
+import random
+import resource
+import time
+import tracemalloc
+
+from benchmarks import datagen
+from benchmarks.harness import app_client, create_schema, isolated_environment, start_app, token_for
+
+HEADER = "sku,name,description,price,stock,category,image_url\n"
+CHUNK_ROWS = 500
+
+
+def memory_summary():
+    summary = f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB"
+    if tracemalloc.is_tracing():
+        summary += f", heap {tracemalloc.get_traced_memory()[1] / 2**20:.1f} MB"
+        tracemalloc.reset_peak()
+    return summary
+
+
+def feed_row(rng, n):
+    description = " ".join(datagen.pick_words(rng, 12))
+    return (
+        f"SKU-{n:08d},{' '.join(datagen.pick_words(rng, 3)).title()},\"{description}\","
+        f"{rng.uniform(10, 5000):.2f},{rng.randint(0, 500)},{rng.choice(datagen.CATEGORIES)},"
+        f"https://example.com/images/{n}.jpg\n"
+    )
+
+
+async def csv_feed(rows, seed):
+    rng = random.Random(seed)
+    yield HEADER.encode()
+    for start in range(0, rows, CHUNK_ROWS):
+        yield "".join(feed_row(rng, n) for n in range(start, min(start + CHUNK_ROWS, rows))).encode()
+
+
+def prepare(db_path):
+    from sqlalchemy import insert
+    from app.auth.models import User
+
+    engine = create_schema(db_path)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"name": "admin", "email": "admin@example.com", "hashed_password": "x", "role": "admin"}])
+    engine.dispose()
+
+
+async def measure(rows, single):
+    headers = {"Authorization": f"Bearer {token_for('admin@example.com', role='admin')}"}
+    async with app_client() as client:
+        client.timeout = None
+        for label, seed in (("insert", 1), ("update", 2)):
+            response = await client.post(
+                "/admin/products/bulk", content=csv_feed(rows, seed), headers={**headers, "Content-Type": "text/csv"},
+            )
+            response.raise_for_status()
+            report = response.json()
+            print(
+                f"bulk {label:7s} {report['rows']:8d} rows  {report['seconds']:7.2f}s  {report['rows_per_second']:9.1f} rows/s  "
+                f"inserted {report['inserted']} updated {report['updated']} failed {report['failed']}  "
+                f"{memory_summary()}"
+            )
+
+        if single:
+            rng = random.Random(3)
+            started = time.perf_counter()
+            for n in range(single):
+                response = await client.post("/admin/products/", headers=headers, json={
+                    "name": " ".join(datagen.pick_words(rng, 3)).title(), "description": "single",
+                    "price": 10.0, "stock": 1, "category": "Home", "image_url": "x",
+                })
+                response.raise_for_status()
+            elapsed = time.perf_counter() - started
+            print(f"single         {single:8d} rows  {elapsed:7.2f}s  {single / elapsed:9.1f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--single", type=int, default=500, help="rows to create one request at a time")
+    parser.add_argument("--heap", action="store_true", help="also report the Python heap peak per pass")
+    args = parser.parse_args()
+
+    with isolated_environment(LOG_LEVEL="WARNING", ACCESS_LOG="false") as db_path:
+        prepare(db_path)
+        start_app()
+        if args.heap:
+            tracemalloc.start()
+        asyncio.run(measure(args.rows, args.single))
+
+
+if __name__ == "__main__":
+    main()
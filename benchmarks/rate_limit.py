@@ -0,0 +1,195 @@
+"""Rate limits of the costly endpoints: what they cost, and what they protect.
+
+    python -m benchmarks.rate_limit --users 10 --attackers 20 --workers 2
+
+Three measurements, each in its own processes:
+  flood    --users clients, each from its own address, sign in --signins times while
+           --attackers connections from one address send wrong passwords for other
+           accounts as fast as they are answered, ignoring Retry-After. Run without
+           and with the limits: reports the users' signin latency, the 503s (hashing
+           pool full) and 429s they waited out, and how many attacker requests
+           reached bcrypt or were refused
+  cost     time per check of the in-process and the shared SQLite bucket store
+  workers  `python -m app.serve --workers N` with a 20 searches a minute limit: how
+           many of 3x that many searches, each on a new connection, get through with
+           per-worker buckets and with the shared store
+Exits non-zero if the shared store lets more than the limit through.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import app_client, create_schema, isolated_environment
+
+FLOOD_MODES = ("off", "on")
+STORES = ("memory", "sqlite")
+PASSWORD = "Passw0rd!"
+ATTACKER = "203.0.113.66"
+SEARCH_LIMIT = 20
+# Accounts the attacker guesses passwords of, apart from the measured users
+VICTIMS = 100
+
+
+def prepare(db_path, users):
+    from sqlalchemy import insert
+    from app.auth.models import User
+    from app.auth.utils import hash_password
+
+    engine = create_schema(db_path)
+    hashed = hash_password(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": name, "email": f"{name}@example.com", "hashed_password": hashed, "role": "user"}
+            for name in [f"user{i}" for i in range(users)] + [f"victim{i}" for i in range(VICTIMS)]
+        ])
+    engine.dispose()
+
+
+async def flood(users, attackers, signins):
+    latencies = []
+    counts = {"user_503": 0, "user_429": 0, "attacker_hashed": 0, "attacker_limited": 0, "attacker_503": 0}
+    done = asyncio.Event()
+
+    async with app_client() as client:
+        async def user(i):
+            headers = {"X-Forwarded-For": f"198.51.100.{i + 1}"}
+            body = {"email": f"user{i}@example.com", "password": PASSWORD}
+            for _ in range(signins):
+                started = time.perf_counter()
+                # Users wait as long as Retry-After asks before trying again
+                while (response := await client.post("/auth/signin", json=body, headers=headers)).status_code in (429, 503):
+                    counts[f"user_{response.status_code}"] += 1
+                    await asyncio.sleep(float(response.headers["Retry-After"]))
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        async def attacker(i):
+            headers = {"X-Forwarded-For": ATTACKER}
+            n = 0
+            while not done.is_set():
+                n += 1
+                body = {"email": f"victim{(i + n) % VICTIMS}@example.com", "password": f"guess{n}"}
+                status = (await client.post("/auth/signin", json=body, headers=headers)).status_code
+                if status == 429:
+                    counts["attacker_limited"] += 1
+                    # Retry-After ignored: only a pause for the event loop
+                    await asyncio.sleep(0.001)
+                elif status == 503:
+                    counts["attacker_503"] += 1
+                else:
+                    counts["attacker_hashed"] += 1
+
+        attacks = [asyncio.create_task(attacker(i)) for i in range(attackers)]
+        await asyncio.sleep(0.5)
+        started = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(users)))
+        wall = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*attacks)
+
+    latencies.sort()
+    total = len(latencies)
+    return {
+        "wall": wall,
+        "p50": latencies[total // 2],
+        "p95": latencies[min(total - 1, int(total * 0.95))],
+        **counts,
+    }
+
+
+async def time_checks(checks, keys):
+    from app.core import rate_limit
+
+    route = "GET /products/search"
+    rate_limit.RULES[route] = [rate_limit.Limit("ip", 10 ** 9, 60)]
+    await rate_limit.check(route, {"ip": "warm-up"})
+    started = time.perf_counter()
+    for i in range(checks):
+        await rate_limit.check(route, {"ip": f"10.0.{i % keys // 256}.{i % 256}"})
+    return (time.perf_counter() - started) / checks
+
+
+def child(mode, args):
+    import logging
+
+    if mode in FLOOD_MODES:
+        # One /24 of users and one attacker address, told apart through X-Forwarded-For
+        env = {"RATE_LIMIT_ENABLED": str(mode == "on").lower(), "RATE_LIMIT_TRUST_FORWARDED": "true",
+               "BCRYPT_ROUNDS": args.rounds}
+        with isolated_environment(LOG_LEVEL="WARNING", ACCESS_LOG="false", METRICS_ENABLED="false", **env) as db_path:
+            prepare(db_path, args.users)
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+            print(json.dumps(asyncio.run(flood(args.users, args.attackers, args.signins))))
+    else:
+        store = mode.split("-", 1)[1]
+        with isolated_environment(LOG_LEVEL="WARNING", RATE_LIMIT_STORE=store):
+            print(json.dumps({"seconds": asyncio.run(time_checks(args.checks, args.keys))}))
+
+
+def run_child(mode, args) -> dict:
+    command = [sys.executable, "-m", "benchmarks.rate_limit", "--mode", mode, "--users", str(args.users),
+               "--attackers", str(args.attackers), "--signins", str(args.signins), "--rounds", str(args.rounds),
+               "--checks", str(args.checks), "--keys", str(args.keys)]
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def searches_through(workers, store, requests) -> int:
+    # Every search opens its own connection, so they are spread over the workers
+    import httpx
+    from benchmarks.serve import Server
+
+    env = {"RATE_LIMIT_ENABLED": "true", "RATE_LIMIT_STORE": store,
+           "RATE_LIMIT_RULES": f"GET /products/search=ip:{SEARCH_LIMIT}/60", "CACHE_WARMUP": "false"}
+    with Server(workers, **env) as server:
+        statuses = [
+            httpx.get(f"{server.url}/products/search", params={"keyword": "shoe"}, headers={"Connection": "close"}).status_code
+            for _ in range(requests)
+        ]
+    return statuses.count(200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="legitimate clients signing in")
+    parser.add_argument("--attackers", type=int, default=20, help="concurrent connections of the abusive client")
+    parser.add_argument("--signins", type=int, default=3, help="signins per user")
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost of the users' hashes and of the app")
+    parser.add_argument("--checks", type=int, default=20000, help="checks timed per store")
+    parser.add_argument("--keys", type=int, default=1000, help="distinct addresses the timed checks cycle through")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--mode", choices=FLOOD_MODES + tuple(f"cost-{store}" for store in STORES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args)
+        return
+
+    print(f"flood: {args.users} users x {args.signins} signins, {args.attackers} attacker connections, bcrypt cost {args.rounds}")
+    print(f"  {'limits':6s} {'users done':>10s} {'p50':>9s} {'p95':>9s} {'user 503s':>9s} {'user 429s':>9s} "
+          f"{'attacks hashed':>14s} {'attacks 429':>11s} {'attacks 503':>11s}")
+    for mode in FLOOD_MODES:
+        r = run_child(mode, args)
+        print(f"  {mode:6s} {r['wall']:9.1f}s {r['p50'] * 1000:7.0f}ms {r['p95'] * 1000:7.0f}ms {r['user_503']:9d} {r['user_429']:9d} "
+              f"{r['attacker_hashed']:14d} {r['attacker_limited']:11d} {r['attacker_503']:11d}")
+
+    print(f"\ncost per check over {args.keys:,} addresses")
+    for store in STORES:
+        print(f"  {store:6s} {run_child(f'cost-{store}', args)['seconds'] * 1e6:8.1f}us")
+
+    requests = SEARCH_LIMIT * 3
+    print(f"\nworkers: {requests} searches against a limit of {SEARCH_LIMIT} a minute, {args.workers} workers")
+    with isolated_environment(LOG_LEVEL="INFO") as db_path:
+        create_schema(db_path).dispose()
+        through = {store: searches_through(args.workers, store, requests) for store in STORES}
+    for store in STORES:
+        print(f"  {store:6s} {through[store]:3d} answered")
+    if through["sqlite"] > SEARCH_LIMIT:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
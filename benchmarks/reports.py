@@ -0,0 +1,264 @@
+"""Admin sales reports from the rollups against the same reports aggregated from the order tables.
+
+    python -m benchmarks.reports                      # 10M order items
+    python -m benchmarks.reports --items 1000000 --repeat 5
+
+Fills a database with --items order lines, --lines per order over --days days and
+--products products, 80% of the orders paid. Then:
+
+* times `python -m app.reports` (rollups.rebuild) while a writer places an order
+  every --interval seconds the way checkout does, reports the writer's longest wait,
+  and checks the rollups against the order tables afterwards;
+* times the writer's transactions with and without the rollup upserts, the cost
+  checkout pays for them;
+* times each report: GET /admin/reports/daily (last 30 days), /products (first
+  page of 100) and /top-sellers, against the GROUP BY queries that would compute
+  them from orders and order_items. Raw times are the bare queries, without the
+  HTTP and JSON work the endpoint times include.
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.harness import app_client, isolated_environment, start_app, token_for
+
+ADMIN_EMAIL = "reports-admin@example.com"
+
+
+def fill(items, lines, products, days):
+    from sqlalchemy import text
+    from app.core.database import engine
+
+    orders = items // lines
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (name, email, hashed_password, role) VALUES ('admin', :email, 'x', 'admin')"),
+                      {"email": ADMIN_EMAIL})
+        conn.execute(text("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :products)
+            INSERT INTO products (id, name, description, price, stock, category, image_url)
+            SELECT i, 'Product ' || i, '', 10 + (i * 7919) % 4990, 1000000, 'Bench', '' FROM n
+        """), {"products": products})
+        # Order i was placed i % days days ago, at a time of day spread over the day
+        conn.execute(text("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :orders)
+            INSERT INTO orders (id, user_id, total_amount, status, created_at)
+            SELECT i, 1, 0,
+                   CASE WHEN (i / :days) % 10 < 8 THEN 'PAID' WHEN (i / :days) % 10 = 8 THEN 'PENDING' ELSE 'CANCELLED' END,
+                   datetime('now', 'start of day', '-' || (i % :days) || ' days', '+' || (i * 7 % 86400) || ' seconds')
+            FROM n
+        """), {"orders": orders, "days": days})
+        # Popular products come up more often: the product of two spread-out factors skews
+        # picks towards low ids. No random(): SQLite may evaluate product_id more than once.
+        conn.execute(text("""
+            WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < :items - 1),
+            lines AS (
+                SELECT i, 1 + i / :lines AS order_id,
+                       1 + ((i * 7919 % 1009) * (i * 104729 % 1013) * :products) / (1009 * 1013) AS product_id
+                FROM n
+            )
+            INSERT INTO order_items (order_id, product_id, product_name, quantity, price_at_purchase)
+            SELECT lines.order_id, products.id, products.name, 1 + lines.i % 3, products.price
+            FROM lines JOIN products ON products.id = lines.product_id
+        """), {"items": orders * lines, "lines": lines, "products": products})
+        conn.execute(text("""
+            UPDATE orders SET total_amount = (
+                SELECT sum(quantity * price_at_purchase) FROM order_items WHERE order_items.order_id = orders.id
+            )
+        """))
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return orders
+
+
+class Writer(threading.Thread):
+    """Places an order every `interval` seconds: the order, its lines and, when
+    `rollups` is set, the rollup upserts, in one transaction timed as a whole."""
+
+    def __init__(self, interval, products, rollups=True):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.products = products
+        self.rollups = rollups
+        self.latencies = []
+        self.stopped = threading.Event()
+
+    def place(self, session, n):
+        from sqlalchemy import insert, select
+        from app.orders.models import Order, OrderItem, OrderStatus
+        from app.products.models import Product
+        from app.reports import rollups
+
+        catalog = Product.__table__
+        quantities = {1 + (n * 37 + k * 101) % self.products: 1 + k for k in range(3)}
+        products = {row.id: row for row in session.execute(
+            select(catalog.c.id, catalog.c.name, catalog.c.price).where(catalog.c.id.in_(quantities))
+        )}
+        total = sum(quantity * products[product_id].price for product_id, quantity in quantities.items())
+        placed_at = datetime.now(timezone.utc)
+        orders = Order.__table__
+        order_id = session.scalar(
+            insert(orders).values(user_id=1, total_amount=total, status=OrderStatus.PAID, created_at=placed_at)
+            .returning(orders.c.id)
+        )
+        session.execute(insert(OrderItem.__table__), [
+            {"order_id": order_id, "product_id": product_id, "product_name": products[product_id].name,
+             "quantity": quantity, "price_at_purchase": products[product_id].price}
+            for product_id, quantity in quantities.items()
+        ])
+        if self.rollups:
+            rollups.record_orders(session, [(placed_at.date(), quantities, products, total)])
+        session.commit()
+
+    def run(self):
+        from app.core.database import SessionLocal
+
+        n = 0
+        with SessionLocal() as session:
+            while not self.stopped.is_set():
+                started = time.perf_counter()
+                self.place(session, n)
+                self.latencies.append(time.perf_counter() - started)
+                n += 1
+                time.sleep(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        latencies = sorted(self.latencies)
+        total = len(latencies)
+        return {
+            "writes": total,
+            "p50": latencies[total // 2],
+            "p99": latencies[min(total - 1, int(total * 0.99))],
+            "max": latencies[-1],
+        }
+
+
+def verify():
+    # The rollups must equal the order tables, orders placed during the rebuild included
+    from sqlalchemy import func, select
+    from app.core.database import engine
+    from app.reports import rollups
+    from app.reports.models import DailySales, ProductSales
+
+    def totals(conn, query):
+        query = query.subquery()
+        return conn.execute(select(func.count(), func.sum(query.c.orders), func.sum(query.c.units), func.sum(query.c.revenue))).one()
+
+    with engine.connect() as conn:
+        pairs = [
+            (totals(conn, select(DailySales.__table__)), totals(conn, rollups.daily_totals())),
+            (totals(conn, select(ProductSales.__table__)), totals(conn, rollups.product_totals())),
+        ]
+    # Revenue is summed in another order by each side, so it may differ in the last float digits
+    return all(kept[:3] == computed[:3] and abs(kept[3] - computed[3]) < 1e-6 * computed[3] for kept, computed in pairs)
+
+
+def raw_reports():
+    # The statements each report would run without the rollups
+    from app.orders.models import Order
+    from app.reports import rollups
+
+    since = (datetime.now(timezone.utc) - timedelta(days=29)).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    products = rollups.product_totals().subquery()
+    return {
+        "daily": rollups.daily_totals(Order.__table__.c.created_at >= since),
+        "products": rollups.product_totals().order_by("product_id").limit(100),
+        "top-sellers": products.select().order_by(products.c.units.desc(), products.c.product_id.desc()).limit(10),
+    }
+
+
+def time_raw(repeat):
+    from app.core.database import engine
+
+    results = {}
+    for name, query in raw_reports().items():
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            with engine.connect() as conn:
+                conn.execute(query).all()
+            runs.append(time.perf_counter() - started)
+        results[name] = statistics.median(runs)
+    return results
+
+
+async def time_endpoints(repeat):
+    headers = {"Authorization": f"Bearer {token_for(ADMIN_EMAIL, role='admin')}"}
+    results = {}
+    async with app_client() as client:
+        for name in ("daily", "products", "top-sellers"):
+            response = await client.get(f"/admin/reports/{name}", headers=headers)
+            response.raise_for_status()
+            runs = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await client.get(f"/admin/reports/{name}", headers=headers)
+                runs.append(time.perf_counter() - started)
+            results[name] = statistics.median(runs)
+    return results
+
+
+def writer_cost(products, interval, count):
+    # Same orders with and without the rollup upserts, alternating so both see the same database
+    costs = {}
+    for rollups in (False, True, False, True):
+        writer = Writer(interval, products, rollups=rollups)
+        writer.start()
+        while len(writer.latencies) < count:
+            time.sleep(0.05)
+        costs.setdefault(rollups, []).append(writer.stop()["p50"])
+    return min(costs[False]), min(costs[True])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10_000_000, help="order items")
+    parser.add_argument("--lines", type=int, default=4, help="items per order")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=730, help="days of order history")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each raw query (the median is shown)")
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between the writer's orders")
+    args = parser.parse_args()
+
+    # The raw reports are slow on purpose: keep them out of the slow query log
+    with isolated_environment(LOG_LEVEL="WARNING", MAINTENANCE_ENABLED="false", SLOW_QUERY_MS=10 ** 7):
+        from app.core.database import engine
+        from app.reports import rollups
+
+        start_app()
+        started = time.perf_counter()
+        orders = fill(args.items, args.lines, args.products, args.days)
+        print(f"{orders:,} orders, {orders * args.lines:,} order items, {args.products:,} products over {args.days} days "
+              f"(filled in {time.perf_counter() - started:.0f}s)")
+
+        writer = Writer(args.interval, args.products)
+        writer.start()
+        time.sleep(0.2)
+        started = time.perf_counter()
+        days, sold = rollups.rebuild(engine)
+        rebuilt = time.perf_counter() - started
+        time.sleep(0.2)
+        w = writer.stop()
+        print(f"\nbackfill (python -m app.reports): {rebuilt:.1f}s for {days} days and {sold:,} products")
+        print(f"  concurrent writer: {w['writes']} orders, p50 {w['p50'] * 1000:.1f}ms, p99 {w['p99'] * 1000:.1f}ms, "
+              f"max {w['max'] * 1000:.0f}ms")
+        print(f"  rollups match the order tables: {'yes' if verify() else 'NO'}")
+
+        without, with_rollups = writer_cost(args.products, args.interval, 500)
+        print(f"\norder transaction p50: {without * 1000:.2f}ms without rollups, {with_rollups * 1000:.2f}ms with "
+              f"(+{(with_rollups - without) * 1000:.2f}ms)")
+
+        raw = time_raw(args.repeat)
+        fast = asyncio.run(time_endpoints(max(args.repeat, 20)))
+        print(f"\n  {'report':14s} {'GROUP BY':>12s} {'rollups':>12s} {'speedup':>9s}")
+        for name in raw:
+            print(f"  {name:14s} {raw[name] * 1000:10.1f}ms {fast[name] * 1000:10.2f}ms {raw[name] / fast[name]:8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Requests/sec for a cached endpoint with logging off, queued, and blocking.
+
+    python -m benchmarks.request_logging --requests 5000 --concurrency 50
+
+Each mode runs in its own process because logging is configured at import:
+  off       LOG_LEVEL=WARNING and ACCESS_LOG=false
+  queued    the default setup, handlers behind a bounded QueueHandler
+  blocking  the same handlers attached directly, as before the queue
+Log output goes to the temp dir's logs/app.log and to a discarded stderr, both
+cheap. --sink-delay adds a sleep to every handler write to stand in for a slow
+disk, a full pipe or a remote log shipper; that is the cost the queue keeps off
+the request path. On a single core with a fast sink the queue's thread handoff
+can cost more than it saves.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import app_client, create_schema, isolated_environment, start_app
+
+MODES = {
+    "off": {"LOG_LEVEL": "WARNING", "ACCESS_LOG": "false"},
+    "queued": {},
+    "blocking": {},
+}
+
+
+def prepare(db_path):
+    from sqlalchemy import insert
+    from app.products.models import Product
+
+    engine = create_schema(db_path)
+    with engine.begin() as conn:
+        conn.execute(insert(Product), [
+            {"name": "Desk Lamp", "description": "lamp", "price": 25.0, "stock": 10, "category": "Home", "image_url": "x"}
+        ])
+    engine.dispose()
+
+
+def slow_down_handlers(delay):
+    from app.core import logging_setup
+
+    for handler in logging_setup._listener.handlers:
+        emit = handler.emit
+
+        def slow_emit(record, emit=emit):
+            time.sleep(delay)
+            emit(record)
+        handler.emit = slow_emit
+
+
+def attach_handlers_directly():
+    import logging
+    from app.core import logging_setup
+
+    root = logging.getLogger()
+    root.handlers = list(logging_setup._listener.handlers)
+    for handler in root.handlers:
+        handler.addFilter(logging_setup.RequestIdFilter())
+
+
+async def fire(requests, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    async with app_client() as client:
+        async def get():
+            async with limit:
+                response = await client.get("/products/1")
+            response.raise_for_status()
+
+        await get()  # warm the product cache
+        started = time.perf_counter()
+        await asyncio.gather(*(get() for _ in range(requests)))
+        return time.perf_counter() - started
+
+
+def child(mode, requests, concurrency, sink_delay):
+    import logging
+
+    with isolated_environment(**MODES[mode]) as db_path:
+        prepare(db_path)
+        from app.core.logging_setup import logging_stats
+        start_app()
+
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        if sink_delay:
+            slow_down_handlers(sink_delay / 1000)
+        if mode == "blocking":
+            attach_handlers_directly()
+        elapsed = asyncio.run(fire(requests, concurrency))
+        print(json.dumps({"rps": requests / elapsed, **logging_stats()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sink-delay", type=float, default=0, help="milliseconds added to every log write")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args.requests, args.concurrency, args.sink_delay)
+        return
+
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.request_logging", "--mode", mode,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+             "--sink-delay", str(args.sink_delay)],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:9s} {result['rps']:7.0f} req/s  (queued {result['queued']}, dropped {result['dropped']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""User flows driven by benchmarks.loadtest.
+
+Each scenario is one visit by a random user. Requests are recorded under their
+route template ("GET /products/{id}") so they line up with the app's metrics.
+"""
+import random
+import time
+
+from benchmarks import datagen
+from benchmarks.harness import token_for
+
+
+class Visit:
+    def __init__(self, client, recorder, rng, sizes, user_id):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.sizes = sizes
+        self.headers = {"Authorization": f"Bearer {token_for(datagen.user_email(user_id))}"}
+
+    async def request(self, method, url, label, **kw):
+        started = time.perf_counter()
+        response = await self.client.request(method, url, headers=self.headers, **kw)
+        self.recorder.record(f"{method} {label}", time.perf_counter() - started, response.status_code)
+        return response
+
+    def product_id(self):
+        return self.rng.randint(1, self.sizes["products"])
+
+    def keyword(self):
+        return " ".join(datagen.pick_words(self.rng, self.rng.choice((1, 1, 2))))
+
+
+async def browse(visit):
+    params = {"page_size": 20, "sort_by": visit.rng.choice(["price", "name"])}
+    if visit.rng.random() < 0.7:
+        params["category"] = visit.rng.choice(datagen.CATEGORIES)
+    if visit.rng.random() < 0.3:
+        params["min_price"] = visit.rng.choice([50, 500, 1000])
+    response = await visit.request("GET", "/products/", "/products/", params=params)
+    for _ in range(visit.rng.randint(0, 2)):
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        response = await visit.request("GET", "/products/", "/products/", params={**params, "cursor": cursor})
+    for _ in range(2):
+        await visit.request("GET", f"/products/{visit.product_id()}", "/products/{id}")
+
+
+async def search(visit):
+    params = {"keyword": visit.keyword(), "page_size": 20}
+    await visit.request("GET", "/products/search", "/products/search", params=params)
+    if visit.rng.random() < 0.3:
+        await visit.request("GET", "/products/search", "/products/search", params={**params, "page": 2})
+
+
+async def cart(visit):
+    added = [visit.product_id() for _ in range(2)]
+    for product_id in added:
+        await visit.request("POST", "/cart/", "/cart/", json={"product_id": product_id, "quantity": 1})
+    await visit.request("GET", "/cart/", "/cart/")
+    await visit.request("PUT", f"/cart/{added[0]}", "/cart/{product_id}", json={"quantity": 2})
+    await visit.request("DELETE", f"/cart/{added[1]}", "/cart/{product_id}")
+
+
+async def checkout(visit):
+    for _ in range(visit.rng.randint(1, 2)):
+        await visit.request("POST", "/cart/", "/cart/", json={"product_id": visit.product_id(), "quantity": 1})
+    await visit.request("POST", "/checkout/", "/checkout/")
+
+
+async def order_history(visit):
+    response = await visit.request("GET", "/orders/", "/orders/", params={"limit": 20})
+    cursor = response.headers.get("X-Next-Cursor")
+    if cursor:
+        await visit.request("GET", "/orders/", "/orders/", params={"limit": 20, "cursor": cursor})
+    orders = response.json() if response.status_code == 200 else []
+    if orders:
+        await visit.request("GET", f"/orders/{orders[0]['id']}", "/orders/{order_id}")
+
+
+SCENARIOS = {
+    "browse": browse,
+    "search": search,
+    "cart": cart,
+    "checkout": checkout,
+    "order_history": order_history,
+}
+
+
+def pick_user(rng, scenario, users):
+    # Order history is most interesting for the heavy buyers datagen skews towards
+    if scenario == "order_history":
+        return datagen.skewed_user(rng, users)
+    return rng.randint(1, users)
+
+
+def new_rng(seed, scenario, worker):
+    return random.Random(f"{seed}:{scenario}:{worker}")
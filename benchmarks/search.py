@@ -0,0 +1,92 @@
+"""Compare the FTS5 product search against the legacy LIKE scan.
+
+    python -m benchmarks.search --products 200000 --repeat 20
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, or_, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.auth import models as auth_models  # noqa: F401  (register tables)
+from app.cart import models as cart_models  # noqa: F401
+from app.orders import models as order_models  # noqa: F401
+from app.products.models import Product
+from app.products import search
+from benchmarks import datagen
+
+KEYWORDS = ["mouse", "wireless mouse", "smart watch charger", "kavin", "lamp tirex", "no such thing"]
+
+
+def fill_catalog(engine, count):
+    with engine.begin() as conn:
+        datagen.fill_products(conn, count, random.Random(42))
+
+
+def legacy_search(db, keyword, limit, offset=0):
+    # The pre-FTS endpoint: single LIKE pair, no ranking, no limit
+    keyword = keyword.lower()
+    return db.scalars(select(Product).where(
+        or_(
+            func.lower(Product.name).like(f"%{keyword}%"),
+            func.lower(Product.description).like(f"%{keyword}%")
+        )
+    )).all()
+
+
+def like_search(db, keyword, limit, offset=0):
+    return db.scalars(search.like_statement(search.search_terms(keyword), limit, offset)).all()
+
+
+def fts_search(db, keyword, limit, offset=0):
+    return db.scalars(search.fts_statement(search.search_terms(keyword), limit, offset)).all()
+
+
+def timed(fn, db, keyword, repeat, page_size):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(db, keyword, limit=page_size, offset=0)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        search.ensure_search_index(engine)
+
+        started = time.perf_counter()
+        fill_catalog(engine, args.products)
+        print(f"Seeded {args.products} products in {time.perf_counter() - started:.1f}s")
+
+        paths = (
+            ("legacy", legacy_search),
+            ("like", like_search),
+            ("fts5", fts_search),
+        )
+        db = sessionmaker(bind=engine)()
+        try:
+            print(f"{'keyword':22}" + "".join(f"{label:>12}" for label, _ in paths) + "   (p50 ms)")
+            for keyword in KEYWORDS:
+                row = [timed(fn, db, keyword, args.repeat, args.page_size) for _, fn in paths]
+                print(f"{keyword:22}" + "".join(f"{ms:12.2f}" for ms in row))
+        finally:
+            db.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
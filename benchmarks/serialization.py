@@ -0,0 +1,131 @@
+"""CPU time per page of the list endpoints with and without FAST_JSON.
+
+    python -m benchmarks.serialization --requests 200
+
+Runs each mode in its own process (FAST_JSON is read at import) against the same
+generated data: 100-row pages of GET /products, /products/search and
+/admin/products, 100 orders of 3 items from GET /orders and a 100-line cart from
+GET /cart. The product cache is off so every request builds its page. Also checks
+that both modes return the same bodies.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import app_client, create_schema, isolated_environment, token_for
+
+MODES = {"orm": "false", "fast": "true"}
+PAGE = 100
+
+ENDPOINTS = [
+    ("GET /products", "/products/", {"page_size": PAGE, "sort_by": "price"}, "user"),
+    ("GET /products/search", "/products/search", {"keyword": "wireless", "page_size": PAGE}, "user"),
+    ("GET /admin/products", "/admin/products/", {"limit": PAGE}, "admin"),
+    ("GET /orders", "/orders/", {"limit": PAGE}, "user"),
+    ("GET /cart", "/cart/", {}, "user"),
+]
+
+
+def prepare(db_path, products):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from app.auth.models import User
+    from app.cart.models import CartItem
+    from app.orders.models import Order, OrderItem, OrderStatus
+    from benchmarks.datagen import fill_products
+
+    engine = create_schema(db_path)
+    with engine.begin() as conn:
+        fill_products(conn, products, random.Random(42))
+        conn.execute(insert(User), [
+            {"name": "shopper", "email": "shopper@example.com", "hashed_password": "x", "role": "user"},
+            {"name": "admin", "email": "admin@example.com", "hashed_password": "x", "role": "admin"},
+        ])
+        conn.execute(insert(CartItem), [{"user_id": 1, "product_id": i, "quantity": 2} for i in range(1, PAGE + 1)])
+        started = datetime(2026, 1, 1)
+        conn.execute(insert(Order), [
+            {"user_id": 1, "total_amount": 30.0 + i, "status": OrderStatus.PAID, "created_at": started + timedelta(minutes=i)}
+            for i in range(PAGE)
+        ])
+        conn.execute(insert(OrderItem), [
+            {"order_id": order_id, "product_id": order_id * 3 + k, "product_name": f"Item {k}", "quantity": k + 1, "price_at_purchase": 10.0 * (k + 1)}
+            for order_id in range(1, PAGE + 1) for k in range(3)
+        ])
+    engine.dispose()
+
+
+async def measure(requests):
+    headers = {
+        "user": {"Authorization": f"Bearer {token_for('shopper@example.com')}"},
+        "admin": {"Authorization": f"Bearer {token_for('admin@example.com', 'admin')}"},
+    }
+    results = {}
+    async with app_client() as client:
+        for name, path, params, role in ENDPOINTS:
+            # Warm-up: principal cache, statement cache, first-call imports
+            response = await client.get(path, params=params, headers=headers[role])
+            response.raise_for_status()
+            cpu, loop_cpu, wall = time.process_time(), time.thread_time(), time.perf_counter()
+            for _ in range(requests):
+                await client.get(path, params=params, headers=headers[role])
+            results[name] = {
+                "cpu": (time.process_time() - cpu) / requests,
+                "loop_cpu": (time.thread_time() - loop_cpu) / requests,
+                "wall": (time.perf_counter() - wall) / requests,
+                "rows": len(response.json()),
+                "digest": hashlib.sha1(response.content).hexdigest(),
+            }
+    return results
+
+
+def child(mode, args):
+    import logging
+
+    env = {"FAST_JSON": MODES[mode], "PRODUCT_CACHE_SIZE": 0, "LOG_LEVEL": "WARNING", "ACCESS_LOG": "false", "METRICS_ENABLED": "false"}
+    with isolated_environment(**env) as db_path:
+        prepare(db_path, args.products)
+        import app.main  # noqa: F401
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        print(json.dumps(asyncio.run(measure(args.requests))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args)
+        return
+
+    results = {}
+    for mode in MODES:
+        command = [sys.executable, "-m", "benchmarks.serialization", "--mode", mode,
+                   "--products", str(args.products), "--requests", str(args.requests)]
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    same = True
+    print("CPU ms per page: event loop thread (routing, ORM, validation, encoding) and whole process")
+    print(f"{'endpoint':22s} {'rows':>5s} {'loop orm':>9s} {'loop fast':>9s} {'saved':>6s} {'proc orm':>9s} {'proc fast':>9s} {'saved':>6s}")
+    for name, *_ in ENDPOINTS:
+        orm, fast = results["orm"][name], results["fast"][name]
+        same = same and orm["digest"] == fast["digest"]
+        print(
+            f"{name:22s} {fast['rows']:5d} {orm['loop_cpu'] * 1000:9.2f} {fast['loop_cpu'] * 1000:9.2f} "
+            f"{1 - fast['loop_cpu'] / orm['loop_cpu']:6.0%} {orm['cpu'] * 1000:9.2f} {fast['cpu'] * 1000:9.2f} "
+            f"{1 - fast['cpu'] / orm['cpu']:6.0%}{'' if orm['digest'] == fast['digest'] else '  DIFFERENT BODY'}"
+        )
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Startup time of the app, and throughput of `python -m app.serve` by worker count.
+
+    python -m benchmarks.serve --products 100000 --workers 1 2 4 --seconds 10
+
+Generates a catalog once, then measures:
+  startup       importing app.main; preparing a database on its first start (search
+                index and facet counts built) and on every later start; how long
+                app.serve takes until it answers and until all its workers are ready,
+                with and without cache warm-up
+  scaling       requests/s of uncached product listings and detail pages for each
+                worker count, driven over HTTP by --clients client processes
+  invalidation  with the product cache on, a price update made through one worker
+                must be visible through every worker on the next read
+Server and clients share the machine, so throughput can only grow while there are
+idle cores; the report starts with the core count. Exits non-zero if a worker
+serves a stale price after the update.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import create_schema, isolated_environment, token_for
+
+# Subprocesses run in the isolated directory, so they find the code through PYTHONPATH
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def subprocess_env(**env):
+    paths = [ROOT] + [path for path in os.environ.get("PYTHONPATH", "").split(os.pathsep) if path]
+    return {**os.environ, "PYTHONPATH": os.pathsep.join(paths), **{key: str(value) for key, value in env.items()}}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare(db_path, products):
+    from sqlalchemy import insert
+    from app.auth.models import User
+    from benchmarks.datagen import fill_products
+
+    engine = create_schema(db_path)
+    with engine.begin() as conn:
+        fill_products(conn, products, random.Random(42))
+        conn.execute(insert(User), [{"name": "admin", "email": "admin@example.com", "hashed_password": "x", "role": "admin"}])
+    engine.dispose()
+
+
+def child(mode):
+    # Runs in a fresh interpreter in the isolated environment of the parent
+    if mode == "import":
+        started = time.perf_counter()
+        import app.main  # noqa: F401
+        print(json.dumps({"seconds": time.perf_counter() - started}))
+    elif mode == "prepare":
+        from app.main import prepare_database
+        started = time.perf_counter()
+        prepare_database()
+        print(json.dumps({"seconds": time.perf_counter() - started}))
+
+
+def run_child(mode) -> float:
+    command = [sys.executable, "-m", "benchmarks.serve", "--mode", mode]
+    output = subprocess.run(
+        command, env=subprocess_env(), check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])["seconds"]
+
+
+class Server:
+    """`python -m app.serve` in the current (isolated) directory, with a fresh log file."""
+
+    def __init__(self, workers, **env):
+        self.workers = workers
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = subprocess_env(ACCESS_LOG="false", **env)
+
+    def __enter__(self):
+        import httpx
+
+        if os.path.exists("logs/app.log"):
+            os.remove("logs/app.log")
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "app.serve", "--workers", str(self.workers), "--port", str(self.port)],
+            env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self.first_response = self.all_ready = None
+        deadline = time.perf_counter() + 120
+        while self.all_ready is None:
+            if time.perf_counter() > deadline or self.process.poll() is not None:
+                self.__exit__()
+                raise RuntimeError(f"app.serve with {self.workers} workers did not start")
+            if self.first_response is None:
+                try:
+                    httpx.get(self.url + "/", timeout=1).raise_for_status()
+                    self.first_response = time.perf_counter() - self.started
+                except httpx.HTTPError:
+                    pass
+            if self.first_response is not None and self.ready_workers() >= self.workers:
+                self.all_ready = time.perf_counter() - self.started
+            time.sleep(0.01)
+        return self
+
+    def ready_workers(self) -> int:
+        try:
+            with open("logs/app.log") as f:
+                return sum(" ready in " in line for line in f)
+        except OSError:
+            return 0
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+async def drive(url, products, seconds, concurrency):
+    import httpx
+
+    rng = random.Random(os.getpid())
+    counts = {"requests": 0, "errors": 0}
+    deadline = time.perf_counter() + seconds
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                if rng.random() < 0.5:
+                    path, params = "/products/", {"page": rng.randint(1, 50), "page_size": 20, "sort_by": "price"}
+                else:
+                    path, params = f"/products/{rng.randint(1, products)}", {}
+                response = await client.get(path, params=params)
+                counts["requests"] += 1
+                counts["errors"] += response.status_code != 200
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return counts
+
+
+def throughput(url, args) -> dict:
+    command = [sys.executable, "-m", "benchmarks.serve", "--mode", "client", "--url", url, "--products", str(args.products),
+               "--seconds", str(args.seconds), "--concurrency", str(args.concurrency)]
+    clients = [
+        subprocess.Popen(command, env=subprocess_env(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(args.clients)
+    ]
+    results = [json.loads(client.communicate()[0].strip().splitlines()[-1]) for client in clients]
+    requests = sum(result["requests"] for result in results)
+    return {"rps": requests / args.seconds, "errors": sum(result["errors"] for result in results)}
+
+
+def check_invalidation(url, reads) -> tuple[int, int]:
+    # Every read opens its own connection, so the reads are spread over the workers
+    import httpx
+
+    admin = {"Authorization": f"Bearer {token_for('admin@example.com', 'admin')}"}
+    close = {"Connection": "close"}
+    for _ in range(reads):
+        httpx.get(f"{url}/products/1", headers=close).raise_for_status()
+    price = httpx.get(f"{url}/products/1", headers=close).json()["price"] + 1
+    httpx.put(f"{url}/admin/products/1", json={"price": price}, headers={**admin, **close}).raise_for_status()
+    stale = sum(httpx.get(f"{url}/products/1", headers=close).json()["price"] != price for _ in range(reads))
+    return stale, reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=max(2, os.cpu_count() or 1), help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per client process")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--reads", type=int, default=50, help="reads before and after the update in the invalidation check")
+    parser.add_argument("--mode", choices=("import", "prepare", "client"), help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode == "client":
+        print(json.dumps(asyncio.run(drive(args.url, args.products, args.seconds, args.concurrency))))
+        return
+    if args.mode:
+        child(args.mode)
+        return
+
+    print(f"{os.cpu_count()} cores, {args.products:,} products")
+    with isolated_environment(LOG_LEVEL="INFO") as db_path:
+        prepare(db_path, args.products)
+        pristine = db_path + ".pristine"
+        shutil.copyfile(db_path, pristine)
+
+        print("\nstartup")
+        imports = statistics.median(run_child("import") for _ in range(3))
+        print(f"  import app.main                 {imports * 1000:8.0f}ms")
+        print(f"  prepare database, first start   {run_child('prepare') * 1000:8.0f}ms")
+        prepared = statistics.median(run_child("prepare") for _ in range(3))
+        print(f"  prepare database, later starts  {prepared * 1000:8.0f}ms")
+        print(f"  {'app.serve':14s} {'warm-up':>8s} {'first response':>15s} {'all workers ready':>18s}")
+        for workers in args.workers:
+            for warmup in ("false", "true"):
+                with Server(workers, CACHE_WARMUP=warmup) as server:
+                    pass
+                print(f"  {workers:2d} workers     {warmup:>8s} {server.first_response * 1000:13.0f}ms "
+                      f"{server.all_ready * 1000:16.0f}ms")
+
+        print("\nscaling: uncached listings and detail pages")
+        print(f"  {'workers':>7s} {'req/s':>9s} {'vs 1':>6s} {'errors':>7s}")
+        base = None
+        for workers in args.workers:
+            with Server(workers, PRODUCT_CACHE_SIZE=0) as server:
+                result = throughput(server.url, args)
+            base = base or result["rps"]
+            print(f"  {workers:7d} {result['rps']:9.0f} {result['rps'] / base:5.2f}x {result['errors']:7d}")
+
+        workers = max(args.workers)
+        shutil.copyfile(pristine, db_path)
+        with Server(workers) as server:
+            stale, reads = check_invalidation(server.url, args.reads)
+        print(f"\ninvalidation: {stale} of {reads} reads through {workers} workers served the old price after the update")
+    if stale:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Concurrent cart writes, checkouts and cart reads under different SQLite journal modes.
+
+    python -m benchmarks.write_contention --users 200 --concurrency 50
+
+Every user adds a few products to their cart, reads it back and checks out, all
+users at once. Each mode runs in its own process with a fresh database:
+  delete/full    SQLite's defaults (rollback journal), the previous behaviour
+  wal/full       WAL with fully synced commits
+  wal/normal     WAL with synchronous=NORMAL, the new default
+Errors are requests that failed with 5xx (typically "database is locked").
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import app_client, create_schema, isolated_environment, start_app, token_for
+
+MODES = {
+    "delete/full": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL"},
+    "wal/full": {"SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "FULL"},
+    "wal/normal": {"SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "NORMAL"},
+}
+
+
+def prepare(db_path, users, products):
+    from sqlalchemy import insert
+    from app.auth.models import User
+    from app.products.models import Product
+
+    engine = create_schema(db_path)
+    with engine.begin() as conn:
+        conn.execute(insert(Product), [
+            {"name": f"Product {i}", "description": "stock", "price": 10.0, "stock": 1_000_000,
+             "category": "Misc", "image_url": "x"}
+            for i in range(products)
+        ])
+        conn.execute(insert(User), [
+            {"name": f"shopper{i}", "email": f"shopper{i}@example.com", "hashed_password": "x", "role": "user"}
+            for i in range(users)
+        ])
+    engine.dispose()
+
+
+async def fire(users, products, items, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    statuses = {}
+    latencies = []
+
+    async with app_client() as client:
+        async def request(method, url, headers, **kw):
+            async with limit:
+                started = time.perf_counter()
+                response = await client.request(method, url, headers=headers, **kw)
+                latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def shopper(i):
+            headers = {"Authorization": f"Bearer {token_for(f'shopper{i}@example.com')}"}
+            for n in range(items):
+                product_id = (i + n) % products + 1
+                await request("POST", "/cart/", headers, json={"product_id": product_id, "quantity": 1})
+            await request("GET", "/cart/", headers)
+            await request("POST", "/checkout/", headers)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(shopper(i) for i in range(users)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "errors": sum(n for status, n in statuses.items() if status >= 500),
+        "statuses": statuses,
+    }
+
+
+def child(mode, args):
+    import logging
+
+    with isolated_environment(**MODES[mode], LOG_LEVEL="WARNING", ACCESS_LOG="false") as db_path:
+        prepare(db_path, args.users, args.products)
+        start_app()
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        result = asyncio.run(fire(args.users, args.products, args.items, args.concurrency))
+        print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args)
+        return
+
+    for mode in MODES:
+        command = [sys.executable, "-m", "benchmarks.write_contention", "--mode", mode]
+        for name in ("users", "products", "items", "concurrency"):
+            command += [f"--{name}", str(getattr(args, name))]
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{mode:12s} {result['rps']:6.0f} req/s  p50 {result['p50_ms']:6.1f} ms  p99 {result['p99_ms']:7.1f} ms  "
+            f"errors {result['errors']}/{result['requests']}"
+        )
+
+
+if __name__ == "__main__":
+    main()